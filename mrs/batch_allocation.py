@@ -0,0 +1,230 @@
+""" Offline allocation of a dataset, without middleware or database
+
+Runs the auction of the auctioneer in-process: tasks are announced to bidders (one per robot)
+through an in-process api (see mrs.utils.local_api), the bids are elected by a Round and the
+winner is allocated with an ALLOCATION message, until all tasks are allocated or no robot can
+accommodate the remaining tasks. The messages go through the same serialization as online.
+
+Each run writes, to <output_dir>/<config name>/:
+    allocations.csv: task_id, robot_id, position, start and finish times (lower bounds of the
+                     dispatchable graph) of each allocated task. Robot is empty for unallocated tasks
+    performance.json: metrics of the DatasetPerformance model
+
+Examples:
+    python batch_allocation.py ../tests/data/non_overlapping.yaml --config ../config/config.yaml
+    python batch_allocation.py dataset.yaml --config a.yaml b.yaml c.yaml --n-robots 40 --n-processes 3
+"""
+import argparse
+import csv
+import json
+import logging
+import logging.config
+import multiprocessing
+import os
+from datetime import timedelta
+
+import numpy as np
+from stn.stp import STP
+
+from mrs.exceptions.task_allocation import AlternativeTimeSlot
+from mrs.exceptions.task_allocation import NoAllocation
+from mrs.structs.allocation import TaskAnnouncement, Allocation
+from mrs.task_allocation.bidder import Bidder
+from mrs.task_allocation.round import Round
+from mrs.utils import clock
+from mrs.utils.datasets import load_tasks_lots, load_yaml
+from mrs.utils.local_api import LocalAPI
+from mrs.utils.task_registry import TaskRegistry
+
+
+class BatchAllocator(object):
+
+    def __init__(self, robot_ids, mrta_config, bidder_config):
+        self.logger = logging.getLogger('mrs.batch_allocator')
+        self.api = LocalAPI()
+
+        auctioneer_config = mrta_config.get('auctioneer', dict())
+        self.round_time = timedelta(seconds=auctioneer_config.get('round_time', 5))
+        self.alternative_timeslots = auctioneer_config.get('alternative_timeslots', False)
+
+        self.zero_timepoint = clock.today()
+
+        stp_solver = mrta_config.get('stp_solver')
+        robot_config = {'api': self.api,
+                        'robot_store': None,
+                        'stp_solver': stp_solver,
+                        'task_type': None,
+                        'stp': STP(stp_solver),
+                        'task_registry': TaskRegistry(persistent=False),
+                        'travel_time_matrix': mrta_config.get('travel_time_matrix')}
+
+        self.bidders = {robot_id: Bidder(dict(robot_config, robot_id=robot_id), bidder_config)
+                        for robot_id in robot_ids}
+
+        self.api.register_callback('TASK-ANNOUNCEMENT', self.task_announcement_cb)
+        self.api.register_callback('BID', self.bid_cb)
+        for bidder in self.bidders.values():
+            self.api.register_callback('ALLOCATION', bidder.allocation_cb)
+
+        self.round = None
+        # task_id: (robot_id, position)
+        self.allocations = dict()
+        # task_id: (robot_id, alternative start time)
+        self.alternative_allocations = dict()
+
+    def task_announcement_cb(self, msg):
+        # The announcement is parsed once for all robots, as in the robot host
+        task_announcement = TaskAnnouncement.from_payload(msg['payload'])
+        for bidder in self.bidders.values():
+            bidder.process_task_announcement(task_announcement)
+
+    def bid_cb(self, msg):
+        self.round.process_bid(msg['payload'])
+
+    def allocate(self, tasks_lots):
+        """ Allocates the tasks, one per round
+
+        :param tasks_lots: list of task lots (see mrs.structs.task.TaskLot)
+        :return: dict of allocations (task_id: (robot_id, position))
+        """
+        tasks_to_allocate = {task_lot.task.task_id: task_lot for task_lot in tasks_lots}
+
+        while tasks_to_allocate:
+            self.round = Round(tasks_to_allocate=tasks_to_allocate,
+                               round_time=self.round_time,
+                               n_robots=len(self.bidders),
+                               alternative_timeslots=self.alternative_timeslots)
+            self.round.start()
+
+            # The bidders run one after the other: with a closure time, the last ones would stop bidding
+            # anytime once the round time has passed in total
+            task_announcement = TaskAnnouncement(list(tasks_to_allocate.values()), self.round.id,
+                                                 self.zero_timepoint, closure_time=None,
+                                                 alternative_timeslots=self.alternative_timeslots)
+            self.api.publish(self.api.create_message(task_announcement))
+            self.api.run()
+
+            try:
+                task_lot, robot_id, position, tasks_to_allocate = self.round.get_result()
+            except NoAllocation:
+                self.logger.warning("No robot can accommodate the %s remaining tasks", len(tasks_to_allocate))
+                break
+            except AlternativeTimeSlot as exception:
+                self.alternative_allocations[exception.task_id] = (exception.robot_id,
+                                                                   exception.alternative_start_time)
+                tasks_to_allocate.pop(exception.task_id, None)
+                continue
+            finally:
+                self.round.finish()
+
+            self.allocations[task_lot.task.task_id] = (robot_id, position)
+            self.api.publish(self.api.create_message(Allocation(task_lot.task.task_id, robot_id, position)))
+            self.api.run()
+            self.logger.debug("Allocated task %s to robot %s. %s tasks left", task_lot.task.task_id, robot_id,
+                              len(tasks_to_allocate))
+
+        return self.allocations
+
+    def get_assignments(self, tasks_lots):
+        """ Returns one row per task: task_id, robot_id, position, start_time, finish_time
+        """
+        rows = list()
+        for task_lot in tasks_lots:
+            task_id = task_lot.task.task_id
+            robot_id, start_time, finish_time, position = None, None, None, None
+            if task_id in self.allocations:
+                robot_id = self.allocations[task_id][0]
+                timetable = self.bidders[robot_id].timetable
+                position = timetable.get_task_position(task_id)
+                start_time = self.to_datetime(timetable.get_time(task_id, 'start'))
+                finish_time = self.to_datetime(timetable.get_time(task_id, 'finish'))
+            rows.append([task_id, robot_id, position, start_time, finish_time])
+        return rows
+
+    def to_datetime(self, relative_time):
+        return (self.zero_timepoint + timedelta(minutes=relative_time)).to_datetime()
+
+    def get_performance(self, dataset_id):
+        """ Metrics of the DatasetPerformance model, computed from the dispatchable graphs of the robots
+        """
+        bounds = [bidder.timetable.bounds for bidder in self.bidders.values()
+                  if bidder.timetable.dispatchable_graph is not None and bidder.timetable.get_tasks()]
+
+        n_allocated = sum(len(bounds_) for bounds_ in bounds)
+        performance = {'dataset_id': dataset_id,
+                       'n_tasks_allocated': n_allocated,
+                       'n_alternative_allocations': len(self.alternative_allocations),
+                       'robot_usage': 100 * len(bounds) / len(self.bidders)}
+        if not bounds:
+            return performance
+
+        work_time = sum(np.sum(bounds_.lower[:, 2] - bounds_.lower[:, 1]) for bounds_ in bounds)
+        travel_time = sum(np.sum(bounds_.lower[:, 1] - bounds_.lower[:, 0]) for bounds_ in bounds)
+        idle_time = sum(bounds_.get_idle_time() for bounds_ in bounds)
+        total_time = work_time + travel_time + idle_time
+
+        makespan = max(bounds_.get_makespan() for bounds_ in bounds)
+        performance.update(completion_time=float(makespan - min(bounds_.lower[0, 0] for bounds_ in bounds)),
+                           makespan=float(makespan),
+                           fleet_work_time=float(100 * work_time / total_time) if total_time else 0.,
+                           fleet_travel_time=float(100 * travel_time / total_time) if total_time else 0.,
+                           fleet_idle_time=float(100 * idle_time / total_time) if total_time else 0.,
+                           usage_most_loaded_robot=100 * max(len(bounds_) for bounds_ in bounds) / n_allocated)
+        return performance
+
+
+def get_robot_ids(config_params, n_robots=None):
+    if n_robots:
+        return ['ropod_%03d' % robot for robot in range(1, n_robots + 1)]
+    return config_params.get('resource_manager').get('resources').get('fleet')
+
+
+def run(config_file, dataset_path, output_dir, n_robots=None):
+    """ Allocates the dataset with the given configuration and writes the results
+
+    :return: path of the results
+    """
+    config_params = load_yaml(config_file)
+    dataset_id, tasks_lots = load_tasks_lots(dataset_path)
+
+    allocator = BatchAllocator(get_robot_ids(config_params, n_robots),
+                               config_params.get('plugins').get('mrta'),
+                               config_params.get('robot_proxy').get('bidder'))
+    allocator.allocate(tasks_lots)
+
+    results_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(config_file))[0])
+    os.makedirs(results_dir, exist_ok=True)
+
+    with open(os.path.join(results_dir, 'allocations.csv'), 'w', newline='') as allocations_file:
+        writer = csv.writer(allocations_file)
+        writer.writerow(['task_id', 'robot_id', 'position', 'start_time', 'finish_time'])
+        writer.writerows(allocator.get_assignments(tasks_lots))
+
+    with open(os.path.join(results_dir, 'performance.json'), 'w') as performance_file:
+        json.dump(allocator.get_performance(dataset_id), performance_file, indent=2, default=str)
+
+    return results_dir
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', type=str, help='dataset file')
+    parser.add_argument('--config', type=str, nargs='+', default=['../config/config.yaml'],
+                        help='configuration files. Each one is allocated in a separate run')
+    parser.add_argument('--n-robots', type=int, help='number of robots. Defaults to the fleet of the config')
+    parser.add_argument('--n-processes', type=int, default=1, help='runs allocated in parallel')
+    parser.add_argument('--output-dir', type=str, default='batch_allocation')
+    args = parser.parse_args()
+
+    logging.config.dictConfig(load_yaml(args.config[0]).get('logger'))
+
+    runs = [(config_file, args.dataset, args.output_dir, args.n_robots) for config_file in args.config]
+    if args.n_processes > 1:
+        with multiprocessing.Pool(args.n_processes) as pool:
+            results_dirs = pool.starmap(run, runs)
+    else:
+        results_dirs = [run(*run_args) for run_args in runs]
+
+    for results_dir in results_dirs:
+        print("Results written to %s" % results_dir)
@@ -3,15 +3,16 @@ import time
 
 from fmlib.api import API
 from fleet_management.config.config import FMSBuilder
-from fmlib.db.mongo import Store
 from fmlib.db.queries import get_tasks_by_status
 from ropod.structs.task import TaskStatus as TaskStatusConst
 
 from mrs.config.builder import MRTABuilder
+from mrs.db.connection import MongoStore
 from mrs.utils.datasets import load_yaml
+from mrs.utils.message_log import MessageLog
 
 _component_modules = {'api': API,
-                      'ccu_store': Store,
+                      'ccu_store': MongoStore,
                       }
 
 _config_order = ['api', 'ccu_store']
@@ -36,6 +37,13 @@ class MRS(object):
         mrta_builder = MRTABuilder.configure(self.api, self.ccu_store, config_params)
         self.auctioneer = mrta_builder.get_component('auctioneer')
         self.dispatcher = mrta_builder.get_component('dispatcher')
+        if self.dispatcher:
+            self.auctioneer.timetable_listeners.append(self.dispatcher.update_timetable)
+
+        message_log_config = config_params.get('message_log', dict())
+        if message_log_config.get('enabled'):
+            self.message_log = MessageLog(message_log_config.get('path'), message_log_config.get('msg_types'))
+            self.message_log.attach(self.api, self.auctioneer, ['bid_cb', 'finish_round_cb'])
 
         self.api.register_callbacks(self)
         self.logger.info("Initialized MRS")
@@ -51,6 +59,8 @@ class MRS(object):
 
             while True:
                 self.auctioneer.run()
+                if self.dispatcher:
+                    self.dispatcher.run()
                 self.api.run()
                 time.sleep(0.5)
         except (KeyboardInterrupt, SystemExit):
@@ -41,7 +41,7 @@ class MRTABuilder:
         if name == 'auctioneer':
             return self._auctioneer
         elif name == 'dispatcher':
-            return self.dispatcher
+            return self._dispatcher
 
     @classmethod
     def configure(cls, api, ccu_store, config_params):
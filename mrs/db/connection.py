@@ -0,0 +1,151 @@
+""" Shared Mongo connections
+
+One pooled MongoClient is created per (host, port) and process and shared by all connection
+aliases, i.e., the ccu store, the robot stores and the pymodm models use the same pool of sockets.
+Each database is registered as a pymodm connection alias ('default': ccu store, or the robot store
+in a robot process). The robots of a robot host share its robot store.
+
+Saves made inside a bulk_write context are grouped by collection and written with one
+bulk_write per collection when the context exits.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from pymodm import MongoModel
+from pymodm.connection import ConnectionInfo, DEFAULT_CONNECTION_ALIAS, _CONNECTIONS
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import ServerSelectionTimeoutError, BulkWriteError
+
+logger = logging.getLogger('mrs.db.connection')
+
+# (host, port): MongoClient
+_clients = dict()
+_clients_lock = threading.Lock()
+
+# Bulk write buffers are per thread: (alias, collection name): dict of _id: operation
+_bulk = threading.local()
+
+
+def get_client(host='localhost', port=27017, **kwargs):
+    """ Returns the MongoClient of the process for the given host and port
+
+    :param kwargs: options of the client (e.g. maxPoolSize, serverSelectionTimeoutMS),
+                   only used when the client is created
+    """
+    with _clients_lock:
+        client = _clients.get((host, port))
+        if client is None:
+            client = MongoClient(host, port, connect=False, **kwargs)
+            _clients[(host, port)] = client
+            logger.debug("Created Mongo client %s:%s", host, port)
+        return client
+
+
+def connect(db_name, alias=DEFAULT_CONNECTION_ALIAS, host='localhost', port=27017, **kwargs):
+    """ Registers the database as a pymodm connection alias, on the shared client
+
+    :param db_name: name of the database
+    :param alias: connection alias used by the models (Meta.connection_alias or switch_connection)
+    :return: pymongo database
+    """
+    client = get_client(host, port, **kwargs)
+    mongodb_uri = 'mongodb://%s:%s/%s' % (host, port, db_name)
+    database = client[db_name]
+    _CONNECTIONS[alias] = ConnectionInfo(parsed_uri={'database': db_name, 'nodelist': [(host, port)]},
+                                         conn_string=mongodb_uri,
+                                         database=database)
+    return database
+
+
+class MongoStore(object):
+    """ Store on the shared client. Can be used as the ccu_store or robot_store component
+
+    Config:
+        db_name: name of the database
+        port, ip: address of the server
+        alias: pymodm connection alias (default: 'default')
+        connectionTimeoutMS: server selection timeout
+        maxPoolSize: size of the connection pool of the shared client
+    """
+    def __init__(self, db_name, port=27017, ip='localhost', **kwargs):
+        self.logger = logging.getLogger('mrs.db.store')
+        self.db_name = db_name
+        self.port = port
+        self.ip = ip
+        self.alias = kwargs.get('alias', DEFAULT_CONNECTION_ALIAS)
+
+        client_options = {'serverSelectionTimeoutMS': kwargs.get('connectionTimeoutMS', 30000)}
+        if kwargs.get('maxPoolSize'):
+            client_options['maxPoolSize'] = kwargs.get('maxPoolSize')
+
+        self.db = connect(db_name, self.alias, ip, port, **client_options)
+        self.logger.info("Connected to %s on %s:%s (alias %s)", db_name, ip, port, self.alias)
+
+    @property
+    def client(self):
+        return get_client(self.ip, self.port)
+
+    def clean(self):
+        self.client.drop_database(self.db_name)
+
+
+@contextmanager
+def bulk_write():
+    """ Groups the saves (see save) made in the context and writes them when the context exits.
+    Nested contexts are written by the outermost one. Reads and deletes made in the context
+    do not see the queued saves: callers that read what they saved in the context keep the saved
+    objects in memory (see in_bulk_write).
+
+    Example:
+        with bulk_write():
+            timetable.store()
+            task_performance.update_allocation(allocation_time)
+    """
+    outermost = getattr(_bulk, 'operations', None) is None
+    if outermost:
+        _bulk.operations = dict()
+    try:
+        yield
+    finally:
+        if outermost:
+            operations = _bulk.operations
+            _bulk.operations = None
+            flush(operations)
+
+
+def in_bulk_write():
+    return getattr(_bulk, 'operations', None) is not None
+
+
+def flush(operations):
+    for (alias, collection_name), documents in operations.items():
+        collection = _CONNECTIONS[alias].database[collection_name]
+        try:
+            collection.bulk_write(list(documents.values()), ordered=False)
+        except ServerSelectionTimeoutError:
+            logger.warning('Could not save models to MongoDB')
+        except BulkWriteError as error:
+            logger.error("Bulk write to %s failed: %s", collection_name, error.details.get('writeErrors'))
+
+
+def save(model, cascade=True):
+    """ Saves the model, or queues it if called in a bulk_write context.
+    Queued saves replace the whole document (upsert). Only the last save of a document in the context is written
+
+    :param model: pymodm MongoModel
+    :param cascade: save the referenced models (not applied to queued saves)
+    """
+    if not in_bulk_write():
+        try:
+            MongoModel.save(model, cascade=cascade)
+        except ServerSelectionTimeoutError:
+            logger.warning('Could not save models to MongoDB')
+        return
+
+    model.full_clean()
+    document = model.to_son()
+    collection = model._mongometa.collection
+    key = (model._mongometa.connection_alias, collection.name)
+    _bulk.operations.setdefault(key, dict())[document['_id']] = ReplaceOne({'_id': document['_id']}, document,
+                                                                           upsert=True)
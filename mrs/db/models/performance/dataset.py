@@ -1,9 +1,7 @@
-import logging
-
+from mrs.db import connection
 from mrs.db.models.performance.task import TaskPerformance
 from pymodm import fields, MongoModel
 from pymodm.context_managers import switch_collection
-from pymongo.errors import ServerSelectionTimeoutError
 from ropod.utils.uuid import generate_uuid
 
 
@@ -43,10 +41,7 @@ class DatasetPerformance(MongoModel):
         ignore_unknown_fields = True
 
     def save(self):
-        try:
-            super().save(cascade=True)
-        except ServerSelectionTimeoutError:
-            logging.warning('Could not save models to MongoDB')
+        connection.save(self)
 
     def archive(self):
         with switch_collection(DatasetPerformance, DatasetPerformance.Meta.archive_collection):
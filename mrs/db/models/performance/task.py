@@ -1,10 +1,8 @@
-import logging
-
 from fmlib.models.tasks import Task
 from fmlib.utils.messages import Document
+from mrs.db import connection
 from pymodm import fields, EmbeddedMongoModel, MongoModel
 from pymodm.context_managers import switch_collection
-from pymongo.errors import ServerSelectionTimeoutError
 
 
 class TaskAllocationPerformance(EmbeddedMongoModel):
@@ -88,10 +86,7 @@ class TaskPerformance(MongoModel):
         ignore_unknown_fields = True
 
     def save(self):
-        try:
-            super().save(cascade=True)
-        except ServerSelectionTimeoutError:
-            logging.warning('Could not save models to MongoDB')
+        connection.save(self)
 
     def archive(self):
         with switch_collection(TaskPerformance, TaskPerformance.Meta.archive_collection):
@@ -104,6 +99,24 @@ class TaskPerformance(MongoModel):
         performance.save()
         return performance
 
+    def update_allocation(self, allocation_time):
+        """ Marks the task as allocated and appends the time (seconds) taken to (re-)allocate it
+        """
+        if self.allocation is None:
+            self.allocation = TaskAllocationPerformance(allocated=False, n_re_allocation_attempts=0,
+                                                        allocation_time=list())
+        self.allocation.allocated = True
+        self.allocation.allocation_time.append(allocation_time)
+        self.save()
+
+    def update_re_allocation_attempts(self):
+        if self.allocation is None:
+            self.allocation = TaskAllocationPerformance(allocated=False, n_re_allocation_attempts=0,
+                                                        allocation_time=list())
+        self.allocation.allocated = False
+        self.allocation.n_re_allocation_attempts = (self.allocation.n_re_allocation_attempts or 0) + 1
+        self.save()
+
     @classmethod
     def from_payload(cls, payload):
         document = Document.from_payload(payload)
@@ -1,11 +1,10 @@
-import logging
-
 from fmlib.models.tasks import Task
 from fmlib.models.tasks import TaskConstraints, TimepointConstraints
 from fmlib.models.tasks import TaskStatus
 from fmlib.utils.messages import Document
+from mrs.db import connection
+from mrs.db.queries.task import TaskLotManager
 from pymodm import fields, MongoModel
-from pymongo.errors import ServerSelectionTimeoutError
 from ropod.structs.status import TaskStatus as TaskStatusConst
 
 
@@ -15,15 +14,14 @@ class TaskLot(MongoModel):
     finish_location = fields.CharField()
     constraints = fields.EmbeddedDocumentField(TaskConstraints)
 
+    objects = TaskLotManager()
+
     class Meta:
         archive_collection = 'task_lot_archive'
         ignore_unknown_fields = True
 
     def save(self):
-        try:
-            super().save(cascade=True)
-        except ServerSelectionTimeoutError:
-            logging.warning('Could not save models to MongoDB')
+        connection.save(self)
 
     @classmethod
     def create(cls, task,
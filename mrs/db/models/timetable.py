@@ -1,16 +1,16 @@
 from pymodm import fields, MongoModel
-from pymongo.errors import ServerSelectionTimeoutError
 from fmlib.utils.messages import Document
+from mrs.db import connection
 from mrs.db.queries.timetable import TimetableManager
 
-import logging
-
 
 class Timetable(MongoModel):
     robot_id = fields.CharField(primary_key=True)
     zero_timepoint = fields.DateTimeField()
+    location = fields.CharField(blank=True)
     stn = fields.DictField()
     dispatchable_graph = fields.DictField(default=dict())
+    schedule = fields.DictField(default=dict())
 
     objects = TimetableManager()
 
@@ -19,10 +19,7 @@ class Timetable(MongoModel):
         ignore_unknown_fields = True
 
     def save(self):
-        try:
-            super().save(cascade=True)
-        except ServerSelectionTimeoutError:
-            logging.warning('Could not save models to MongoDB')
+        connection.save(self)
 
     @classmethod
     def from_payload(cls, payload):
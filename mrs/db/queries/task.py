@@ -0,0 +1,12 @@
+from pymodm.manager import Manager
+from pymodm.queryset import QuerySet
+
+
+class TaskLotQuerySet(QuerySet):
+    def get_task_lot(self, task_id):
+        """ Returns a task lot mongo model that matches to the task_id
+        """
+        return self.get({'_id': task_id})
+
+
+TaskLotManager = Manager.from_queryset(TaskLotQuerySet)
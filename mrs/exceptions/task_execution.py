@@ -8,3 +8,15 @@ class InconsistentSchedule(Exception):
         """
         Exception.__init__(self, task)
         self.task = task
+
+
+class TaskNotInTimetable(Exception):
+
+    def __init__(self, task_id):
+        """ Raised when assigning a timepoint of a task that is not in the timetable,
+        e.g., a task that was already removed
+
+        :param task_id: id of the task
+        """
+        Exception.__init__(self, task_id)
+        self.task_id = task_id
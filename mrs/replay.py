@@ -0,0 +1,251 @@
+""" Replays a message log (see mrs.utils.message_log) into an auctioneer or a bidder
+
+The component receives the messages it received in the recorded run, at the times it received them,
+on a simulated clock that runs up to MAX_SPEED times faster than real time. Its messages are
+published to an in-process api (see mrs.utils.local_api) and compared to the recorded ones.
+
+Auctioneer (log of the ccu): the tasks are added when they were first announced in the recorded
+run and the robots are registered from the received messages. Bids refer to the rounds of the recorded
+run; the n-th round of the replay takes the place of the n-th recorded round.
+The task lots are stored in the ccu_store of the configuration (use a copy of the production store).
+
+Bidder (log of a robot or a robot host): the robot receives the task announcements and allocations
+of the recorded run.
+
+Examples:
+    python replay.py ccu_messages.log --speed 50
+    python replay.py robot_host_messages.log --robot-id ropod_001 --profile bidder.prof
+"""
+import abc
+import argparse
+import cProfile
+import collections
+import logging
+import logging.config
+import time
+
+from fmlib.models.tasks import Task
+from ropod.structs.task import TaskStatus as TaskStatusConst
+from ropod.utils.uuid import from_str
+
+from mrs.config.builder import MRTABuilder
+from mrs.db.connection import MongoStore
+from mrs.db.models.task import TaskLot
+from mrs.task_allocation.bidder import Bidder
+from mrs.utils import clock
+from mrs.utils.datasets import load_yaml
+from mrs.utils.local_api import LocalAPI
+from mrs.utils.message_log import MessageLog, get_msg_type
+
+MAX_SPEED = 100
+
+# Real seconds between two steps of the component while waiting for the next message
+POLL_TIME = 0.01
+
+
+class Replay(abc.ABC):
+    """ Feeds the recorded messages of a log to a component
+
+    :param entries: list of (time, direction, msg) of the log
+    :param speed: simulated seconds per real second (at most MAX_SPEED)
+    :param timeout: simulated seconds the replay continues after the last recorded message
+    """
+    def __init__(self, entries, speed=10, timeout=60):
+        self.logger = logging.getLogger('mrs.replay')
+        self.entries = entries
+        if speed > MAX_SPEED:
+            self.logger.warning("Replay speed %s reduced to %s", speed, MAX_SPEED)
+        self.speed = min(speed, MAX_SPEED)
+        self.timeout = timeout
+        self.api = LocalAPI()
+        # The components are built on the day of the recorded run (e.g. the zero timepoint of the
+        # auctioneer): the clock stands still at the start of the log until the replay runs
+        clock.set_clock(clock.SimulatedClock(self.entries[0][0], speed=0))
+
+    def get_incoming(self):
+        return [(time_, msg) for time_, direction, msg in self.entries if direction == 'in']
+
+    def run(self):
+        start_time = self.entries[0][0]
+        simulated_clock = clock.SimulatedClock(start_time, self.speed)
+        clock.set_clock(simulated_clock)
+        real_start_time = time.time()
+
+        for time_, msg in self.get_incoming():
+            self.wait_until(time_)
+            self.deliver(msg)
+            self.step()
+
+        self.wait_until(self.entries[-1][0] + self.timeout, stop=self.finished)
+
+        clock.set_clock(clock.Clock())
+        self.logger.info("Replayed %.1f s in %.1f s", simulated_clock.time() - start_time,
+                         time.time() - real_start_time)
+
+    def wait_until(self, time_, stop=None):
+        while clock.time() < time_:
+            self.step()
+            if stop and stop():
+                return
+            time.sleep(POLL_TIME)
+
+    @abc.abstractmethod
+    def deliver(self, msg):
+        """ Delivers a recorded incoming message to the component
+        """
+
+    def step(self):
+        pass
+
+    def finished(self):
+        return True
+
+    def get_report(self):
+        """ Number of messages of each type in the recorded run and in the replay
+        """
+        recorded = collections.Counter(get_msg_type(msg) for time_, direction, msg in self.entries
+                                       if direction == 'out' and self.is_own(msg))
+        replayed = collections.Counter(get_msg_type(msg) for time_, msg in self.api.published)
+        return {msg_type: (recorded.get(msg_type, 0), replayed.get(msg_type, 0))
+                for msg_type in sorted(set(recorded) | set(replayed))}
+
+    def is_own(self, msg):
+        return True
+
+
+class AuctioneerReplay(Replay):
+
+    def __init__(self, entries, config_params, **kwargs):
+        super().__init__(entries, **kwargs)
+
+        ccu_store = MongoStore(**config_params.get('ccu_store'))
+        mrta_builder = MRTABuilder.configure(self.api, ccu_store, config_params)
+        self.auctioneer = mrta_builder.get_component('auctioneer')
+
+        for robot_id in self.get_robot_ids():
+            self.auctioneer.register_robot(robot_id)
+
+        # Recorded round ids, in the order the rounds were announced, and their replayed round ids
+        self.recorded_round_ids = collections.deque()
+        self.round_ids = dict()
+        self.new_tasks = self.get_new_tasks()
+        # Number of published messages that were checked for new rounds
+        self.n_checked = 0
+
+    def get_robot_ids(self):
+        return sorted({msg['payload']['robotId'] for time_, msg in self.get_incoming()})
+
+    def get_new_tasks(self):
+        """ Returns (time, task_lot payload) of each task, when it was announced for the first time
+        """
+        new_tasks = list()
+        task_ids = set()
+        for time_, direction, msg in self.entries:
+            if direction != 'out' or get_msg_type(msg) != 'TASK-ANNOUNCEMENT':
+                continue
+            self.recorded_round_ids.append(msg['payload']['roundId'])
+            for task_id, task_lot in msg['payload']['tasksLots'].items():
+                if task_id not in task_ids:
+                    task_ids.add(task_id)
+                    new_tasks.append((time_, task_lot))
+        return collections.deque(new_tasks)
+
+    def add_tasks(self):
+        while self.new_tasks and self.new_tasks[0][0] <= clock.time():
+            time_, payload = self.new_tasks.popleft()
+            Task.create_new(task_id=from_str(payload['taskId']))
+            task_lot = TaskLot.from_payload(payload)
+            task_lot.save()
+            task_lot.update_status(TaskStatusConst.UNALLOCATED)
+            self.auctioneer.add_task_lot(task_lot)
+
+    def step(self):
+        self.add_tasks()
+        self.auctioneer.run()
+        self.map_rounds()
+
+    def map_rounds(self):
+        for time_, msg in self.api.published[self.n_checked:]:
+            if get_msg_type(msg) == 'TASK-ANNOUNCEMENT' and self.recorded_round_ids:
+                self.round_ids[self.recorded_round_ids.popleft()] = msg['payload']['roundId']
+        self.n_checked = len(self.api.published)
+
+    def deliver(self, msg):
+        msg_type = get_msg_type(msg)
+        if msg_type == 'BID':
+            round_id = self.round_ids.get(msg['payload']['roundId'])
+            if round_id is None:
+                self.logger.debug("Bid of a round that was not replayed: %s", msg['payload']['roundId'])
+                return
+            msg['payload']['roundId'] = round_id
+            self.auctioneer.bid_cb(msg)
+        elif msg_type == 'FINISH-ROUND':
+            self.auctioneer.finish_round_cb(msg)
+
+    def finished(self):
+        return not self.new_tasks and not self.auctioneer.tasks_to_allocate and \
+               all(round_.finished for round_ in self.auctioneer.rounds.values())
+
+
+class BidderReplay(Replay):
+
+    def __init__(self, entries, config_params, robot_id, **kwargs):
+        super().__init__(entries, **kwargs)
+        proxy_config = config_params.get('robot_proxy')
+        mrta_config = config_params.get('plugins').get('mrta')
+
+        robot_store_config = dict(config_params.get('robot_store'))
+        robot_config = {'robot_id': robot_id,
+                        'api': self.api,
+                        'robot_store': MongoStore(**robot_store_config),
+                        'stp_solver': mrta_config.get('stp_solver'),
+                        'task_type': None,
+                        'travel_time_matrix': mrta_config.get('travel_time_matrix')}
+        self.robot_id = robot_id
+        self.bidder = Bidder(robot_config, proxy_config.get('bidder'))
+
+    def is_own(self, msg):
+        return msg['payload'].get('robotId') == self.robot_id
+
+    def deliver(self, msg):
+        msg_type = get_msg_type(msg)
+        if msg_type == 'TASK-ANNOUNCEMENT':
+            self.bidder.task_announcement_cb(msg)
+        elif msg_type == 'ALLOCATION':
+            self.bidder.allocation_cb(msg)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log', type=str, help='message log')
+    parser.add_argument('--robot-id', type=str, help='replay the bidder of this robot. '
+                                                     'Replays the auctioneer if not given')
+    parser.add_argument('--speed', type=float, default=10, help='at most %s' % MAX_SPEED)
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='simulated seconds the replay continues after the last message')
+    parser.add_argument('--profile', type=str, help='file to which the cProfile stats are written')
+    parser.add_argument('--config', type=str, default='../config/config.yaml')
+    args = parser.parse_args()
+
+    config = load_yaml(args.config)
+    logging.config.dictConfig(config.get('logger'))
+
+    entries = list(MessageLog.read(args.log))
+    if args.robot_id:
+        replay = BidderReplay(entries, config, args.robot_id, speed=args.speed, timeout=args.timeout)
+    else:
+        replay = AuctioneerReplay(entries, config, speed=args.speed, timeout=args.timeout)
+
+    profile = cProfile.Profile() if args.profile else None
+    if profile:
+        profile.enable()
+
+    replay.run()
+
+    if profile:
+        profile.disable()
+        profile.dump_stats(args.profile)
+
+    for msg_type, (n_recorded, n_replayed) in replay.get_report().items():
+        print("%s: %s recorded, %s replayed" % (msg_type, n_recorded, n_replayed))
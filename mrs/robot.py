@@ -1,31 +1,78 @@
 import argparse
 import logging
+import threading
 import time
 
+from mrs.exceptions.task_execution import InconsistentSchedule
 from mrs.robot_base import RobotBase
 from mrs.structs.timetable import Timetable
 from mrs.task_allocation.bidder import Bidder
 from mrs.task_execution.schedule_monitor import ScheduleMonitor
+from mrs.utils.message_log import MessageLog
+from mrs.utils.task_registry import TaskRegistry
 
 
 class Robot(RobotBase):
     def __init__(self, robot_config, bidder_config, **kwargs):
+        # The bidder and the schedule monitor share the registry of the robot's tasks
+        robot_config = dict(robot_config, task_registry=robot_config.get('task_registry') or TaskRegistry())
         super().__init__(**robot_config)
 
         self.bidder = Bidder(robot_config, bidder_config)
 
+        self.schedule_monitor = None
         schedule_monitor_config = kwargs.get("schedule_monitor_config")
         if schedule_monitor_config:
             self.schedule_monitor = ScheduleMonitor(robot_config, schedule_monitor_config)
 
+        # The middleware thread (bidder callbacks) and the schedule monitoring modify the timetable of
+        # the bidder one at a time
+        self.lock = threading.Lock()
+
         self.logger = logging.getLogger('mrs.robot.%s' % self.id)
         self.logger.info("Robot %s initialized", self.id)
 
+    def task_announcement_cb(self, msg):
+        with self.lock:
+            self.bidder.task_announcement_cb(msg)
+
+    def allocation_cb(self, msg):
+        with self.lock:
+            self.bidder.allocation_cb(msg)
+
+    def task_schedule_cb(self, msg):
+        with self.lock:
+            self.bidder.task_schedule_cb(msg)
+
+    def consensus_state_cb(self, msg):
+        with self.lock:
+            self.bidder.consensus_state_cb(msg)
+
+    def finish_consensus_cb(self, msg):
+        with self.lock:
+            self.bidder.finish_consensus_cb(msg)
+
+    def monitor_schedule(self):
+        with self.lock:
+            # The schedule monitor works on the timetable updated by the bidder
+            self.schedule_monitor.timetable = self.bidder.timetable
+            try:
+                self.schedule_monitor.run()
+            except InconsistentSchedule as exception:
+                self.logger.warning("Schedule of task %s is inconsistent", exception.task)
+                if self.schedule_monitor.corrective_measure == 're-allocate':
+                    self.bidder.re_allocate(exception.task)
+
     def run(self):
         try:
             self.api.start()
             while True:
-                time.sleep(0.5)
+                if self.schedule_monitor:
+                    # Returns as soon as TASK-PROGRESS messages arrive
+                    self.schedule_monitor.wait_for_events(timeout=0.5)
+                    self.monitor_schedule()
+                else:
+                    time.sleep(0.5)
 
         except (KeyboardInterrupt, SystemExit):
             self.logger.info("Terminating %s robot ...", self.id)
@@ -43,11 +90,15 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument('robot_id', type=str, help='example: ropod_001')
+    parser.add_argument('--message-log', type=str, help='file to which the MRTA messages are appended')
     args = parser.parse_args()
     robot_id = args.robot_id
 
     robot = config.configure_robot_proxy(robot_id)
 
+    if args.message_log:
+        MessageLog(args.message_log).attach(robot.api, robot.bidder, ['task_announcement_cb', 'allocation_cb'])
+
     robot.api.register_callbacks(robot)
 
     robot.run()
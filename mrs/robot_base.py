@@ -1,20 +1,22 @@
-from datetime import datetime
-
 from mrs.structs.timetable import Timetable
-from ropod.utils.timestamp import TimeStamp
+from mrs.utils import clock
+from mrs.utils import travel_time
 from stn.stp import STP
 
 
 class RobotBase(object):
-    def __init__(self, robot_id, api, robot_store, stp_solver, task_type):
+    def __init__(self, robot_id, api, robot_store, stp_solver, task_type, **kwargs):
 
         self.id = robot_id
         self.api = api
-        self.stp = STP(stp_solver)
+        # Robots hosted in the same process share the stp solver
+        self.stp = kwargs.get('stp') or STP(stp_solver)
+
+        travel_time_matrix_config = kwargs.get('travel_time_matrix')
+        if travel_time_matrix_config:
+            travel_time.configure(**travel_time_matrix_config)
 
         self.timetable = Timetable(robot_id, self.stp)
 
-        today_midnight = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
-        self.timetable.zero_timepoint = TimeStamp()
-        self.timetable.zero_timepoint.timestamp = today_midnight
+        self.timetable.zero_timepoint = clock.today()
 
@@ -0,0 +1,204 @@
+import argparse
+import logging
+import logging.config
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fleet_management.config.config import FMSBuilder
+from fmlib.api import API
+from stn.stp import STP
+
+from mrs.db.connection import MongoStore
+from mrs.robot import Robot
+from mrs.structs.allocation import TaskAnnouncement
+from mrs.utils.datasets import load_yaml
+from mrs.utils.message_log import MessageLog
+from mrs.utils.task_registry import TaskRegistry
+
+_component_modules = {'api': API,
+                      'robot_store': MongoStore,
+                      }
+
+_config_order = ['api', 'robot_store']
+
+
+class RobotHost(object):
+    """ Hosts the robot proxies (bidders and schedule monitors) of several robots in one process
+
+    The robots share:
+        - one middleware node: messages are demultiplexed by robot id
+        - one robot store (Mongo client)
+        - one stp solver
+        - one task registry (and its writer thread)
+        - the travel time matrix and the stp solution cache of the process
+        - a pool of workers that computes the bids of the robots in parallel
+    """
+
+    def __init__(self, robot_ids, api, robot_store, stp_solver, bidder_config, **kwargs):
+        self.logger = logging.getLogger('mrs.robot_host')
+
+        self.api = api
+        self.stp = STP(stp_solver)
+        self.executor = ThreadPoolExecutor(max_workers=kwargs.get('n_workers', 4))
+
+        robot_config = {'api': api,
+                        'robot_store': robot_store,
+                        'stp_solver': stp_solver,
+                        'task_type': kwargs.get('task_type'),
+                        'stp': self.stp,
+                        'task_registry': TaskRegistry(),
+                        'travel_time_matrix': kwargs.get('travel_time_matrix')}
+
+        self.robots = dict()
+        for robot_id in robot_ids:
+            self.robots[robot_id] = Robot(dict(robot_config, robot_id=robot_id), bidder_config,
+                                          schedule_monitor_config=kwargs.get('schedule_monitor_config'))
+
+        # Messages of a robot are processed one at a time, and not while its schedule is monitored
+        # (see Robot.monitor_schedule)
+        self.locks = {robot_id: robot.lock for robot_id, robot in self.robots.items()}
+
+        # The workers share the middleware node, whose sockets are not thread-safe: messages are
+        # published one at a time
+        self.publish_lock = threading.Lock()
+        publish = self.api.publish
+        self.api.publish = lambda msg, **kwargs: self.publish(publish, msg, **kwargs)
+
+        # The middleware does not deliver the messages of a node to itself: the consensus states (cbba)
+        # of the hosted robots are delivered to the other hosted robots by the host
+        self.local_states = queue.Queue()
+        self.deliver_locally = bidder_config.get('allocation_method') == 'cbba'
+        if self.deliver_locally:
+            threading.Thread(target=self.deliver_local_states, daemon=True).start()
+
+        self.logger.info("Robot host initialized with robots %s", list(self.robots))
+
+    def run_locked(self, robot_id, function, *args):
+        with self.locks[robot_id]:
+            return function(*args)
+
+    def publish(self, publish, msg, **kwargs):
+        with self.publish_lock:
+            publish(msg, **kwargs)
+        if self.deliver_locally and msg['header'].get('type') == 'CONSENSUS-STATE':
+            self.local_states.put(msg)
+
+    def deliver_local_states(self):
+        while True:
+            self.consensus_state_cb(self.local_states.get())
+
+    def task_announcement_cb(self, msg):
+        self.logger.debug("Robot host received TASK-ANNOUNCEMENT")
+        # The announcement is parsed once for all robots
+        task_announcement = TaskAnnouncement.from_payload(msg['payload'])
+
+        futures = [self.executor.submit(self.run_locked, robot_id, robot.bidder.process_task_announcement,
+                                        task_announcement)
+                   for robot_id, robot in self.robots.items()]
+
+        for future in futures:
+            exception = future.exception()
+            if exception:
+                self.logger.error("Error while computing bids: %s", exception)
+
+    def consensus_state_cb(self, msg):
+        futures = [self.executor.submit(self.run_locked, robot_id, robot.bidder.consensus_state_cb, msg)
+                   for robot_id, robot in self.robots.items()]
+        for future in futures:
+            exception = future.exception()
+            if exception:
+                self.logger.error("Error while updating the consensus: %s", exception)
+
+    def finish_consensus_cb(self, msg):
+        futures = [self.executor.submit(self.run_locked, robot_id, robot.bidder.finish_consensus_cb, msg)
+                   for robot_id, robot in self.robots.items()]
+        for future in futures:
+            exception = future.exception()
+            if exception:
+                self.logger.error("Error while finishing the consensus: %s", exception)
+
+    def allocation_cb(self, msg):
+        robot = self.robots.get(msg['payload']['robotId'])
+        if robot:
+            self.run_locked(robot.id, robot.bidder.allocation_cb, msg)
+
+    def task_schedule_cb(self, msg):
+        robot = self.robots.get(msg['payload']['robotId'])
+        if robot:
+            self.run_locked(robot.id, robot.bidder.task_schedule_cb, msg)
+
+    def task_progress_cb(self, msg):
+        robot = self.robots.get(msg['payload'].get('robotId'))
+        if robot and robot.schedule_monitor:
+            robot.schedule_monitor.task_progress_cb(msg)
+
+    def run(self):
+        try:
+            self.api.start()
+            while True:
+                for robot in self.robots.values():
+                    if robot.schedule_monitor and robot.schedule_monitor.events:
+                        # Takes the lock of the robot
+                        robot.monitor_schedule()
+                time.sleep(0.5)
+
+        except (KeyboardInterrupt, SystemExit):
+            self.logger.info("Terminating robot host ...")
+            self.executor.shutdown()
+            self.api.shutdown()
+            self.logger.info("Exiting...")
+
+
+def configure(config_params, robot_ids=None):
+    """ Configures a robot host with the robot_host, robot_proxy and robot_store configuration
+
+    :param config_params: configuration (dict)
+    :param robot_ids: ids of the robots to host. Defaults to the fleet of the resource manager
+    :return: RobotHost
+    """
+    host_config = config_params.get('robot_host')
+    proxy_config = config_params.get('robot_proxy')
+    mrta_config = config_params.get('plugins').get('mrta')
+
+    if not robot_ids:
+        robot_ids = config_params.get('resource_manager').get('resources').get('fleet')
+
+    fms_builder = FMSBuilder(component_modules=_component_modules,
+                             config_order=_config_order)
+    fms_builder.configure({'api': host_config.get('api'),
+                           'robot_store': config_params.get('robot_store')})
+
+    robot_host = RobotHost(robot_ids,
+                           fms_builder.get_component('api'),
+                           fms_builder.get_component('robot_store'),
+                           mrta_config.get('stp_solver'),
+                           proxy_config.get('bidder'),
+                           n_workers=host_config.get('n_workers', 4),
+                           task_type=host_config.get('task_type'),
+                           travel_time_matrix=mrta_config.get('travel_time_matrix'),
+                           schedule_monitor_config=proxy_config.get('schedule_monitor'))
+
+    message_log_config = host_config.get('message_log', dict())
+    if message_log_config.get('enabled'):
+        message_log = MessageLog(message_log_config.get('path'), message_log_config.get('msg_types'))
+        message_log.attach(robot_host.api, robot_host, ['task_announcement_cb', 'allocation_cb'])
+
+    robot_host.api.register_callbacks(robot_host)
+    return robot_host
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('robot_ids', type=str, nargs='*', help='example: ropod_001 ropod_002. '
+                                                              'Defaults to all robots in the fleet')
+    parser.add_argument('--config', type=str, default='../config/config.yaml')
+    args = parser.parse_args()
+
+    config = load_yaml(args.config)
+    logging.config.dictConfig(config.get('logger'))
+
+    robot_host = configure(config, args.robot_ids)
+    robot_host.run()
@@ -1,11 +1,14 @@
 from ropod.utils.timestamp import TimeStamp
 from ropod.utils.uuid import generate_uuid, from_str
-from mrs.db.models.task import TaskLot
-from fmlib.models.tasks import Task
+from mrs.structs.task import TaskLot
 
 
 class TaskAnnouncement(object):
-    def __init__(self, tasks_lots, round_id, zero_timepoint):
+    __slots__ = ['tasks_lots', 'round_id', 'zero_timepoint', 'closure_time', 'robot_ids', 'recipients',
+                 'proxied_robot_ids', 'alternative_timeslots']
+
+    def __init__(self, tasks_lots, round_id, zero_timepoint, closure_time=None, robot_ids=None,
+                 recipients=None, proxied_robot_ids=None, alternative_timeslots=False):
         """
         Constructor for the TaskAnnouncement object
 
@@ -14,6 +17,14 @@ class TaskAnnouncement(object):
              round_id (str): A string of the format UUID that identifies the round
              zero_timepoint (TimeStamp): Zero Time Point. Origin time to which task temporal information must be
                                         referenced to
+             closure_time (TimeStamp): Time at which the round closes. Bids received after
+                                       the closure time are not considered
+             robot_ids (list): Robots that take part in the round. If None, all robots take part
+             recipients (dict): Robots that receive each task (task_id: list of robot_ids).
+                                If None, all robots that take part in the round receive all tasks
+             proxied_robot_ids (list): Robots whose bids are computed by the auctioneer
+             alternative_timeslots (bool): Robots that cannot accommodate a task send a bid with an
+                                           alternative start time (soft bid)
         """
         self.tasks_lots = tasks_lots
 
@@ -23,6 +34,21 @@ class TaskAnnouncement(object):
             self.round_id = round_id
 
         self.zero_timepoint = zero_timepoint
+        self.closure_time = closure_time
+        self.robot_ids = robot_ids
+        self.recipients = recipients
+        self.proxied_robot_ids = proxied_robot_ids or list()
+        self.alternative_timeslots = alternative_timeslots
+
+    def get_tasks_lots(self, robot_id):
+        """ Returns the tasks announced to the robot with the given id
+        """
+        if self.robot_ids is not None and robot_id not in self.robot_ids:
+            return list()
+        if self.recipients is None:
+            return self.tasks_lots
+        return [task_lot for task_lot in self.tasks_lots
+                if robot_id in self.recipients.get(str(task_lot.task.task_id), list())]
 
     def to_dict(self):
         dict_repr = dict()
@@ -33,6 +59,15 @@ class TaskAnnouncement(object):
 
         dict_repr['round_id'] = self.round_id
         dict_repr['zero_timepoint'] = self.zero_timepoint.to_str()
+        dict_repr['alternative_timeslots'] = self.alternative_timeslots
+        if self.closure_time:
+            dict_repr['closure_time'] = self.closure_time.to_str()
+        if self.robot_ids is not None:
+            dict_repr['robot_ids'] = self.robot_ids
+        if self.recipients is not None:
+            dict_repr['recipients'] = self.recipients
+        if self.proxied_robot_ids:
+            dict_repr['proxied_robot_ids'] = self.proxied_robot_ids
 
         return dict_repr
 
@@ -40,15 +75,23 @@ class TaskAnnouncement(object):
     def from_payload(payload):
         round_id = from_str(payload['roundId'])
         zero_timepoint = TimeStamp.from_str(payload['zeroTimepoint'])
+        closure_time = payload.get('closureTime')
+        if closure_time:
+            closure_time = TimeStamp.from_str(closure_time)
+
+        robot_ids = payload.get('robotIds')
+        recipients = payload.get('recipients')
+        proxied_robot_ids = payload.get('proxiedRobotIds')
+        alternative_timeslots = payload.get('alternativeTimeslots', False)
 
         tasks_dict = payload['tasksLots']
         tasks_lots = list()
 
         for task_id, task_dict in tasks_dict.items():
-            Task.create_new(task_id=task_id)
             tasks_lots.append(TaskLot.from_payload(task_dict))
 
-        task_announcement = TaskAnnouncement(tasks_lots, round_id, zero_timepoint)
+        task_announcement = TaskAnnouncement(tasks_lots, round_id, zero_timepoint, closure_time, robot_ids,
+                                             recipients, proxied_robot_ids, alternative_timeslots)
 
         return task_announcement
 
@@ -58,24 +101,34 @@ class TaskAnnouncement(object):
 
 
 class Allocation(object):
-    def __init__(self, task_id, robot_id):
+    __slots__ = ['task_id', 'robot_id', 'position']
+
+    def __init__(self, task_id, robot_id, position=None):
+        """
+        Args:
+            task_id (str): id of the allocated task
+            robot_id (str): id of the winning robot
+            position (int): position in the STN of the robot where the task is inserted
+        """
         self.task_id = task_id
         self.robot_id = robot_id
+        self.position = position
 
     def to_dict(self):
         dict_repr = dict()
         dict_repr['task_id'] = self.task_id
         dict_repr['robot_id'] = self.robot_id
+        dict_repr['position'] = self.position
 
         return dict_repr
 
     @staticmethod
     def from_payload(payload):
-        allocation = Allocation
-        allocation.task_id = from_str(payload['taskId'])
-        allocation.robot_id = payload['robotId']
+        task_id = from_str(payload['taskId'])
+        robot_id = payload['robotId']
+        position = payload.get('position')
 
-        return allocation
+        return Allocation(task_id, robot_id, position)
 
     @property
     def meta_model(self):
@@ -83,6 +136,8 @@ class Allocation(object):
 
 
 class FinishRound(object):
+    __slots__ = ['robot_id']
+
     def __init__(self, robot_id):
         self.robot_id = robot_id
 
@@ -94,3 +149,130 @@ class FinishRound(object):
     @property
     def meta_model(self):
         return "finish-round"
+
+
+class ReAllocation(object):
+    def __init__(self, task_id, robot_id):
+        """ Request to re-allocate a task that the robot can no longer execute on time
+
+        Args:
+            task_id (str): id of the task to re-allocate
+            robot_id (str): id of the robot the task was allocated to
+        """
+        self.task_id = task_id
+        self.robot_id = robot_id
+
+    def to_dict(self):
+        dict_repr = dict()
+        dict_repr['task_id'] = self.task_id
+        dict_repr['robot_id'] = self.robot_id
+        return dict_repr
+
+    @staticmethod
+    def from_payload(payload):
+        task_id = from_str(payload['taskId'])
+        robot_id = payload['robotId']
+        return ReAllocation(task_id, robot_id)
+
+    @property
+    def meta_model(self):
+        return "re-allocation"
+
+
+class UserConfirmation(object):
+    def __init__(self, task_id, accepted):
+        """ Answer of the user to the alternative start time proposed for a task
+
+        Args:
+            task_id (str): id of the task
+            accepted (bool): True if the user accepts the alternative start time
+        """
+        self.task_id = task_id
+        self.accepted = accepted
+
+    def to_dict(self):
+        dict_repr = dict()
+        dict_repr['task_id'] = self.task_id
+        dict_repr['accepted'] = self.accepted
+        return dict_repr
+
+    @staticmethod
+    def from_payload(payload):
+        task_id = from_str(payload['taskId'])
+        accepted = payload['accepted']
+        return UserConfirmation(task_id, accepted)
+
+    @property
+    def meta_model(self):
+        return "user-confirmation"
+
+
+class FinishConsensus(object):
+    def __init__(self, round_id):
+        """ Sent by the auctioneer after it announced the allocations of a consensus-based round.
+        The robots remove from their timetables the tasks of their bundles that were not allocated to them
+
+        Args:
+            round_id (str): id of the round
+        """
+        self.round_id = round_id
+
+    def to_dict(self):
+        dict_repr = dict()
+        dict_repr['round_id'] = self.round_id
+        return dict_repr
+
+    @staticmethod
+    def from_payload(payload):
+        round_id = from_str(payload['roundId'])
+        return FinishConsensus(round_id)
+
+    @property
+    def meta_model(self):
+        return "finish-consensus"
+
+
+class ConsensusState(object):
+    __slots__ = ['robot_id', 'round_id', 'winners', 'positions', 'timestamps']
+
+    def __init__(self, robot_id, round_id, winners, positions, timestamps):
+        """ View of a robot on the winners of the tasks of a consensus-based round (see
+        mrs.task_allocation.consensus)
+
+        Args:
+            robot_id (str): id of the robot that sends the state
+            round_id (str): id of the round
+            winners (dict): task_id: (cost, robot_id) of the winning bid, or None if no robot bids
+                            for the task
+            positions (dict): task_id: position of the tasks in the bundle of the robot in its timetable
+            timestamps (dict): robot_id: time of the latest information received from the robot
+        """
+        self.robot_id = robot_id
+        self.round_id = round_id
+        self.winners = winners
+        self.positions = positions
+        self.timestamps = timestamps
+
+    def to_dict(self):
+        # Lists instead of dicts keyed by robot ids, which are not valid payload keys
+        dict_repr = dict()
+        dict_repr['robot_id'] = self.robot_id
+        dict_repr['round_id'] = self.round_id
+        dict_repr['winners'] = [[str(task_id), winner[1], list(winner[0])] if winner else [str(task_id)]
+                                for task_id, winner in self.winners.items()]
+        dict_repr['positions'] = [[str(task_id), position] for task_id, position in self.positions.items()]
+        dict_repr['timestamps'] = [[robot_id, time_] for robot_id, time_ in self.timestamps.items()]
+        return dict_repr
+
+    @staticmethod
+    def from_payload(payload):
+        winners = dict()
+        for winner in payload['winners']:
+            winners[from_str(winner[0])] = (tuple(winner[2]), winner[1]) if len(winner) > 1 else None
+        positions = {from_str(task_id): position for task_id, position in payload['positions']}
+        timestamps = {robot_id: time_ for robot_id, time_ in payload['timestamps']}
+        return ConsensusState(payload['robotId'], from_str(payload['roundId']), winners, positions, timestamps)
+
+    @property
+    def meta_model(self):
+        return "consensus-state"
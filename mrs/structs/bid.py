@@ -1,8 +1,14 @@
-import numpy as np
 from ropod.utils.uuid import from_str
 
+INF = float('inf')
+
 
 class Bid(object):
+    """ Bids are ordered by their cost (risk_metric, temporal_metric), which is computed once
+    """
+    __slots__ = ['robot_id', 'round_id', 'task_id', 'timetable', 'position', 'cost', 'hard_constraints',
+                 'alternative_start_time']
+
     def __init__(self, robot_id, round_id, task_id, timetable=None, **kwargs):
 
         self.robot_id = robot_id
@@ -10,8 +16,7 @@ class Bid(object):
         self.task_id = task_id
         self.timetable = timetable
         self.position = kwargs.get('position')
-        self.risk_metric = kwargs.get('risk_metric', np.inf)
-        self.temporal_metric = kwargs.get('temporal_metric', np.inf)
+        self.cost = (kwargs.get('risk_metric', INF), kwargs.get('temporal_metric', INF))
         self.hard_constraints = kwargs.get('hard_constraints', True)
         self.alternative_start_time = kwargs.get('alternative_start_time')
 
@@ -21,17 +26,20 @@ class Bid(object):
     def __lt__(self, other):
         if other is None:
             return False
-        return self.risk_metric < other.risk_metric or \
-               (self.risk_metric == other.risk_metric and self.temporal_metric < other.temporal_metric)
+        return self.cost < other.cost
 
     def __eq__(self, other):
         if other is None:
             return False
-        return self.risk_metric == other.risk_metric and self.temporal_metric == other.temporal_metric
+        return self.cost == other.cost
 
     @property
-    def cost(self):
-        return self.risk_metric, self.temporal_metric
+    def risk_metric(self):
+        return self.cost[0]
+
+    @property
+    def temporal_metric(self):
+        return self.cost[1]
 
     def to_dict(self):
         bid_dict = dict()
@@ -47,21 +55,15 @@ class Bid(object):
 
     @classmethod
     def from_payload(cls, bid_dict):
-        robot_id = bid_dict['robotId']
-        round_id = from_str(bid_dict['roundId'])
-        task_id = from_str(bid_dict['taskId'])
-        position = bid_dict['position']
-        risk_metric = bid_dict['riskMetric']
-        temporal_metric = bid_dict['temporalMetric']
-        hard_constraints = bid_dict['hardConstraints']
-        alternative_start_time = bid_dict['alternativeStartTime']
-
-        bid = cls(robot_id, round_id, task_id,
-                  position=position,
-                  risk_metric=risk_metric,
-                  temporal_metric=temporal_metric,
-                  hard_constraints=hard_constraints,
-                  alternative_start_time=alternative_start_time)
+        bid = cls.__new__(cls)
+        bid.robot_id = bid_dict['robotId']
+        bid.round_id = from_str(bid_dict['roundId'])
+        bid.task_id = from_str(bid_dict['taskId'])
+        bid.timetable = None
+        bid.position = bid_dict['position']
+        bid.cost = (bid_dict['riskMetric'], bid_dict['temporalMetric'])
+        bid.hard_constraints = bid_dict['hardConstraints']
+        bid.alternative_start_time = bid_dict['alternativeStartTime']
         return bid
 
     @property
@@ -0,0 +1,36 @@
+from mrs.utils.stn_encoding import encode_stn
+
+
+class TaskSchedule(object):
+    def __init__(self, task_id, robot_id, start_time, finish_time, schedule=None):
+        """
+        Constructor for the TaskSchedule object
+
+        Args:
+            task_id (str): id of the dispatched task
+            robot_id (str): id of the robot that will execute the task
+            start_time (datetime): time at which the robot should start navigating to the task
+            finish_time (datetime): latest time at which the task should finish
+            schedule (stn): stn containing the timepoints of the task
+        """
+        self.task_id = task_id
+        self.robot_id = robot_id
+        self.start_time = start_time
+        self.finish_time = finish_time
+        self.schedule = schedule
+
+    def to_dict(self):
+        dict_repr = dict()
+        dict_repr['task_id'] = self.task_id
+        dict_repr['robot_id'] = self.robot_id
+        dict_repr['start_time'] = self.start_time.isoformat()
+        dict_repr['finish_time'] = self.finish_time.isoformat()
+        if self.schedule:
+            dict_repr['schedule'] = encode_stn(self.schedule)
+        else:
+            dict_repr['schedule'] = self.schedule
+        return dict_repr
+
+    @property
+    def meta_model(self):
+        return "task-schedule"
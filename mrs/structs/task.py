@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+
+from fmlib.models.tasks import TaskConstraints
+from fmlib.utils.messages import Document
+from ropod.utils.uuid import from_str
+
+
+@dataclass
+class Task:
+    task_id: object
+
+
+@dataclass
+class TaskLot:
+    """ In-memory representation of an announced task lot.
+    Same attributes as the TaskLot model of the ccu store, without database access
+    """
+    task: Task
+    start_location: str
+    finish_location: str
+    constraints: TaskConstraints
+
+    @property
+    def task_id(self):
+        return self.task.task_id
+
+    def to_dict(self):
+        dict_repr = dict()
+        dict_repr['task_id'] = str(self.task.task_id)
+        dict_repr['start_location'] = self.start_location
+        dict_repr['finish_location'] = self.finish_location
+        dict_repr['constraints'] = self.constraints.to_dict()
+        return dict_repr
+
+    @classmethod
+    def from_payload(cls, payload):
+        document = Document.from_payload(payload)
+        constraints = TaskConstraints.from_payload(document.pop('constraints'))
+        return cls(Task(from_str(document['task_id'])),
+                   document.get('start_location'),
+                   document.get('finish_location'),
+                   constraints)
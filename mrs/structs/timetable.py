@@ -1,3 +1,4 @@
+import bisect
 import logging
 from datetime import timedelta
 
@@ -7,6 +8,11 @@ from stn.task import STNTask
 from mrs.db.models.timetable import Timetable as TimetableMongo
 
 from mrs.exceptions.task_allocation import NoSTPSolution
+from mrs.utils import clock
+from mrs.utils.solution_cache import solution_cache
+from mrs.utils.stn_encoding import encode_stn, decode_stn, is_encoded, get_time
+from mrs.utils.temporal_network import shift_zero_timepoint, set_min_duration, TimepointBounds
+from mrs.utils.travel_time import get_travel_time_matrix
 from pymodm.errors import DoesNotExist
 
 logger = logging.getLogger("mrs.timetable")
@@ -26,6 +32,9 @@ class Timetable(object):
     - schedule (stn): Uses the same data structure as the stn but contains only one task
                 (the next task to be executed)
                 The start navigation time is instantiated to a float value (minutes after zero_timepoint)
+
+    The dispatchable graph and the schedule are stored in a compact columnar encoding
+    (see mrs.utils.stn_encoding) and are only decoded when accessed.
     """
 
     def __init__(self, robot_id, stp):
@@ -35,9 +44,59 @@ class Timetable(object):
         self.risk_metric = None
 
         self.robot_id = robot_id
+        # Location of the robot before its first task (finish location of its last executed task)
+        self.location = None
         self.stn = self.initialize_stn()
-        self.dispatchable_graph = None
-        self.schedule = None
+        self._dispatchable_graph = None
+        self._encoded_dispatchable_graph = None
+        self._schedule = None
+        self._encoded_schedule = None
+        self._bounds = None
+
+    @property
+    def dispatchable_graph(self):
+        if self._dispatchable_graph is None and self._encoded_dispatchable_graph:
+            self._dispatchable_graph = decode_stn(self._encoded_dispatchable_graph, self.stp.get_stn())
+            self._encoded_dispatchable_graph = None
+        return self._dispatchable_graph
+
+    @dispatchable_graph.setter
+    def dispatchable_graph(self, dispatchable_graph):
+        self._dispatchable_graph = dispatchable_graph
+        self._encoded_dispatchable_graph = None
+        if dispatchable_graph is None:
+            self._bounds = None
+        elif self._bounds is not None:
+            # The rows of the tasks are read from the new graph when they are used
+            self._bounds.set_graph(dispatchable_graph)
+
+    @property
+    def bounds(self):
+        """ Bounds of the timepoints of the dispatchable graph as arrays (see TimepointBounds).
+        Read once and updated incrementally afterwards: rows are added and removed with the tasks
+        and read from each new dispatchable graph when they are used
+        """
+        if self._bounds is None and self.dispatchable_graph is not None:
+            self._bounds = TimepointBounds.from_graph(self.dispatchable_graph)
+        return self._bounds
+
+    def update_bounds(self, node_ids):
+        """ Updates the bounds of the given timepoints after they changed in the dispatchable graph
+        """
+        if self._bounds is not None:
+            self._bounds.update(self.dispatchable_graph, node_ids)
+
+    @property
+    def schedule(self):
+        if self._schedule is None and self._encoded_schedule:
+            self._schedule = decode_stn(self._encoded_schedule, self.stp.get_stn())
+            self._encoded_schedule = None
+        return self._schedule
+
+    @schedule.setter
+    def schedule(self, schedule):
+        self._schedule = schedule
+        self._encoded_schedule = None
 
     def initialize_stn(self):
         """ Initializes an stn of the type used by the stp solver
@@ -46,70 +105,152 @@ class Timetable(object):
 
     def solve_stp(self):
         """ Computes the dispatchable graph, risk metric and temporal metric
-        from the given stn
+        from the given stn.
+        Reuses a previous solution if it still holds for the stn (see mrs.utils.solution_cache)
         """
-        result_stp = self.stp.solve(self.stn)
+        if not solution_cache.caches(self.stp.solver_name):
+            result_stp = self.stp.solve(self.stn)
+            if result_stp is None:
+                raise NoSTPSolution()
+            self.risk_metric, self.dispatchable_graph = result_stp
+            return
+
+        key, lower_bounds = solution_cache.get_key(self.stp.solver_name, self.stn)
+        result_stp = solution_cache.get(key, lower_bounds, self.stp.get_stn())
 
         if result_stp is None:
-            raise NoSTPSolution()
+            result_stp = self.stp.solve(self.stn)
+            if result_stp is None:
+                raise NoSTPSolution()
+            solution_cache.add(key, lower_bounds, *result_stp)
 
         self.risk_metric, self.dispatchable_graph = result_stp
 
     def compute_temporal_metric(self, temporal_criterion):
         if self.dispatchable_graph:
-            self.temporal_metric = self.stp.compute_temporal_metric(self.dispatchable_graph, temporal_criterion)
+            if temporal_criterion == 'completion_time':
+                self.temporal_metric = self.bounds.get_completion_time()
+            elif temporal_criterion == 'makespan':
+                self.temporal_metric = self.bounds.get_makespan()
+            else:
+                self.temporal_metric = self.stp.compute_temporal_metric(self.dispatchable_graph, temporal_criterion)
         else:
             logger.error("The dispatchable graph is empty. Solve the stp first")
 
     def compute_temporal_info(self):
         if self.dispatchable_graph:
-            idle_time = self.dispatchable_graph.get_idle_time()
+            idle_time = self.bounds.get_idle_time()
             logger.debug("Idle time: %s", idle_time)
-            completion_time = self.dispatchable_graph.get_completion_time()
+            completion_time = self.bounds.get_completion_time()
             logger.debug("Completion time: %s", completion_time)
-            makespan = self.dispatchable_graph.get_makespan()
+            makespan = self.bounds.get_makespan()
             logger.debug("Makespan: %s", makespan)
 
-    def add_task_to_stn(self, task_lot, position):
+    def add_task_to_stn(self, task_lot, position, max_delay=0):
         """
         Adds a task to the stn at the given position
         Args:
             task (obj): task object to add to the stn
             position (int) : position in the STN where the task will be added
+            max_delay (float): minutes the task can start after its latest start time (soft constraints)
         """
-        stn_task = self.to_stn_task(task_lot)
+        stn_task = self.to_stn_task(task_lot, max_delay)
         self.stn.add_task(stn_task, position)
+        if self._bounds is not None:
+            self._bounds.insert(position, stn_task.task_id)
+        # The task that was in this position now starts from the finish location of the new task
+        self.update_durations(position)
+        self.update_durations(position + 1)
 
-    def to_stn_task(self, task_lot):
+    def to_stn_task(self, task_lot, max_delay=0):
         """ Converts a task to an stn task
 
         Args:
             task_lot (obj): task_lot object to be converted
-            zero_timepoint (TimeStamp): Zero Time Point. Origin time to which task temporal information is referenced to
+            max_delay (float): minutes the task can start after its latest start time
         """
         start_timepoint_constraints = task_lot.constraints.timepoint_constraints[0]
 
         r_earliest_start_time, r_latest_start_time = TimepointConstraints.relative_to_ztp(start_timepoint_constraints,
                                                                                           self.zero_timepoint)
         delta = timedelta(minutes=1)
-        earliest_navigation_start = TimeStamp(delta)
+        earliest_navigation_start = clock.now() + delta
         r_earliest_navigation_start = earliest_navigation_start.get_difference(self.zero_timepoint, "minutes")
 
         stn_task = STNTask(task_lot.task.task_id,
                            r_earliest_navigation_start,
                            r_earliest_start_time,
-                           r_latest_start_time,
+                           r_latest_start_time + max_delay,
                            task_lot.start_location,
                            task_lot.finish_location)
 
         return stn_task
 
+    def update_durations(self, position):
+        """ Constrains the task in the given position with the durations of the travel time matrix
+        of the process, if one is configured:
+            navigation -> start: travel time from the previous location (finish location of the previous
+                                 task, or the location of the robot for the task in position 1)
+            start -> finish: work time from the start location to the finish location
+        The durations are the lower bounds of the constraints in the stn, i.e., the stp solver uses them.
+        The travel time is 0 if the previous location is unknown
+
+        :param position: (int) position in the STN
+        """
+        travel_time_matrix = get_travel_time_matrix()
+        if not travel_time_matrix or position > len(self.get_tasks()):
+            return
+
+        task_id = self.stn.get_task_id(position)
+        nodes = {self.stn.nodes[node_id]['data'].node_type: node_id for node_id in self.stn.get_task_node_ids(task_id)}
+        start_location = self.stn.nodes[nodes['start']]['data'].pose
+        finish_location = self.stn.nodes[nodes['finish']]['data'].pose
+
+        previous_location = self.get_finish_location(position - 1) if position > 1 else self.location
+        if previous_location is None:
+            travel_time = 0
+        else:
+            travel_time = travel_time_matrix.get_travel_time(previous_location, start_location)
+        work_time = travel_time_matrix.get_travel_time(start_location, finish_location)
+
+        if travel_time is not None:
+            set_min_duration(self.stn, nodes['navigation'], nodes['start'], travel_time)
+        if work_time is not None:
+            set_min_duration(self.stn, nodes['start'], nodes['finish'], work_time)
+
+    def get_start_location(self, position):
+        """ Returns the start location of the task in the given position
+
+        :param position: (int) position in the STN
+        :return: (string) start location
+        """
+        task_id = self.stn.get_task_id(position)
+        for node_id in self.stn.get_task_node_ids(task_id):
+            node = self.stn.nodes[node_id]['data']
+            if node.node_type == 'start':
+                return node.pose
+
+    def get_finish_location(self, position):
+        """ Returns the finish location of the task in the given position
+
+        :param position: (int) position in the STN
+        :return: (string) finish location
+        """
+        task_id = self.stn.get_task_id(position)
+        for node_id in self.stn.get_task_node_ids(task_id):
+            node = self.stn.nodes[node_id]['data']
+            if node.node_type == 'finish':
+                return node.pose
+
     def remove_task_from_stn(self, position):
         """ Removes task from the stn at the given position
         Args:
             position (int): the task at this position in the STN will be removed
         """
         self.stn.remove_task(position)
+        self.update_durations(position)
+        if self._bounds is not None:
+            self._bounds.remove(position)
 
     def get_tasks(self):
         """ Returns the tasks contained in the timetable
@@ -133,11 +274,89 @@ class Timetable(object):
         """
         return self.stn.get_earliest_task_id()
 
+    def get_task_position(self, task_id):
+        """ Returns the position of the task in the STN
+
+        :param task_id: (string) task id
+        :return: (int) position in the STN or None if the task is not in the timetable
+        """
+        tasks = list(self.get_tasks())
+        if task_id in tasks:
+            return tasks.index(task_id) + 1
+
+    def get_chronological_position(self, task_lot):
+        """ Returns the position where the task would be if the tasks in the timetable
+        were sorted by their earliest start time
+
+        :param task_lot: task_lot object
+        :return: (int) position in the STN
+        """
+        start_timepoint_constraints = task_lot.constraints.timepoint_constraints[0]
+        r_earliest_start_time, _ = TimepointConstraints.relative_to_ztp(start_timepoint_constraints,
+                                                                        self.zero_timepoint)
+        earliest_start_times = [self.stn.get_time(task_id, 'start') for task_id in self.get_tasks()]
+        return bisect.bisect_right(earliest_start_times, r_earliest_start_time) + 1
+
     def remove_task(self, position=1):
+        """ Removes the task in the given position from the stn and the dispatchable graph.
+        The travel time of the next task is updated in the stn, i.e., in the next solution
+        """
         self.stn.remove_task(position)
+        self.update_durations(position)
         self.dispatchable_graph.remove_task(position)
-        # Reset schedule (there is only one task in the schedule)
-        self.schedule = None
+        if self._bounds is not None:
+            self._bounds.remove(position)
+        if position == 1:
+            # Reset schedule (there is only one task in the schedule, the task in position 1)
+            self.schedule = None
+
+    def update_zero_timepoint(self, zero_timepoint, completed_task_ids=()):
+        """ Rolling horizon: moves the zero_timepoint forward to the given zero_timepoint.
+
+        The completed tasks at the beginning of the timetable are removed and the bounds of the
+        remaining timepoints are shifted to be relative to the new zero_timepoint. This keeps the
+        size of the stn bounded. Tasks that should have finished before the new zero_timepoint
+        (the upper bound of their finish time is before it) but are not completed are kept and
+        returned as overdue.
+
+        :param zero_timepoint: (TimeStamp) new zero_timepoint
+        :param completed_task_ids: ids of the tasks known to be completed
+        :return: (list of removed task ids, list of overdue task ids)
+        """
+        if self.zero_timepoint is None:
+            self.zero_timepoint = zero_timepoint
+            return list(), list()
+
+        delta = zero_timepoint.get_difference(self.zero_timepoint, "minutes")
+        if delta <= 0:
+            return list(), list()
+
+        removed_task_ids = list()
+        while self.dispatchable_graph and self.get_tasks():
+            task_id = self.get_task_id(1)
+            if task_id not in completed_task_ids:
+                break
+            self.location = self.get_finish_location(1)
+            self.remove_task(1)
+            removed_task_ids.append(task_id)
+
+        overdue_task_ids = list()
+        if self.dispatchable_graph:
+            overdue_task_ids = [task_id for task_id in self.get_tasks()
+                                if self.get_time(task_id, "finish", False) <= delta]
+
+        for graph in [self.stn, self.dispatchable_graph, self.schedule]:
+            if graph:
+                shift_zero_timepoint(graph, delta)
+        if self._bounds is not None:
+            self._bounds.shift(delta)
+
+        self.zero_timepoint = zero_timepoint
+        logger.debug("Timetable of robot %s: zero timepoint moved %s minutes forward. Removed %s completed tasks",
+                     self.robot_id, delta, len(removed_task_ids))
+        if overdue_task_ids:
+            logger.warning("Timetable of robot %s: tasks %s are overdue", self.robot_id, overdue_task_ids)
+        return removed_task_ids, overdue_task_ids
 
     def get_scheduled_task_id(self):
         if self.schedule is None:
@@ -160,6 +379,25 @@ class Timetable(object):
         else:
             logger.error("The dispatchable graph is empty")
 
+    def get_time(self, task_id, node_type='navigation', lower_bound=True):
+        """ Returns the time of a timepoint in the dispatchable graph.
+        Reads the time from the encoded dispatchable graph if it has not been decoded yet
+
+        :param task_id: id of the task the timepoint belongs to
+        :param node_type: type of timepoint (navigation, start, finish)
+        :param lower_bound: returns the lower bound if True, the upper bound otherwise
+        :return: time (float) relative to the zero_timepoint
+        """
+        if self._dispatchable_graph is None and self._encoded_dispatchable_graph:
+            return get_time(self._encoded_dispatchable_graph, task_id, node_type, lower_bound)
+        return self.dispatchable_graph.get_time(task_id, node_type, lower_bound)
+
+    @staticmethod
+    def _encode(stn, encoded_stn=None):
+        if stn:
+            return encode_stn(stn)
+        return encoded_stn
+
     def to_dict(self):
         timetable_dict = dict()
         timetable_dict['robot_id'] = self.robot_id
@@ -169,23 +407,13 @@ class Timetable(object):
         else:
             timetable_dict['zero_timepoint'] = self.zero_timepoint
 
+        timetable_dict['location'] = self.location
         timetable_dict['risk_metric'] = self.risk_metric
         timetable_dict['temporal_metric'] = self.temporal_metric
-
-        if self.stn:
-            timetable_dict['stn'] = self.stn.to_dict()
-        else:
-            timetable_dict['stn'] = self.stn
-
-        if self.dispatchable_graph:
-            timetable_dict['dispatchable_graph'] = self.dispatchable_graph.to_dict()
-        else:
-            timetable_dict['dispatchable_graph'] = self.dispatchable_graph
-
-        if self.schedule:
-            timetable_dict['schedule'] = self.schedule.to_dict()
-        else:
-            timetable_dict['schedule'] = self.schedule
+        timetable_dict['stn'] = self._encode(self.stn)
+        timetable_dict['dispatchable_graph'] = self._encode(self._dispatchable_graph,
+                                                            self._encoded_dispatchable_graph)
+        timetable_dict['schedule'] = self._encode(self._schedule, self._encoded_schedule)
 
         return timetable_dict
 
@@ -201,33 +429,42 @@ class Timetable(object):
         else:
             timetable.zero_timepoint = zero_timepoint
 
+        timetable.location = timetable_dict.get('location')
         timetable.risk_metric = timetable_dict['risk_metric']
         timetable.temporal_metric = timetable_dict['temporal_metric']
 
         stn = timetable_dict.get('stn')
         if stn:
-            timetable.stn = stn_cls.from_dict(stn)
+            timetable.stn = decode_stn(stn, stn_cls)
         else:
             timetable.stn = stn
 
-        dispatchable_graph = timetable_dict.get('dispatchable_graph')
-        if dispatchable_graph:
-            timetable.dispatchable_graph = stn_cls.from_dict(dispatchable_graph)
-        else:
-            timetable.dispatchable_graph = dispatchable_graph
-
-        schedule = timetable_dict.get('schedule')
-        if schedule:
-            timetable.schedule = stn_cls.from_dict(schedule)
-        else:
-            timetable.schedule = schedule
+        timetable.set_encoded_graphs(timetable_dict.get('dispatchable_graph'), timetable_dict.get('schedule'), stn_cls)
 
         return timetable
 
-    def store(self):
+    def set_encoded_graphs(self, dispatchable_graph, schedule, stn_cls):
+        """ Sets the dispatchable graph and the schedule from their dictionary representation.
+        Columnar encoded graphs are decoded the first time they are accessed
+        """
+        if is_encoded(dispatchable_graph):
+            self._dispatchable_graph = None
+            self._encoded_dispatchable_graph = dispatchable_graph
+            self._bounds = None
+        elif dispatchable_graph:
+            self.dispatchable_graph = stn_cls.from_dict(dispatchable_graph)
+
+        if is_encoded(schedule):
+            self._schedule = None
+            self._encoded_schedule = schedule
+        elif schedule:
+            self.schedule = stn_cls.from_dict(schedule)
 
-        timetable = TimetableMongo(self.robot_id, self.zero_timepoint.to_datetime(),
-                                   self.stn.to_dict(), self.dispatchable_graph.to_dict())
+    def store(self):
+        timetable = TimetableMongo(self.robot_id, self.zero_timepoint.to_datetime(), self.location,
+                                   self._encode(self.stn),
+                                   self._encode(self._dispatchable_graph, self._encoded_dispatchable_graph),
+                                   self._encode(self._schedule, self._encoded_schedule) or dict())
         timetable.save()
 
     @staticmethod
@@ -236,9 +473,12 @@ class Timetable(object):
         try:
             timetable_mongo = TimetableMongo.objects.get_timetable(robot_id)
             # TODO: Add missing arguments to TimetableMongo
-            timetable.stn = timetable.stn.from_dict(timetable_mongo.stn)
-            timetable.dispatchable_graph = timetable.stn.from_dict(timetable_mongo.dispatchable_graph)
-            timetable.zero_timepoint = timetable_mongo.zero_timepoint
+            stn_cls = timetable.initialize_stn()
+            timetable.stn = decode_stn(timetable_mongo.stn, stn_cls)
+            timetable.set_encoded_graphs(timetable_mongo.dispatchable_graph, timetable_mongo.schedule, stn_cls)
+            timetable.zero_timepoint = TimeStamp()
+            timetable.zero_timepoint.timestamp = timetable_mongo.zero_timepoint
+            timetable.location = timetable_mongo.location
         except DoesNotExist as err:
             logging.warning("The timetable does not exist %s", err)
 
@@ -0,0 +1,109 @@
+""" Pre-announcement filter
+
+Selects, for each task, the robots that could plausibly bid for it, based on the timetables the
+auctioneer keeps for each robot. A robot could insert a task in the gaps between its tasks or after
+its last task. A gap starts when the previous task finishes (at the finish location of the previous
+task) and ends when the robot has to start navigating to the next task.
+A robot receives a task if, in at least one gap, it can reach the start location of the task
+before its latest start time and the gap ends after the earliest start time of the task.
+
+Tasks whose earliest start time is more than horizon minutes away are not announced yet.
+"""
+import logging
+
+from fmlib.models.tasks import TimepointConstraints
+
+from mrs.utils import clock
+from mrs.utils.travel_time import get_travel_time_matrix
+
+
+class AnnouncementFilter(object):
+
+    def __init__(self, horizon=None):
+        """
+        :param horizon: (minutes) tasks starting later than horizon minutes from now are not announced yet.
+                        If None, all tasks are announced
+        """
+        self.logger = logging.getLogger('mrs.auctioneer.announcement_filter')
+        self.horizon = horizon
+
+    def filter_horizon(self, tasks, zero_timepoint):
+        """ Returns the tasks whose earliest start time is within the horizon
+
+        :param tasks: dict of task_id: task_lot
+        :param zero_timepoint: (TimeStamp) zero timepoint of the timetables
+        :return: dict of task_id: task_lot
+        """
+        if self.horizon is None:
+            return tasks
+
+        r_now = clock.now().get_difference(zero_timepoint, "minutes")
+        return {task_id: task_lot for task_id, task_lot in tasks.items()
+                if self.get_start_window(task_lot, zero_timepoint)[0] - r_now <= self.horizon}
+
+    def get_recipients(self, tasks_lots, robot_ids, timetables, zero_timepoint):
+        """ Returns the robots that could bid for each task.
+        A task that no robot can accommodate is sent to all robots
+
+        :param tasks_lots: list of task_lots to announce
+        :param robot_ids: robots taking part in the round
+        :param timetables: dict of robot_id: timetable
+        :param zero_timepoint: (TimeStamp) zero timepoint of the timetables
+        :return: dict of task_id (str): list of robot_ids
+        """
+        r_now = clock.now().get_difference(zero_timepoint, "minutes")
+        gaps = {robot_id: self.get_gaps(timetables.get(robot_id), r_now) for robot_id in robot_ids}
+
+        recipients = dict()
+        for task_lot in tasks_lots:
+            r_earliest_start_time, r_latest_start_time = self.get_start_window(task_lot, zero_timepoint)
+            task_recipients = [robot_id for robot_id in robot_ids
+                               if self.fits(task_lot, r_earliest_start_time, r_latest_start_time, gaps[robot_id])]
+
+            if not task_recipients:
+                task_recipients = list(robot_ids)
+
+            self.logger.debug("Announcing task %s to %s of %s robots", task_lot.task.task_id, len(task_recipients),
+                              len(robot_ids))
+            recipients[str(task_lot.task.task_id)] = task_recipients
+
+        return recipients
+
+    @staticmethod
+    def get_start_window(task_lot, zero_timepoint):
+        start_timepoint_constraints = task_lot.constraints.timepoint_constraints[0]
+        return TimepointConstraints.relative_to_ztp(start_timepoint_constraints, zero_timepoint)
+
+    @staticmethod
+    def get_gaps(timetable, r_now):
+        """ Returns the gaps of a timetable as a list of (start, end, location).
+        Times are relative to the zero_timepoint. The location at the first gap is unknown (None)
+        """
+        if timetable is None or not timetable.get_tasks() or timetable.dispatchable_graph is None:
+            return [(r_now, float('inf'), None)]
+
+        gaps = list()
+        gap_start, location = r_now, None
+        for position, task_id in enumerate(timetable.get_tasks(), 1):
+            if not (position == 1 and timetable.schedule):
+                # Position 1 is reserved to the scheduled task
+                gap_end = timetable.get_time(task_id, 'navigation', lower_bound=False)
+                gaps.append((gap_start, gap_end, location))
+            gap_start = max(r_now, timetable.get_time(task_id, 'finish'))
+            location = timetable.get_finish_location(position)
+
+        gaps.append((gap_start, float('inf'), location))
+        return gaps
+
+    @staticmethod
+    def fits(task_lot, r_earliest_start_time, r_latest_start_time, gaps):
+        travel_time_matrix = get_travel_time_matrix()
+
+        for gap_start, gap_end, location in gaps:
+            travel_time = None
+            if travel_time_matrix and location:
+                travel_time = travel_time_matrix.get_travel_time(location, task_lot.start_location)
+            if gap_start + (travel_time or 0) <= r_latest_start_time and r_earliest_start_time <= gap_end:
+                return True
+
+        return False
@@ -1,15 +1,32 @@
+import collections
+import copy
 import logging
-from datetime import datetime
 from datetime import timedelta
 
+from mrs.db.models.performance.task import TaskPerformance
 from mrs.db.models.task import TaskLot
 from mrs.exceptions.task_allocation import AlternativeTimeSlot
+from mrs.db.connection import bulk_write, in_bulk_write
 from mrs.exceptions.task_allocation import NoAllocation
-from mrs.structs.allocation import TaskAnnouncement, Allocation
+from mrs.exceptions.task_allocation import NoSTPSolution
+from mrs.structs.allocation import TaskAnnouncement, Allocation, ReAllocation, ConsensusState, FinishConsensus, \
+    UserConfirmation
+from mrs.structs.bid import Bid
 from mrs.structs.timetable import Timetable
+from mrs.task_allocation.announcement_filter import AnnouncementFilter
+from mrs.task_allocation.bidding_rule import BiddingRule
+from mrs.task_allocation.consensus import ConsensusMonitor
+from mrs.task_allocation.partition import Partitioner
+from mrs.task_allocation.quote import Quoter
 from mrs.task_allocation.round import Round
+from mrs.task_allocation.round_timer import RoundTimer
+from mrs.task_allocation.schedule_index import ScheduleIndex
+from mrs.utils import clock
+from mrs.utils import travel_time
+from mrs.utils.solution_cache import SolutionCache
 from ropod.structs.task import TaskStatus as TaskStatusConst
-from ropod.utils.timestamp import TimeStamp
+from ropod.utils.uuid import from_str
+from pymodm.errors import DoesNotExist
 from stn.stp import STP
 
 """ Implements a variation of the the TeSSI algorithm using the bidding_rule 
@@ -26,76 +43,263 @@ class Auctioneer(object):
 
         self.robot_ids = list()
         self.timetables = dict()
+        # robot_id: number of times the timetable was updated
+        self.timetable_versions = dict()
 
         self.api = api
         self.stp = STP(stp_solver)
 
+        # With the cbba allocation method, the robots agree on the winners among themselves and
+        # the auctioneer only announces the tasks and records the allocations
         self.allocation_method = allocation_method
+        # partition_id: ConsensusMonitor of the round of the partition (cbba)
+        self.consensus_monitors = dict()
         self.round_time = timedelta(seconds=round_time)
+        self.re_allocation_round_time = timedelta(seconds=kwargs.get('re_allocation_round_time', 2))
+        # Round times set from the observed bid latencies, capped by the configured round times
+        round_timer_config = kwargs.get('adaptive_round_time')
+        self.round_timer = RoundTimer(**round_timer_config) if round_timer_config else None
         self.alternative_timeslots = kwargs.get('alternative_timeslots', False)
 
+        travel_time_matrix_config = kwargs.get('travel_time_matrix')
+        if travel_time_matrix_config:
+            travel_time.configure(**travel_time_matrix_config)
+
         self.logger.debug("Auctioneer started")
 
         self.tasks_to_allocate = dict()
+        self.tasks_to_re_allocate = dict()
+        # Time (seconds since the epoch) at which the (re-)allocation of a task started
+        self.allocation_start_times = dict()
         self.allocations = list()
         self.waiting_for_user_confirmation = list()
-        self.round = Round()
-
-        # TODO: Update zero_timepoint
-        today_midnight = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
-        self.zero_timepoint = TimeStamp()
-        self.zero_timepoint.timestamp = today_midnight
+        # task_id: task_lot of the tasks waiting for user confirmation
+        self.alternative_tasks_lots = dict()
+
+        # Disjoint partitions of robots. Each partition runs its own rounds concurrently
+        self.partitioner = Partitioner(kwargs.get('n_partitions', 1),
+                                       kwargs.get('partition_by', 'load'),
+                                       kwargs.get('rebalance_threshold', 2))
+        # partition_id: round
+        self.rounds = {partition_id: Round() for partition_id in self.partitioner.partitions}
+
+        # Announce each task only to the robots that could bid for it
+        self.filter_announcements = kwargs.get('filter_announcements', False)
+        self.announcement_filter = AnnouncementFilter(kwargs.get('announcement_horizon'))
+
+        # The auctioneer computes the bids of robots with at most proxy_bidding_threshold tasks.
+        # If None, all robots compute their own bids
+        self.proxy_bidding_threshold = kwargs.get('proxy_bidding_threshold')
+        bidding_rule_config = kwargs.get('bidding_rule', dict())
+        self.bidding_rule = BiddingRule(bidding_rule_config.get('robustness', stp_solver),
+                                        bidding_rule_config.get('temporal', 'completion_time'),
+                                        max_delay=bidding_rule_config.get('max_delay', 120))
+
+        self.quoter = Quoter(self.bidding_rule, kwargs.get('n_quote_workers', 4))
+        self.schedule_index = ScheduleIndex()
+
+        # Callables that receive a robot's timetable each time it is updated
+        self.timetable_listeners = list()
+
+        self.zero_timepoint = clock.today()
+
+        # Rolling horizon (minutes): the zero_timepoint is moved forward and executed tasks are
+        # removed from the timetables every rolling_horizon minutes
+        self.rolling_horizon = kwargs.get('rolling_horizon')
+        # Tasks reported as completed (TASK-PROGRESS) that are still in the timetables
+        self.completed_task_ids = set()
 
     def register_robot(self, robot_id):
         self.robot_ids.append(robot_id)
+        self.partitioner.add_robot(robot_id)
         self.get_timetable(robot_id)
+        self.schedule_index.update(robot_id, self.timetables[robot_id])
 
     def get_timetable(self, robot_id):
+        # Saves queued in a bulk write are not visible to reads: the cached timetable holds them
+        if in_bulk_write() and robot_id in self.timetables:
+            return
         timetable = Timetable.fetch(robot_id, self.stp)
         self.timetables[robot_id] = timetable
 
-    def run(self):
-        if self.tasks_to_allocate and self.round.finished:
-            self.announce_task()
+    def quote(self, task_lot):
+        """ Returns the robot, position and start time at which the task would be allocated,
+        without allocating it. Read only: the timetables are not modified
 
-        if self.round.opened and self.round.time_to_close():
-            try:
-                round_result = self.round.get_result()
-                allocation = self.process_allocation(round_result)
-                allocated_task, winner_robot_ids = allocation
-                for robot_id in winner_robot_ids:
-                    self.announce_winner(allocated_task, robot_id)
+        :param task_lot: task to quote
+        :return: dict (robot_id, position, start_time, risk_metric, temporal_metric) or None
+                 if no robot can accommodate the task
+        """
+        return self.quoter.quote(task_lot, self.timetables, self.timetable_versions, self.zero_timepoint,
+                                 self.completed_task_ids)
+
+    def get_idle_robots(self, start_time, finish_time):
+        """ Returns the robots without tasks between start_time and finish_time (datetime or TimeStamp)
+        """
+        return self.schedule_index.get_idle_robots(start_time, finish_time)
+
+    def get_earliest_slot(self, location, after, duration=0):
+        """ Returns the robot that can be at the location the earliest, after the given time, and
+        stay there for duration minutes without delaying its tasks
 
-            except NoAllocation as exception:
-                self.logger.error("No mrs made in round %s ", exception.round_id)
-                self.round.finish()
+        :return: (robot_id, datetime) or None
+        """
+        return self.schedule_index.get_earliest_slot(location, after, duration)
 
-            except AlternativeTimeSlot as exception:
-                self.process_alternative_allocation(exception)
-                self.round.finish()
+    def run(self):
+        idle_partition_ids = [partition_id for partition_id, round_ in self.rounds.items() if round_.finished]
+
+        if self.rolling_horizon and len(idle_partition_ids) == len(self.rounds):
+            self.update_zero_timepoint()
+
+        self.partitioner.rebalance(self.tasks_to_allocate, idle_partition_ids)
+
+        for partition_id in idle_partition_ids:
+            self.start_round(partition_id)
+
+        # The timetables and performance metrics updated by the rounds are written together
+        with bulk_write():
+            for partition_id, round_ in self.rounds.items():
+                if not round_.opened:
+                    continue
+                if self.allocation_method == 'cbba':
+                    if self.consensus_monitors[partition_id].converged() or round_.time_to_close():
+                        self.record_consensus(partition_id, round_)
+                elif round_.time_to_close():
+                    self.elect_winner(partition_id, round_)
+
+    def start_round(self, partition_id):
+        # Re-allocations have priority and are announced in a shorter round
+        tasks_to_re_allocate = self.partitioner.get_tasks(partition_id, self.tasks_to_re_allocate, self.timetables)
+        if tasks_to_re_allocate:
+            self.announce_task(tasks_to_re_allocate, self.re_allocation_round_time, re_allocation=True,
+                               partition_id=partition_id)
+            return
+
+        tasks_to_allocate = self.partitioner.get_tasks(partition_id, self.tasks_to_allocate, self.timetables)
+        tasks_to_allocate = self.announcement_filter.filter_horizon(tasks_to_allocate, self.zero_timepoint)
+        if tasks_to_allocate:
+            self.announce_task(tasks_to_allocate, self.round_time, partition_id=partition_id)
+
+    def elect_winner(self, partition_id, round_):
+        try:
+            round_result = round_.get_result()
+            allocation = self.process_allocation(round_result)
+            allocated_task, winner_robot_ids = allocation
+            position = round_result[2]
+            for robot_id in winner_robot_ids:
+                self.announce_winner(allocated_task, robot_id, position)
+
+        except NoAllocation as exception:
+            self.logger.error("No mrs made in round %s ", exception.round_id)
+            # The tasks will be announced to another partition
+            self.partitioner.release_tasks(partition_id, round_.tasks_to_allocate)
+            if round_.re_allocation:
+                # Tasks that could not be re-allocated wait for a regular round
+                for task_id in round_.tasks_to_allocate:
+                    self.tasks_to_allocate[task_id] = self.tasks_to_re_allocate.pop(task_id)
+            round_.finish()
+
+        except AlternativeTimeSlot as exception:
+            task_lot = self.tasks_to_allocate.get(exception.task_id) or \
+                       self.tasks_to_re_allocate.get(exception.task_id)
+            self.alternative_tasks_lots[exception.task_id] = task_lot
+            self.remove_pending_task(exception.task_id)
+            self.process_alternative_allocation(exception)
+            round_.finish()
+
+    def remove_pending_task(self, task_id):
+        self.tasks_to_allocate.pop(task_id, None)
+        self.tasks_to_re_allocate.pop(task_id, None)
+        self.partitioner.remove_task(task_id)
+
+    def update_zero_timepoint(self):
+        """ Moves the zero_timepoint to the current time if it is more than rolling_horizon
+        minutes old, and compacts the timetables of all robots.
+        Robots compact their timetables when they receive the new zero_timepoint in the next
+        task announcement
+        """
+        zero_timepoint = clock.now()
+        if zero_timepoint.get_difference(self.zero_timepoint, "minutes") < self.rolling_horizon:
+            return
+
+        # Start of the current minute (timetables are stored with millisecond resolution)
+        zero_timepoint.timestamp = zero_timepoint.timestamp.replace(second=0, microsecond=0)
+        self.logger.debug("Moving zero_timepoint from %s to %s", self.zero_timepoint, zero_timepoint)
+        self.zero_timepoint = zero_timepoint
+
+        with bulk_write():
+            for robot_id in self.robot_ids:
+                self.get_timetable(robot_id)
+                timetable = self.timetables.get(robot_id)
+                self.rebase_timetable(timetable)
+                self.store_timetable(robot_id, timetable)
+
+    def rebase_timetable(self, timetable):
+        """ Moves the timetable to the zero_timepoint of the auctioneer and removes its completed tasks.
+        Overdue tasks are kept: the robot requests their re-allocation when it receives the new
+        zero_timepoint
+        """
+        removed_task_ids, overdue_task_ids = timetable.update_zero_timepoint(self.zero_timepoint,
+                                                                             self.completed_task_ids)
+        self.completed_task_ids.difference_update(removed_task_ids)
+
+    def task_progress_cb(self, msg):
+        payload = msg['payload']
+        if payload.get('taskStatus') == TaskStatusConst.COMPLETED or payload.get('timepoint') == 'finish':
+            self.completed_task_ids.add(from_str(payload['taskId']))
 
     def process_allocation(self, round_result):
 
         task_lot, robot_id, position, tasks_to_allocate = round_result
 
+        allocation = self.register_allocation(task_lot, robot_id)
+        self.update_timetable(robot_id, [(task_lot, position)])
+        self.update_allocation_time(task_lot.task.task_id)
+
+        return allocation
+
+    def register_allocation(self, task_lot, robot_id):
         allocation = (task_lot.task.task_id, [robot_id])
         self.allocations.append(allocation)
-        self.tasks_to_allocate = tasks_to_allocate
+        self.remove_pending_task(task_lot.task.task_id)
 
         self.logger.debug("Allocation: %s", allocation)
         self.logger.debug("Tasks to allocate %s", [task_id for task_id, task in self.tasks_to_allocate.items()])
 
         self.logger.debug("Updating task status to ALLOCATED")
         task_lot.task.update_status(TaskStatusConst.ALLOCATED)
-        self.update_timetable(robot_id, task_lot, position)
 
         return allocation
 
-    def update_timetable(self, robot_id, task_lot, position):
+    def update_allocation_time(self, task_id):
+        start_time = self.allocation_start_times.pop(task_id, None)
+        if start_time is None:
+            return
+
+        allocation_time = clock.time() - start_time
+        self.logger.debug("Task %s allocated in %.3f s", task_id, allocation_time)
+
+        task_performance = self.get_task_performance(task_id)
+        if task_performance:
+            task_performance.update_allocation(allocation_time)
+
+    def get_task_performance(self, task_id):
+        try:
+            return TaskPerformance.objects.get({'_id': task_id})
+        except DoesNotExist:
+            self.logger.warning("No performance information for task %s", task_id)
+
+    def update_timetable(self, robot_id, allocations):
+        """ Inserts the allocated tasks in the timetable of the robot and stores it once
+
+        :param allocations: list of (task_lot, position), sorted by position
+        """
         self.get_timetable(robot_id)
         timetable = self.timetables.get(robot_id)
-        timetable.zero_timepoint = self.zero_timepoint
-        timetable.add_task_to_stn(task_lot, position)
+        self.rebase_timetable(timetable)
+        for task_lot, position in allocations:
+            timetable.add_task_to_stn(task_lot, position)
         timetable.solve_stp()
 
         # Update schedule to reflect the changes in the dispatchable graph
@@ -103,12 +307,56 @@ class Auctioneer(object):
             # TODO: Request re-scheduling to the scheduler via pyre
             pass
 
-        self.timetables.update({robot_id: timetable})
-        timetable.store()
+        self.store_timetable(robot_id, timetable)
 
         self.logger.debug("STN robot %s: %s", robot_id, timetable.stn)
         self.logger.debug("Dispatchable graph robot %s: %s", robot_id, timetable.dispatchable_graph)
 
+    def store_timetable(self, robot_id, timetable):
+        self.timetables.update({robot_id: timetable})
+        self.timetable_versions[robot_id] = self.timetable_versions.get(robot_id, 0) + 1
+        self.schedule_index.update(robot_id, timetable)
+        timetable.store()
+
+        for listener in self.timetable_listeners:
+            listener(timetable)
+
+    def re_allocate(self, task_id, robot_id):
+        """ Removes the task from the robot's timetable and queues it for a re-allocation round
+
+        :param task_id: id of the task to re-allocate
+        :param robot_id: id of the robot the task was allocated to
+        """
+        self.allocation_start_times[task_id] = clock.time()
+
+        self.get_timetable(robot_id)
+        timetable = self.timetables.get(robot_id)
+        position = timetable.get_task_position(task_id)
+        if position is None:
+            self.logger.warning("Task %s is not in the timetable of robot %s", task_id, robot_id)
+        else:
+            timetable.remove_task(position)
+            self.store_timetable(robot_id, timetable)
+
+        try:
+            task_lot = TaskLot.objects.get_task_lot(task_id)
+        except DoesNotExist:
+            self.logger.error("Task %s cannot be re-allocated: task lot not found", task_id)
+            return
+
+        task_lot.update_status(TaskStatusConst.UNALLOCATED)
+        task_performance = self.get_task_performance(task_id)
+        if task_performance:
+            task_performance.update_re_allocation_attempts()
+
+        self.tasks_to_re_allocate[task_id] = task_lot
+        self.logger.debug("Re-allocating task %s (previously allocated to robot %s)", task_id, robot_id)
+
+    def re_allocation_cb(self, msg):
+        payload = msg['payload']
+        re_allocation = ReAllocation.from_payload(payload)
+        self.re_allocate(re_allocation.task_id, re_allocation.robot_id)
+
     def process_alternative_allocation(self, exception):
         task_id = exception.task_id
         robot_id = exception.robot_id
@@ -116,12 +364,53 @@ class Auctioneer(object):
         self.logger.debug("Alternative timeslot for task %s: robot %s, alternative start time: %s ", task_id, robot_id,
                           alternative_start_time)
 
-        alternative_allocation = (task_id, [robot_id], alternative_start_time)
+        # The alternative start time is relative to the zero_timepoint of the round, which moves
+        # while the user answers
+        earliest_start_time = self.zero_timepoint + timedelta(minutes=alternative_start_time)
+        alternative_allocation = (task_id, [robot_id], earliest_start_time.to_datetime())
         self.waiting_for_user_confirmation.append(alternative_allocation)
 
+    def user_confirmation_cb(self, msg):
+        payload = msg['payload']
+        user_confirmation = UserConfirmation.from_payload(payload)
+        self.process_user_confirmations({user_confirmation.task_id: user_confirmation.accepted})
+
+    def process_user_confirmations(self, confirmations):
+        """ Processes a batch of user confirmations of alternative timeslots.
+        Accepted tasks are moved to their alternative start time and allocated together in the next round.
+        Rejected tasks are canceled
+
+        :param confirmations: dict of task_id: True if the user accepts the alternative start time
+        """
+        waiting_for_user_confirmation = list()
+
+        for alternative_allocation in self.waiting_for_user_confirmation:
+            task_id, robot_ids, earliest_start_time = alternative_allocation
+            if task_id not in confirmations:
+                waiting_for_user_confirmation.append(alternative_allocation)
+                continue
+
+            task_lot = self.alternative_tasks_lots.pop(task_id)
+            if confirmations[task_id]:
+                self.logger.debug("Alternative timeslot of task %s accepted", task_id)
+                start_timepoint_constraints = task_lot.constraints.timepoint_constraints[0]
+                time_window = start_timepoint_constraints.latest_time - start_timepoint_constraints.earliest_time
+                start_timepoint_constraints.earliest_time = earliest_start_time
+                start_timepoint_constraints.latest_time = earliest_start_time + time_window
+                task_lot.save()
+                self.tasks_to_allocate[task_id] = task_lot
+            else:
+                self.logger.debug("Alternative timeslot of task %s rejected", task_id)
+                task_lot.update_status(TaskStatusConst.CANCELED)
+
+        self.waiting_for_user_confirmation = waiting_for_user_confirmation
+
     def add_task(self, task):
-        task_lot = TaskLot.from_task(task)
+        self.add_task_lot(TaskLot.from_task(task))
+
+    def add_task_lot(self, task_lot):
         self.tasks_to_allocate[task_lot.task.task_id] = task_lot
+        self.allocation_start_times[task_lot.task.task_id] = clock.time()
 
     def allocate(self, tasks):
         if isinstance(tasks, list):
@@ -132,37 +421,224 @@ class Auctioneer(object):
             self.add_task(tasks)
             self.logger.debug('Auctioneer received one task')
 
-    def announce_task(self):
-
-        round_ = {'tasks_to_allocate': self.tasks_to_allocate,
-                  'round_time': self.round_time,
-                  'n_robots': len(self.robot_ids),
-                  'alternative_timeslots': self.alternative_timeslots}
-
-        self.round = Round(**round_)
+    def announce_task(self, tasks_to_allocate, round_time, re_allocation=False, partition_id=0):
+        robot_ids = self.partitioner.partitions[partition_id]
+        tasks_lots = list(tasks_to_allocate.values())
+
+        recipients = None
+        n_robots_per_task = dict()
+        if self.filter_announcements:
+            recipients = self.announcement_filter.get_recipients(tasks_lots, robot_ids, self.timetables,
+                                                                 self.zero_timepoint)
+            n_robots_per_task = {task_lot.task.task_id: len(recipients[str(task_lot.task.task_id)])
+                                 for task_lot in tasks_lots}
+
+        proxied_robot_ids = self.get_proxied_robot_ids(robot_ids) if self.allocation_method != 'cbba' else list()
+
+        n_tasks = None
+        if self.round_timer and self.allocation_method != 'cbba':
+            n_tasks = self.get_n_announced_tasks(tasks_lots, robot_ids, recipients, proxied_robot_ids)
+            round_time = self.round_timer.get_round_time(n_tasks, round_time)
+
+        round_ = {'tasks_to_allocate': tasks_to_allocate,
+                  'round_time': round_time,
+                  'n_robots': len(robot_ids),
+                  'n_robots_per_task': n_robots_per_task,
+                  'alternative_timeslots': self.alternative_timeslots,
+                  're_allocation': re_allocation}
+
+        round_ = Round(**round_)
+        self.rounds[partition_id] = round_
+
+        self.logger.debug("Starting round %s in partition %s", round_.id, partition_id)
+        self.logger.debug("Number of tasks to allocate: %s", len(tasks_to_allocate))
+
+        round_.start()
+        if n_tasks is not None:
+            self.logger.debug("Round time: %s s", round_time.total_seconds())
+            self.round_timer.add_round(round_.id, round_time, n_tasks)
+
+        task_announcement = TaskAnnouncement(tasks_lots, round_.id, self.zero_timepoint, round_.closure_time,
+                                             robot_ids if self.partitioner.n_partitions > 1 else None,
+                                             recipients, proxied_robot_ids, self.alternative_timeslots)
+        msg = self.api.create_message(task_announcement)
 
-        self.logger.debug("Starting round: %s", self.round.id)
-        self.logger.debug("Number of tasks to allocate: %s", len(self.tasks_to_allocate))
+        self.logger.debug("Auctioneer announces tasks %s", [task_id for task_id, task in tasks_to_allocate.items()])
 
-        tasks_lots = list(self.tasks_to_allocate.values())
+        self.api.publish(msg, groups=['TASK-ALLOCATION'])
 
-        task_announcement = TaskAnnouncement(tasks_lots, self.round.id, self.zero_timepoint)
-        msg = self.api.create_message(task_announcement)
+        if proxied_robot_ids:
+            self.compute_proxy_bids(round_, task_announcement)
+
+        if self.allocation_method == 'cbba':
+            if recipients is not None:
+                robot_ids = sorted({robot_id for robot_ids_ in recipients.values() for robot_id in robot_ids_})
+            self.consensus_monitors[partition_id] = ConsensusMonitor(round_.id, robot_ids, list(tasks_to_allocate))
+
+    @staticmethod
+    def get_n_announced_tasks(tasks_lots, robot_ids, recipients=None, proxied_robot_ids=None):
+        """ Returns the number of tasks announced to each robot that computes its own bids
+
+        :return: dict of robot_id: number of tasks
+        """
+        proxied_robot_ids = proxied_robot_ids or list()
+        n_tasks = dict()
+        for robot_id in robot_ids:
+            if robot_id in proxied_robot_ids:
+                continue
+            if recipients is None:
+                n_tasks[robot_id] = len(tasks_lots)
+            else:
+                n_tasks[robot_id] = sum(robot_id in recipients[str(task_lot.task.task_id)] for task_lot in tasks_lots)
+        return n_tasks
+
+    def consensus_state_cb(self, msg):
+        state = ConsensusState.from_payload(msg['payload'])
+        for consensus_monitor in self.consensus_monitors.values():
+            consensus_monitor.add_state(state)
+
+    def record_consensus(self, partition_id, round_):
+        """ Records the allocations the robots agreed on. Tasks without agreement are announced
+        again in the next round
+        """
+        round_.opened = False
+        allocations = self.consensus_monitors.pop(partition_id).get_allocations()
+        self.logger.debug("Round %s: robots agreed on %s of %s tasks", round_.id, len(allocations),
+                          len(round_.tasks_to_allocate))
+
+        if not allocations:
+            self.partitioner.release_tasks(partition_id, round_.tasks_to_allocate)
+            if round_.re_allocation:
+                for task_id in round_.tasks_to_allocate:
+                    self.tasks_to_allocate[task_id] = self.tasks_to_re_allocate.pop(task_id)
+
+        # The tasks of a robot are inserted in one timetable, by position, which is stored once
+        allocations = sorted(allocations, key=lambda allocation: (allocation[1], allocation[2]))
+        robot_allocations = collections.OrderedDict()
+        for task_id, robot_id, position in allocations:
+            task_lot = round_.tasks_to_allocate.get(task_id)
+            self.register_allocation(task_lot, robot_id)
+            robot_allocations.setdefault(robot_id, list()).append((task_lot, position))
+
+        for robot_id, allocations_ in robot_allocations.items():
+            self.update_timetable(robot_id, allocations_)
+
+        for task_id, robot_id, position in allocations:
+            self.update_allocation_time(task_id)
+            self.announce_winner(task_id, robot_id, position)
+
+        msg = self.api.create_message(FinishConsensus(round_.id))
+        self.api.publish(msg, groups=['TASK-ALLOCATION'])
+        round_.finish()
+
+    def get_proxied_robot_ids(self, robot_ids):
+        """ Returns the robots whose timetables have at most proxy_bidding_threshold tasks
+        """
+        if self.proxy_bidding_threshold is None:
+            return list()
+
+        proxied_robot_ids = list()
+        for robot_id in robot_ids:
+            timetable = self.timetables.get(robot_id)
+            if timetable and len(timetable.get_tasks()) <= self.proxy_bidding_threshold:
+                proxied_robot_ids.append(robot_id)
+        return proxied_robot_ids
+
+    def compute_proxy_bids(self, round_, task_announcement):
+        """ Computes the bids of the proxied robots of the task announcement and adds them to the round.
+        Bids are computed once per group of robots with identical timetables
+        """
+        groups = dict()
+        for robot_id in task_announcement.proxied_robot_ids:
+            self.get_timetable(robot_id)
+            timetable = self.timetables.get(robot_id)
+            self.rebase_timetable(timetable)
+            groups.setdefault(self.get_fingerprint(timetable), list()).append(robot_id)
+
+        self.logger.debug("Computing bids for %s robots (%s distinct timetables)",
+                          len(task_announcement.proxied_robot_ids), len(groups))
+
+        for robot_ids in groups.values():
+            # The bids are computed on a copy to keep the cached timetable unchanged
+            timetable = copy.deepcopy(self.timetables.get(robot_ids[0]))
+            best_bids = dict()
+            soft_bids = dict()
+
+            for robot_id in robot_ids:
+                bids = list()
+                for task_lot in task_announcement.get_tasks_lots(robot_id):
+                    task_id = task_lot.task.task_id
+                    if task_id not in best_bids:
+                        best_bids[task_id] = self.compute_proxy_bid(robot_id, round_.id, task_lot, timetable)
+                        if best_bids[task_id] is None and self.alternative_timeslots:
+                            soft_bids[task_id] = self.compute_proxy_bid(robot_id, round_.id, task_lot, timetable,
+                                                                        soft=True)
+
+                    if best_bids[task_id]:
+                        bids.append(self.copy_bid(best_bids[task_id], robot_id))
+                    elif soft_bids.get(task_id):
+                        # A soft bid counts as a no-bid
+                        round_.add_bid(self.copy_bid(soft_bids[task_id], robot_id))
+                    else:
+                        round_.add_bid(Bid(robot_id, round_.id, task_id))
+
+                if bids:
+                    round_.add_bid(min(bids, key=lambda bid: (bid.cost, bid.task_id)))
+
+    @staticmethod
+    def copy_bid(bid, robot_id):
+        bid = copy.copy(bid)
+        bid.robot_id = robot_id
+        return bid
+
+    @staticmethod
+    def get_fingerprint(timetable):
+        key, lower_bounds = SolutionCache.get_key(None, timetable.stn)
+        return key, frozenset(lower_bounds.items()), timetable.schedule is not None
+
+    def compute_proxy_bid(self, robot_id, round_id, task_lot, timetable, soft=False):
+        """ Returns the best bid for inserting the task in the timetable or None
+        """
+        best_bid = None
+        first_position = 2 if timetable.schedule else 1
+
+        for position in range(first_position, len(timetable.get_tasks()) + 2):
+            try:
+                bid = self.bidding_rule.compute_bid(robot_id, round_id, task_lot, position, timetable, soft)
+                if best_bid is None or bid < best_bid or (bid == best_bid and bid.position < best_bid.position):
+                    best_bid = copy.copy(bid)
+                    best_bid.timetable = None
+            except NoSTPSolution:
+                pass
+            timetable.remove_task_from_stn(position)
 
-        self.logger.debug("Auctioneer announces tasks %s", [task_id for task_id, task in self.tasks_to_allocate.items()])
+        return best_bid
 
-        self.round.start()
-        self.api.publish(msg, groups=['TASK-ALLOCATION'])
+    def get_round(self, round_id):
+        for round_ in self.rounds.values():
+            if round_.id == round_id:
+                return round_
 
     def bid_cb(self, msg):
         payload = msg['payload']
-        self.round.process_bid(payload)
+        round_id = from_str(payload['roundId'])
+        if self.round_timer:
+            self.round_timer.add_bid(round_id, payload['robotId'])
+        round_ = self.get_round(round_id)
+        if round_ is None:
+            self.logger.debug("Ignoring bid of round %s", payload['roundId'])
+            return
+        round_.process_bid(payload)
 
     def finish_round_cb(self, msg):
-        self.round.finish()
-
-    def announce_winner(self, task_id, robot_id):
-        allocation = Allocation(task_id, robot_id)
+        partition_id = self.partitioner.get_partition_id(msg['payload']['robotId'])
+        if partition_id is None:
+            self.logger.warning("Robot %s is not in any partition", msg['payload']['robotId'])
+            return
+        self.rounds[partition_id].finish()
+
+    def announce_winner(self, task_id, robot_id, position=None):
+        allocation = Allocation(task_id, robot_id, position)
         msg = self.api.create_message(allocation)
         self.api.publish(msg, groups=['TASK-ALLOCATION'])
 
@@ -172,11 +648,11 @@ class Auctioneer(object):
 
         timetable = self.timetables.get(robot_id)
 
-        relative_start_navigation_time = timetable.dispatchable_graph.get_time(task_id, "navigation")
-        relative_start_time = timetable.dispatchable_graph.get_time(task_id, "start")
-        relative_latest_finish_time = timetable.dispatchable_graph.get_time(task_id, "finish", False)
+        relative_start_navigation_time = timetable.get_time(task_id, "navigation")
+        relative_start_time = timetable.get_time(task_id, "start")
+        relative_latest_finish_time = timetable.get_time(task_id, "finish", False)
 
-        self.logger.debug("Current time %s: ", TimeStamp())
+        self.logger.debug("Current time %s: ", clock.now())
         self.logger.debug("zero_timepoint %s: ", self.zero_timepoint)
         self.logger.debug("Relative start navigation time: %s", relative_start_navigation_time)
         self.logger.debug("Relative start time: %s", relative_start_time)
@@ -4,11 +4,13 @@ import logging
 from mrs.exceptions.task_allocation import NoSTPSolution
 from mrs.robot_base import RobotBase
 from mrs.structs.allocation import FinishRound
-from mrs.structs.allocation import TaskAnnouncement, Allocation
+from mrs.structs.allocation import TaskAnnouncement, Allocation, ReAllocation, ConsensusState, FinishConsensus
 from mrs.structs.bid import Bid
 from mrs.task_allocation.bidding_rule import BiddingRule
-from fmlib.db.queries import get_task
-from ropod.structs.task import TaskStatus as TaskStatusConst
+from mrs.task_allocation.consensus import ConsensusBundle
+from mrs.utils import clock
+from mrs.utils.task_registry import TaskRegistry
+from ropod.utils.uuid import from_str
 
 
 """ Implements a variation of the the TeSSI algorithm using the bidding_rule
@@ -22,12 +24,32 @@ class Bidder(RobotBase):
         super().__init__(**robot_config)
         self.logger = logging.getLogger('mrs.bidder.%s' % self.id)
 
-        robustness = bidder_config.get('bidding_rule').get('robustness')
-        temporal = bidder_config.get('bidding_rule').get('temporal')
-        self.bidding_rule = BiddingRule(robustness, temporal)
+        bidding_rule_config = bidder_config.get('bidding_rule')
+        robustness = bidding_rule_config.get('robustness')
+        temporal = bidding_rule_config.get('temporal')
+        self.bidding_rule = BiddingRule(robustness, temporal,
+                                        screening=bidding_rule_config.get('screening', False),
+                                        top_k=bidding_rule_config.get('top_k', 2),
+                                        max_delay=bidding_rule_config.get('max_delay', 120))
 
         self.auctioneer_name = bidder_config.get("auctioneer_name")
         self.bid_placed = None
+        # task_id: task_lot of the last task announcement
+        self.announced_tasks_lots = dict()
+        # Tasks allocated to the robot. Robots hosted in the same process share the registry
+        self.task_registry = robot_config.get('task_registry') or TaskRegistry()
+
+        # Anytime bidding: stop evaluating insertions safety_margin seconds before the round closes
+        # and send the best bid found so far
+        self.anytime = bidder_config.get('anytime', False)
+        self.safety_margin = bidder_config.get('safety_margin', 1)
+
+        # tessi: the auctioneer elects the winner of each task
+        # cbba: the robots agree on the winners among themselves (see mrs.task_allocation.consensus)
+        self.allocation_method = bidder_config.get('allocation_method', 'tessi')
+        self.consensus = None
+        if self.allocation_method == 'cbba':
+            self.consensus = ConsensusBundle(self, bidder_config.get('max_bundle_size'))
 
         self.logger.debug("Bidder initialized %s", self.id)
 
@@ -35,36 +57,121 @@ class Bidder(RobotBase):
         self.logger.debug("Robot %s received TASK-ANNOUNCEMENT", self.id)
         payload = msg['payload']
         task_announcement = TaskAnnouncement.from_payload(payload)
-        self.timetable.zero_timepoint = task_announcement.zero_timepoint
+        self.process_task_announcement(task_announcement)
+
+    def process_task_announcement(self, task_announcement):
+        # The bid of a previous round holds a timetable without the tasks allocated since then
+        self.bid_placed = None
+        tasks_lots = task_announcement.get_tasks_lots(self.id)
+        if not tasks_lots:
+            self.logger.debug("Robot %s does not take part in round %s", self.id, task_announcement.round_id)
+            return
+        self.update_zero_timepoint(task_announcement.zero_timepoint)
+        self.announced_tasks_lots = {task_lot.task.task_id: task_lot for task_lot in tasks_lots}
+
+        if self.id in task_announcement.proxied_robot_ids:
+            self.logger.debug("The auctioneer bids for robot %s in round %s", self.id, task_announcement.round_id)
+            return
+
+        if self.consensus:
+            if self.consensus.round_id is not None:
+                # The FINISH-CONSENSUS of the previous round was not received
+                self.consensus.finish()
+            self.consensus.start(task_announcement.round_id, tasks_lots)
+            self.send_consensus_state()
+            return
+
         self.compute_bids(task_announcement)
 
+    def update_zero_timepoint(self, zero_timepoint):
+        """ Moves the zero_timepoint of the timetable, removes the completed tasks and requests the
+        re-allocation of the overdue tasks
+        """
+        removed_task_ids, overdue_task_ids = self.timetable.update_zero_timepoint(zero_timepoint,
+                                                                                  self.task_registry.get_completed())
+        for task_id in removed_task_ids:
+            self.task_registry.remove(task_id)
+        for task_id in overdue_task_ids:
+            self.re_allocate(task_id)
+
+    def consensus_state_cb(self, msg):
+        payload = msg['payload']
+        if self.consensus is None or payload['robotId'] == self.id:
+            return
+        state = ConsensusState.from_payload(payload)
+        if self.consensus.update(state):
+            self.send_consensus_state()
+
+    def finish_consensus_cb(self, msg):
+        finish_consensus = FinishConsensus.from_payload(msg['payload'])
+        if self.consensus is None or self.consensus.round_id != finish_consensus.round_id:
+            return
+        # Removes the tasks of the round that were not allocated to the robot
+        self.consensus.finish()
+
+    def send_consensus_state(self):
+        state = ConsensusState(self.id, self.consensus.round_id, self.consensus.winners,
+                               self.consensus.get_positions(), self.consensus.get_timestamps())
+        msg = self.api.create_message(state)
+        self.api.publish(msg, groups=['TASK-ALLOCATION'])
+
     def allocation_cb(self, msg):
         self.logger.debug("Robot %s received ALLOCATION", self.id)
         payload = msg['payload']
         allocation = Allocation.from_payload(payload)
 
-        if allocation.robot_id == self.id:
-            self.allocate_to_robot(allocation.task_id)
+        if allocation.robot_id == self.id and self.consensus:
+            # The task is already in the timetable
+            self.consensus.allocated.add(allocation.task_id)
+            self.task_registry.allocate(self.announced_tasks_lots.get(allocation.task_id), self.id)
+        elif allocation.robot_id == self.id:
+            self.allocate_to_robot(allocation.task_id, allocation.position)
             self.send_finish_round()
 
+    def task_schedule_cb(self, msg):
+        payload = msg['payload']
+        if payload['robotId'] == self.id:
+            task_id = from_str(payload['taskId'])
+            self.logger.debug("Robot %s received TASK-SCHEDULE of task %s", self.id, task_id)
+            # Position 1 is reserved to the scheduled task
+            self.timetable.get_schedule(task_id)
+
     def compute_bids(self, task_announcement):
         bids = list()
         no_bids = list()
         round_id = task_announcement.round_id
+        tasks_lots = task_announcement.get_tasks_lots(self.id)
+
+        deadline = None
+        if self.anytime and task_announcement.closure_time:
+            deadline = task_announcement.closure_time
+            # Evaluate first the tasks that start earlier
+            tasks_lots = sorted(tasks_lots, key=lambda task_lot:
+                                task_lot.constraints.timepoint_constraints[0].earliest_time)
+
+        for task_lot in tasks_lots:
+            if self.deadline_reached(deadline):
+                self.logger.debug("Round closes soon. Task %s not evaluated", task_lot.task.task_id)
+                continue
 
-        for task_lot in task_announcement.tasks_lots:
             self.logger.debug("Computing bid of task %s", task_lot.task.task_id)
 
             # Insert task in each possible position of the stn and
             # get the best_bid for each task
-            best_bid = self.insert_task(task_lot, round_id)
+            best_bid = self.insert_task(task_lot, round_id, deadline)
 
             if best_bid:
                 bids.append(best_bid)
+            elif self.deadline_reached(deadline):
+                # Not all positions were evaluated. The task might fit in the timetable
+                self.logger.debug("Round closes soon. No bid found for task %s", task_lot.task_id)
             else:
                 self.logger.debug("No bid for task %s", task_lot.task_id)
-                no_bid = Bid(self.id, round_id, task_lot.task.task_id)
-                no_bids.append(no_bid)
+                soft_bid = None
+                if task_announcement.alternative_timeslots:
+                    # Bid with an alternative start time in the same round
+                    soft_bid = self.insert_task(task_lot, round_id, deadline, soft=True)
+                no_bids.append(soft_bid or Bid(self.id, round_id, task_lot.task.task_id))
 
         smallest_bid = self.get_smallest_bid(bids)
 
@@ -72,7 +179,8 @@ class Bidder(RobotBase):
 
     def send_bids(self, bid, no_bids):
         """ Sends the bid with the smallest cost
-        Sends a no-bid per task that could not be accommodated in the stn
+        Sends a no-bid per task that could not be accommodated in the stn. If alternative timeslots
+        are enabled, the no-bid is a soft bid (with an alternative start time), if any
 
         :param bid: bid with the smallest cost
         :param no_bids: list of no bids
@@ -88,30 +196,67 @@ class Bidder(RobotBase):
                 self.logger.debug("Sending no bid for task %s", no_bid.task_id)
                 self.send_bid(no_bid)
 
-    def insert_task(self, task_lot, round_id):
+    def deadline_reached(self, closure_time):
+        """ Returns True if there are less than safety_margin seconds left before the closure_time
+        """
+        if closure_time is None:
+            return False
+        time_left = closure_time.get_difference(clock.now(), "minutes") * 60
+        return time_left < self.safety_margin
+
+    def insert_task(self, task_lot, round_id, deadline=None, soft=False):
+        """ Computes the bid for inserting the task in each possible position of the timetable
+
+        If a deadline (the closure time of the round) is given, positions are evaluated in a
+        promising order (closest to the chronological position of the task first) and the
+        evaluation stops safety_margin seconds before the deadline.
+
+        :param task_lot: task to insert
+        :param round_id: id of the round
+        :param deadline: (TimeStamp) closure time of the round
+        :param soft: computes soft bids (see BiddingRule.compute_bid)
+        :return: best bid found or None
+        """
         best_bid = None
 
         n_tasks = len(self.timetable.get_tasks())
 
         # Add task to the STN from position 1 onwards (position 0 is reserved for the zero_timepoint)
-        for position in range(1, n_tasks+2):
+        # Position 1 is reserved to the scheduled task, if any
+        self.logger.debug("Schedule: %s", self.timetable.schedule)
+        first_position = 2 if self.timetable.schedule else 1
+        positions = range(first_position, n_tasks+2)
+
+        if self.bidding_rule.screening and not soft:
+            candidates = self.bidding_rule.screen(task_lot, positions, self.timetable)
+        else:
+            candidates = [(None, position) for position in positions]
+            if deadline:
+                chronological_position = self.timetable.get_chronological_position(task_lot)
+                candidates.sort(key=lambda candidate: (abs(candidate[1] - chronological_position), candidate[1]))
+
+        for i, (proxy, position) in enumerate(candidates):
+            if self.deadline_reached(deadline):
+                self.logger.debug("Round closes soon. Evaluated %s of %s positions for task %s", i,
+                                  len(candidates), task_lot.task.task_id)
+                break
+
             # TODO check if the robot can make it to the task, if not, return
 
-            self.logger.debug("Schedule: %s", self.timetable.schedule)
-            if position == 1 and self.timetable.schedule:
-                self.logger.debug("Not adding task in position %s", position)
+            if i >= self.bidding_rule.top_k and self.bidding_rule.can_prune(proxy, position, best_bid):
+                self.bidding_rule.n_solver_calls_avoided += 1
                 continue
 
             self.logger.debug("Computing bid for task %s in position %s", task_lot.task.task_id, position)
 
             try:
-                bid = self.bidding_rule.compute_bid(self.id, round_id, task_lot, position, self.timetable)
+                bid = self.bidding_rule.compute_bid(self.id, round_id, task_lot, position, self.timetable, soft)
 
                 self.logger.debug("Bid: (risk metric: %s, temporal metric: %s)", bid.risk_metric, bid.temporal_metric)
 
                 if best_bid is None or \
                         bid < best_bid or\
-                        (bid == best_bid and bid.task_id < best_bid.task_id):
+                        (bid == best_bid and bid.position < best_bid.position):
 
                     best_bid = copy.deepcopy(bid)
 
@@ -122,8 +267,13 @@ class Bidder(RobotBase):
             # Restore schedule for the next iteration
             self.timetable.remove_task_from_stn(position)
 
-        self.logger.debug("Best bid for task %s: (risk metric: %s, temporal metric: %s)", task_lot.task.task_id,
-                          best_bid.risk_metric, best_bid.temporal_metric)
+        if best_bid:
+            self.logger.debug("Best bid for task %s: (risk metric: %s, temporal metric: %s)", task_lot.task.task_id,
+                              best_bid.risk_metric, best_bid.temporal_metric)
+
+        if self.bidding_rule.screening:
+            self.logger.debug("Solver calls: %s, avoided by screening: %s", self.bidding_rule.n_solver_calls,
+                              self.bidding_rule.n_solver_calls_avoided)
 
         return best_bid
 
@@ -155,9 +305,20 @@ class Bidder(RobotBase):
 
         self.api.publish(msg, peer=self.auctioneer_name)
 
-    def allocate_to_robot(self, task_id):
+    def allocate_to_robot(self, task_id, position=None):
+
+        task_lot = self.announced_tasks_lots.get(task_id)
 
-        self.timetable = copy.deepcopy(self.bid_placed.timetable)
+        if self.bid_placed and self.bid_placed.task_id == task_id:
+            self.timetable = copy.deepcopy(self.bid_placed.timetable)
+        else:
+            # The auctioneer computed the bid on behalf of the robot
+            self.timetable.add_task_to_stn(task_lot, position)
+            try:
+                self.timetable.solve_stp()
+            except NoSTPSolution:
+                self.logger.error("The stp solver could not solve the problem for task %s in position %s",
+                                  task_id, position)
 
         self.logger.debug("Robot %s allocated task %s", self.id, task_id)
         self.logger.debug("STN %s", self.timetable.stn)
@@ -166,9 +327,27 @@ class Bidder(RobotBase):
         tasks = [task for task in self.timetable.get_tasks()]
 
         self.logger.debug("Tasks allocated to robot %s:%s", self.id, tasks)
-        task = get_task(task_id)
-        task.update_status(TaskStatusConst.ALLOCATED)
-        task.assign_robots([self.id])
+        self.task_registry.allocate(task_lot, self.id)
+
+    def re_allocate(self, task_id):
+        """ Removes a task the robot can no longer execute on time from its timetable
+        and requests its re-allocation to the auctioneer.
+        The scheduled task (the task being executed) cannot be re-allocated.
+
+        :param task_id: id of the task to re-allocate
+        """
+        position = self.timetable.get_task_position(task_id)
+        if position is None or (position == 1 and self.timetable.schedule):
+            self.logger.warning("Task %s cannot be re-allocated", task_id)
+            return
+
+        self.timetable.remove_task(position)
+        self.task_registry.remove(task_id)
+        self.logger.debug("Robot %s requests re-allocation of task %s", self.id, task_id)
+
+        re_allocation = ReAllocation(task_id, self.id)
+        msg = self.api.create_message(re_allocation)
+        self.api.publish(msg, peer=self.auctioneer_name)
 
     def send_finish_round(self):
         finish_round = FinishRound(self.id)
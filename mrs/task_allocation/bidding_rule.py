@@ -1,40 +1,129 @@
+import logging
+
 from mrs.structs.bid import Bid
 from mrs.exceptions.task_allocation import NoSTPSolution
+from stn.stp import STP
 
 
 class BiddingRule(object):
-    def __init__(self, robustness_criterion, temporal_criterion):
+    """ Computes bids as a combination of a robustness and a temporal criterion
+
+    Screening (optional): before running the robustness solver (an LP for srea and dsc_lp),
+    each insertion position is checked with the fpc solver. Positions where the stn is
+    inconsistent are discarded, since the robustness solver cannot solve them either.
+    The remaining positions are evaluated in increasing order of their fpc temporal metric:
+    the first top_k are always solved, the rest only if they might beat the best bid so far.
+    A position is only skipped when it provably cannot beat the best bid, i.e., the bid is
+    the same as the one computed by solving every position.
+    """
+
+    # Temporal criteria for which the fpc metric is a lower bound of the metric of the
+    # dispatchable graph computed by a robustness solver (which only tightens the bounds)
+    lower_bound_criteria = ['makespan']
+
+    # Lowest risk metric a robustness solver can return
+    min_risk_metric = 0
+
+    def __init__(self, robustness_criterion, temporal_criterion, **kwargs):
         self.robustness_criterion = robustness_criterion
         self.temporal_criterion = temporal_criterion
+        self.logger = logging.getLogger('mrs.bidding_rule')
+
+        # Minutes a task with soft constraints can start after its latest start time
+        self.max_delay = kwargs.get('max_delay', 120)
+
+        self.screening = kwargs.get('screening', False) and robustness_criterion != 'fpc'
+        self.top_k = kwargs.get('top_k', 2)
+        if self.screening:
+            self.screening_stp = STP('fpc')
+
+        # Number of calls to the robustness solver made and avoided by screening
+        self.n_solver_calls = 0
+        self.n_solver_calls_avoided = 0
+
+    def compute_bid(self, robot_id, round_id, task_lot, position, timetable, soft=False):
+        """ Computes the bid for inserting the task in the given position of the timetable
 
-    def compute_bid(self, robot_id, round_id, task_lot, position, timetable):
-        timetable.add_task_to_stn(task_lot, position)
+        A soft bid (soft=True or a task with soft constraints) allows the task to start up to
+        max_delay minutes after its latest start time. Its temporal metric is the delay of the
+        start time with respect to the earliest start time of the task
+        """
+        hard = task_lot.constraints.hard and not soft
+        timetable.add_task_to_stn(task_lot, position, max_delay=self.get_max_delay(task_lot, soft))
 
         try:
+            self.n_solver_calls += 1
             timetable.solve_stp()
             timetable.compute_temporal_metric(self.temporal_criterion)
 
-            if task_lot.constraints.hard:
+            if hard:
                 bid = Bid(robot_id, round_id, task_lot.task.task_id, timetable,
                           position=position,
                           risk_metric=timetable.risk_metric,
                           temporal_metric=timetable.temporal_metric)
 
             else:
-                navigation_start_time = timetable.dispatchable_graph.get_task_time(task_lot.task.task_id)
+                start_time = timetable.get_time(task_lot.task.task_id, 'start')
                 timetable.risk_metric = 1
-                start_timepoint_constraints = task_lot.constraints.timepoint_constraints[0]
-                timetable.temporal_metric = abs(navigation_start_time - start_timepoint_constraints.earliest_time),
+                r_earliest_start_time = timetable.stn.get_time(task_lot.task.task_id, 'start')
+                timetable.temporal_metric = abs(start_time - r_earliest_start_time)
 
                 bid = Bid(robot_id, round_id, task_lot.task.task_id, timetable,
                           position=position,
                           risk_metric=timetable.risk_metric,
                           temporal_metric=timetable.temporal_metric,
                           hard_constraints=False,
-                          alternative_start_time=navigation_start_time)
+                          alternative_start_time=start_time)
 
             return bid
 
         except NoSTPSolution:
             raise NoSTPSolution()
 
+    def get_max_delay(self, task_lot, soft=False):
+        """ Minutes the task can start after its latest start time when it is inserted in an stn
+        """
+        return 0 if task_lot.constraints.hard and not soft else self.max_delay
+
+    def screen(self, task_lot, positions, timetable, soft=False):
+        """ Checks the consistency of the stn with the task in each position and computes
+        the fpc temporal metric (proxy) of the consistent positions. The task is inserted as in
+        compute_bid
+
+        :param task_lot: task to insert
+        :param positions: positions to check
+        :param timetable: timetable of the robot
+        :param soft: the task is inserted as for a soft bid
+        :return: list of (proxy, position) sorted by proxy
+        """
+        candidates = list()
+        max_delay = self.get_max_delay(task_lot, soft)
+
+        for position in positions:
+            timetable.add_task_to_stn(task_lot, position, max_delay=max_delay)
+            result = self.screening_stp.solve(timetable.stn)
+            if result is not None:
+                risk_metric, dispatchable_graph = result
+                proxy = self.screening_stp.compute_temporal_metric(dispatchable_graph, self.temporal_criterion)
+                candidates.append((proxy, position))
+            timetable.remove_task_from_stn(position)
+
+        n_inconsistent = len(positions) - len(candidates)
+        self.n_solver_calls_avoided += n_inconsistent
+        self.logger.debug("Screening task %s: %s of %s positions are consistent", task_lot.task.task_id,
+                          len(candidates), len(positions))
+
+        return sorted(candidates)
+
+    def can_prune(self, proxy, position, best_bid):
+        """ Returns True if a position with the given proxy cannot beat the best bid
+        """
+        if best_bid is None or self.temporal_criterion not in self.lower_bound_criteria:
+            return False
+
+        if best_bid.risk_metric > self.min_risk_metric:
+            # The position could have a lower risk metric
+            return False
+
+        return proxy > best_bid.temporal_metric or \
+            (proxy == best_bid.temporal_metric and position > best_bid.position)
@@ -0,0 +1,298 @@
+""" Consensus-based bundle auction (CBBA)
+
+Allocation without a central election: the auctioneer announces the tasks of a round and each
+robot
+    1. builds a bundle: it repeatedly inserts, in its timetable, the task with the smallest bid it can
+       win (with the insertion logic of the bidder), until no task is left or the bundle is full
+    2. shares its view of the winning bids (winner and cost of each task) with the other robots and
+       resolves conflicts with the views it receives. A robot that is outbid on a task of its bundle
+       releases that task and the tasks it added after it (their bids depend on it), and builds
+       its bundle again.
+The robots stop sending their view when it does not change. The auctioneer listens to the views
+and records the allocations once all robots agree. It then announces the allocations and finishes the
+round (FINISH-CONSENSUS): the robots remove the tasks of their bundles that were not allocated to them.
+
+Bids are compared as in the Round: by cost (risk_metric, temporal_metric) and then by robot number.
+The conflict resolution rules are the ones of the CBBA for asynchronous networks
+(Choi, Brunet and How, 2009), with the time of the latest information received from each robot.
+"""
+import logging
+
+from mrs.utils import clock
+
+
+def get_key(winner):
+    cost, robot_id = winner
+    return cost, int(robot_id.split('_')[-1])
+
+
+def is_better(winner, other):
+    """ Returns True if winner is a better bid than other
+    """
+    if winner is None:
+        return False
+    return other is None or get_key(winner) < get_key(other)
+
+
+class ConsensusBundle(object):
+    """ Bundle and view of the winning bids of a robot in a consensus-based round
+
+    :param bidder: bidder of the robot. Tasks are inserted in the timetable of the bidder
+    :param max_bundle_size: maximum number of tasks a robot adds to its bundle in a round
+    """
+
+    def __init__(self, bidder, max_bundle_size=None):
+        self.logger = logging.getLogger('mrs.bidder.%s.consensus' % bidder.id)
+        self.bidder = bidder
+        self.robot_id = bidder.id
+        self.max_bundle_size = max_bundle_size
+
+        self.round_id = None
+        self.tasks_lots = dict()
+        # Tasks in the order they were added to the bundle
+        self.bundle = list()
+        # task_id: (cost, robot_id) or None
+        self.winners = dict()
+        # robot_id: time of the latest information received from the robot
+        self.timestamps = dict()
+        # States received before the announcement of their round (round_id: list of states)
+        self.pending_states = dict()
+        # Tasks of the bundle allocated to the robot by the auctioneer
+        self.allocated = set()
+
+    def start(self, round_id, tasks_lots):
+        """ Starts a round and builds the first bundle
+        """
+        self.round_id = round_id
+        self.tasks_lots = {task_lot.task.task_id: task_lot for task_lot in tasks_lots}
+        self.bundle = list()
+        self.winners = {task_id: None for task_id in self.tasks_lots}
+        self.timestamps = dict()
+        self.allocated = set()
+
+        self.build_bundle()
+        for state in self.pending_states.pop(round_id, list()):
+            self.update(state)
+        self.pending_states.clear()
+
+    def build_bundle(self):
+        """ Adds to the bundle the tasks the robot can win, one at a time
+
+        :return: True if tasks were added to the bundle
+        """
+        changed = False
+        while self.max_bundle_size is None or len(self.bundle) < self.max_bundle_size:
+            best_bid = None
+            for task_id, task_lot in self.tasks_lots.items():
+                if task_id in self.bundle:
+                    continue
+                bid = self.bidder.insert_task(task_lot, self.round_id)
+                if bid is None or not is_better((bid.cost, self.robot_id), self.winners[task_id]):
+                    continue
+                if best_bid is None or (bid.cost, bid.task_id) < (best_bid.cost, best_bid.task_id):
+                    best_bid = bid
+
+            if best_bid is None:
+                break
+
+            self.bidder.timetable = best_bid.timetable
+            self.bundle.append(best_bid.task_id)
+            self.winners[best_bid.task_id] = (best_bid.cost, self.robot_id)
+            changed = True
+            self.logger.debug("Task %s added to the bundle in position %s", best_bid.task_id, best_bid.position)
+
+        return changed
+
+    def update(self, state):
+        """ Resolves the conflicts between the view of the robot and the view of the sender of the state,
+        releases the tasks the robot was outbid on and builds the bundle again
+
+        :param state: ConsensusState of another robot
+        :return: True if the view of the robot changed
+        """
+        if state.round_id != self.round_id:
+            self.pending_states.setdefault(state.round_id, list()).append(state)
+            return False
+
+        sender = state.robot_id
+        sender_timestamps = dict(state.timestamps)
+        winners = dict(self.winners)
+
+        for task_id in self.tasks_lots:
+            action = self.resolve(sender, state.winners.get(task_id), self.winners[task_id], sender_timestamps)
+            if action == 'update':
+                self.winners[task_id] = state.winners.get(task_id)
+            elif action == 'reset':
+                self.winners[task_id] = None
+
+        self.timestamps[sender] = sender_timestamps.get(sender, clock.time())
+        for robot_id, time_ in sender_timestamps.items():
+            if robot_id != self.robot_id and time_ > self.timestamps.get(robot_id, 0):
+                self.timestamps[robot_id] = time_
+
+        # The bids of the tasks that are not in the bundle only change if the robot released tasks or
+        # the winners changed
+        if self.release() or winners != self.winners:
+            self.build_bundle()
+        return winners != self.winners
+
+    def resolve(self, sender, sender_winner, winner, sender_timestamps):
+        """ Returns 'update' (take the view of the sender), 'reset' (no winner) or 'leave' (keep the own view)
+        for one task
+        """
+        i, k = self.robot_id, sender
+        z_k = sender_winner[1] if sender_winner else None
+        z_i = winner[1] if winner else None
+
+        def newer(robot_id):
+            return sender_timestamps.get(robot_id, 0) > self.timestamps.get(robot_id, 0)
+
+        if z_k == k:
+            if z_i == i:
+                return 'update' if is_better(sender_winner, winner) else 'leave'
+            if z_i == k or z_i is None:
+                return 'update'
+            return 'update' if newer(z_i) or is_better(sender_winner, winner) else 'leave'
+
+        if z_k == i:
+            if z_i == k:
+                return 'reset'
+            if z_i not in (i, None) and newer(z_i):
+                return 'reset'
+            return 'leave'
+
+        if z_k is not None:
+            m = z_k
+            if z_i == i:
+                return 'update' if newer(m) and is_better(sender_winner, winner) else 'leave'
+            if z_i == k:
+                return 'update' if newer(m) else 'reset'
+            if z_i == m or z_i is None:
+                return 'update' if newer(m) else 'leave'
+            n = z_i
+            if newer(m) and newer(n):
+                return 'update'
+            if newer(m) and is_better(sender_winner, winner):
+                return 'update'
+            if newer(n) and not newer(m):
+                return 'reset'
+            return 'leave'
+
+        if z_i == k:
+            return 'update'
+        if z_i not in (i, None) and newer(z_i):
+            return 'update'
+        return 'leave'
+
+    def release(self):
+        """ Releases the first task of the bundle the robot was outbid on and the tasks added after it
+
+        :return: True if tasks were released
+        """
+        lost = [index for index, task_id in enumerate(self.bundle) if not self.is_winner(task_id)]
+        if not lost:
+            return False
+
+        released = self.bundle[lost[0]:]
+        self.bundle = self.bundle[:lost[0]]
+        for task_id in released:
+            if self.is_winner(task_id):
+                self.winners[task_id] = None
+        self.remove_from_timetable(released)
+        self.logger.debug("Released tasks %s", released)
+        return True
+
+    def remove_from_timetable(self, task_ids):
+        timetable = self.bidder.timetable
+        positions = [timetable.get_task_position(task_id) for task_id in task_ids]
+        for position in sorted(positions, reverse=True):
+            timetable.remove_task(position)
+        if timetable.get_tasks():
+            timetable.solve_stp()
+
+    def is_winner(self, task_id):
+        winner = self.winners.get(task_id)
+        return winner is not None and winner[1] == self.robot_id
+
+    def finish(self):
+        """ Removes from the timetable the tasks of the bundle that were not allocated to the robot
+        """
+        not_allocated = [task_id for task_id in self.bundle if task_id not in self.allocated]
+        if not_allocated:
+            self.remove_from_timetable(not_allocated)
+        self.bundle = list()
+        self.round_id = None
+
+    def get_positions(self):
+        return {task_id: self.bidder.timetable.get_task_position(task_id) for task_id in self.bundle}
+
+    def get_timestamps(self):
+        timestamps = dict(self.timestamps)
+        timestamps[self.robot_id] = clock.time()
+        return timestamps
+
+
+class ConsensusMonitor(object):
+    """ Records the views of the robots in a consensus-based round and detects when they agree
+
+    :param round_id: id of the round
+    :param robot_ids: robots that take part in the round
+    :param task_ids: tasks of the round
+    """
+
+    def __init__(self, round_id, robot_ids, task_ids):
+        self.round_id = round_id
+        self.robot_ids = list(robot_ids)
+        self.task_ids = list(task_ids)
+        # robot_id: latest ConsensusState
+        self.states = dict()
+
+    def add_state(self, state):
+        if state.round_id == self.round_id and state.robot_id in self.robot_ids:
+            self.states[state.robot_id] = state
+
+    def get_winner(self, task_id):
+        """ Returns the robot all robots agree on, or None
+        """
+        robot_ids = {state.winners.get(task_id)[1] if state.winners.get(task_id) else None
+                     for state in self.states.values()}
+        if len(robot_ids) != 1:
+            return None
+        robot_id = robot_ids.pop()
+        if robot_id is None or task_id not in self.states[robot_id].positions:
+            return None
+        return robot_id
+
+    def converged(self):
+        """ True if all robots sent their view and all views agree on the winner of each task
+        """
+        if len(self.states) < len(self.robot_ids):
+            return False
+        for task_id in self.task_ids:
+            robot_ids = {state.winners.get(task_id)[1] if state.winners.get(task_id) else None
+                         for state in self.states.values()}
+            if len(robot_ids) != 1:
+                return False
+            robot_id = robot_ids.pop()
+            if robot_id is not None and task_id not in self.states[robot_id].positions:
+                return False
+        return True
+
+    def get_allocations(self):
+        """ Returns the tasks all robots agree on as a list of (task_id, robot_id, position).
+        The position is the position in the timetable of the robot, without the tasks of its bundle
+        that are not allocated. The allocations of each robot are sorted by position
+        """
+        if len(self.states) < len(self.robot_ids):
+            return list()
+
+        allocations = list()
+        for robot_id, state in self.states.items():
+            bundle = sorted(state.positions.items(), key=lambda item: item[1])
+            n_not_allocated = 0
+            for task_id, position in bundle:
+                if self.get_winner(task_id) == robot_id:
+                    allocations.append((task_id, robot_id, position - n_not_allocated))
+                else:
+                    n_not_allocated += 1
+        return allocations
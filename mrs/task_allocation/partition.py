@@ -0,0 +1,153 @@
+""" Partitions of the fleet for concurrent auction rounds
+
+The robots are split into disjoint partitions. Each partition runs its own rounds, i.e.,
+tasks assigned to different partitions are allocated at the same time.
+
+A task is assigned to a partition when it is announced and stays in that partition until
+a round of the partition makes no allocation. The task is then assigned to another partition.
+Tasks are assigned by:
+    - zone: to the partition with the robot closest (travel time) to the start location of the task.
+      By load if the location of no robot is known
+    - load: to the partition with the fewest tasks per robot
+"""
+import logging
+
+from mrs.utils.travel_time import get_travel_time_matrix
+
+
+class Partitioner(object):
+
+    def __init__(self, n_partitions=1, partition_by='load', rebalance_threshold=2):
+        """
+        :param n_partitions: number of partitions
+        :param partition_by: criterion to assign tasks to partitions (zone, load)
+        :param rebalance_threshold: a robot moves to another partition if the number of pending tasks
+                                    per robot of both partitions differs by more than this threshold
+        """
+        self.logger = logging.getLogger('mrs.auctioneer.partitioner')
+
+        self.n_partitions = max(n_partitions, 1)
+        self.partition_by = partition_by
+        self.rebalance_threshold = rebalance_threshold
+
+        self.partitions = {partition_id: list() for partition_id in range(self.n_partitions)}
+        # task_id: partition_id
+        self.task_partitions = dict()
+        # task_id: partitions where the task could not be allocated
+        self.tried_partitions = dict()
+
+    def add_robot(self, robot_id):
+        partition_id = min(self.partitions, key=lambda partition_id: len(self.partitions[partition_id]))
+        self.partitions[partition_id].append(robot_id)
+
+    def get_partition_id(self, robot_id):
+        for partition_id, robot_ids in self.partitions.items():
+            if robot_id in robot_ids:
+                return partition_id
+
+    def get_tasks(self, partition_id, tasks, timetables):
+        """ Returns the tasks of a partition. Tasks not assigned yet are assigned to a partition
+
+        :param partition_id: id of the partition
+        :param tasks: dict of task_id: task_lot
+        :param timetables: dict of robot_id: timetable
+        :return: dict of task_id: task_lot
+        """
+        partition_tasks = dict()
+        for task_id, task_lot in tasks.items():
+            if task_id not in self.task_partitions:
+                self.task_partitions[task_id] = self.assign_task(task_lot, tasks, timetables)
+            if self.task_partitions[task_id] == partition_id:
+                partition_tasks[task_id] = task_lot
+        return partition_tasks
+
+    def assign_task(self, task_lot, tasks, timetables):
+        tried = self.tried_partitions.get(task_lot.task.task_id, set())
+        candidates = [partition_id for partition_id, robot_ids in self.partitions.items()
+                      if robot_ids and partition_id not in tried]
+        if not candidates:
+            # The task could not be allocated in any partition. Start over
+            self.tried_partitions.pop(task_lot.task.task_id, None)
+            candidates = [partition_id for partition_id, robot_ids in self.partitions.items() if robot_ids]
+
+        if self.partition_by == 'zone' and get_travel_time_matrix():
+            distances = {partition_id: self.get_distance(partition_id, task_lot, timetables)
+                         for partition_id in candidates}
+            if any(distance < float('inf') for distance in distances.values()):
+                return min(candidates, key=lambda partition_id: (distances[partition_id],
+                                                                 self.get_load(partition_id, tasks, timetables),
+                                                                 partition_id))
+
+        return min(candidates, key=lambda partition_id: (self.get_load(partition_id, tasks, timetables),
+                                                         partition_id))
+
+    def get_distance(self, partition_id, task_lot, timetables):
+        """ Travel time from the closest robot of the partition to the start location of the task.
+        The location of a robot is the finish location of the last task in its timetable, or the
+        location stored in its timetable if it has no tasks. inf if no location is known
+        """
+        travel_time_matrix = get_travel_time_matrix()
+        distance = float('inf')
+        for robot_id in self.partitions[partition_id]:
+            timetable = timetables.get(robot_id)
+            if timetable is None:
+                continue
+            n_tasks = len(timetable.get_tasks())
+            location = timetable.get_finish_location(n_tasks) if n_tasks else timetable.location
+            if location is None:
+                continue
+            travel_time = travel_time_matrix.get_travel_time(location, task_lot.start_location)
+            if travel_time is not None:
+                distance = min(distance, travel_time)
+        return distance
+
+    def get_load(self, partition_id, tasks, timetables):
+        """ Number of tasks (allocated and pending) per robot of the partition
+        """
+        robot_ids = self.partitions[partition_id]
+        n_tasks = self.get_n_pending_tasks(partition_id, tasks)
+        for robot_id in robot_ids:
+            timetable = timetables.get(robot_id)
+            if timetable:
+                n_tasks += len(timetable.get_tasks())
+        return n_tasks / max(len(robot_ids), 1)
+
+    def get_n_pending_tasks(self, partition_id, tasks):
+        return len([task_id for task_id in tasks if self.task_partitions.get(task_id) == partition_id])
+
+    def release_tasks(self, partition_id, task_ids):
+        """ The tasks could not be allocated in the partition. They will be assigned to another partition
+        """
+        for task_id in task_ids:
+            if self.task_partitions.get(task_id) == partition_id:
+                del self.task_partitions[task_id]
+                self.tried_partitions.setdefault(task_id, set()).add(partition_id)
+
+    def remove_task(self, task_id):
+        self.task_partitions.pop(task_id, None)
+        self.tried_partitions.pop(task_id, None)
+
+    def rebalance(self, tasks, idle_partition_ids):
+        """ Moves a robot from the partition with the fewest pending tasks per robot to the partition
+        with the most pending tasks per robot, if they differ by more than the rebalance_threshold.
+        Only robots of partitions without an ongoing round are moved
+
+        :param tasks: dict of task_id: task_lot (pending tasks)
+        :param idle_partition_ids: partitions without an ongoing round
+        """
+        partition_ids = [partition_id for partition_id in idle_partition_ids if self.partitions[partition_id]]
+        if len(partition_ids) < 2:
+            return
+
+        def demand(partition_id):
+            return self.get_n_pending_tasks(partition_id, tasks) / len(self.partitions[partition_id])
+
+        donor = min(partition_ids, key=demand)
+        receiver = max(partition_ids, key=demand)
+
+        if len(self.partitions[donor]) < 2 or demand(receiver) - demand(donor) <= self.rebalance_threshold:
+            return
+
+        robot_id = self.partitions[donor].pop()
+        self.partitions[receiver].append(robot_id)
+        self.logger.debug("Moving robot %s from partition %s to partition %s", robot_id, donor, receiver)
@@ -0,0 +1,121 @@
+""" Insertion quotes: the best robot, position and start time for a task, without allocating it
+
+A quote evaluates the task against the timetables the auctioneer keeps for each robot,
+with the same bidding rule the robots use. Nothing is committed: the bids are computed on
+copies of the timetables, moved to the zero timepoint of the auctioneer. The best insertion of a
+task for a robot is cached until the timetable of the robot changes or the current minute ends
+(tasks cannot start before the current time, see Timetable.to_stn_task).
+"""
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from mrs.exceptions.task_allocation import NoSTPSolution
+from mrs.utils import clock
+
+
+class Quoter(object):
+
+    def __init__(self, bidding_rule, n_workers=4, max_size=1000):
+        self.logger = logging.getLogger('mrs.auctioneer.quoter')
+        self.bidding_rule = bidding_rule
+        self.executor = ThreadPoolExecutor(max_workers=n_workers)
+
+        # task key: robot_id: (timetable version, bid, start time)
+        self.cache = dict()
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(task_lot, zero_timepoint):
+        start_timepoint_constraints = task_lot.constraints.timepoint_constraints[0]
+        current_minute = clock.now().to_datetime().replace(second=0, microsecond=0)
+        return (task_lot.start_location, task_lot.finish_location, start_timepoint_constraints.earliest_time,
+                start_timepoint_constraints.latest_time, task_lot.constraints.hard, zero_timepoint.to_str(),
+                current_minute)
+
+    @staticmethod
+    def get_version(timetable, version):
+        # The dispatcher schedules tasks in the timetables without storing them through the auctioneer
+        return version, timetable.schedule is not None
+
+    def quote(self, task_lot, timetables, timetable_versions, zero_timepoint, completed_task_ids=()):
+        """ Returns the best feasible insertion of the task among all robots
+
+        :param task_lot: task to quote. It does not need to be stored (see mrs.structs.task.TaskLot)
+        :param timetables: dict of robot_id: timetable
+        :param timetable_versions: dict of robot_id: version of the timetable
+        :param zero_timepoint: (TimeStamp) zero timepoint of the auctioneer
+        :param completed_task_ids: tasks removed from the timetables when they are moved to the zero_timepoint
+        :return: dict with the robot_id, position, start_time (datetime), risk_metric and
+                 temporal_metric of the best insertion or None if no robot can accommodate the task
+        """
+        key = self.get_key(task_lot, zero_timepoint)
+        quotes = self.cache.setdefault(key, dict())
+
+        futures = dict()
+        for robot_id, timetable in timetables.items():
+            version = self.get_version(timetable, timetable_versions.get(robot_id, 0))
+            if robot_id not in quotes or quotes[robot_id][0] != version:
+                futures[robot_id] = (version, self.executor.submit(self.quote_robot, robot_id, task_lot,
+                                                                   copy.deepcopy(timetable), zero_timepoint,
+                                                                   completed_task_ids))
+
+        for robot_id, (version, future) in futures.items():
+            try:
+                quotes[robot_id] = (version,) + future.result()
+            except Exception as exception:
+                # The other robots can still be quoted. The robot is evaluated again in the next quote
+                self.logger.error("Task %s could not be quoted for robot %s: %s", task_lot.task.task_id, robot_id,
+                                  exception)
+                quotes.pop(robot_id, None)
+
+        self.logger.debug("Quote of task %s: %s robots evaluated, %s cached", task_lot.task.task_id,
+                          len(futures), len(timetables) - len(futures))
+
+        while len(self.cache) > self.max_size:
+            del self.cache[next(iter(self.cache))]
+
+        best_robot_id = None
+        for robot_id, (version, bid, start_time) in quotes.items():
+            if robot_id not in timetables or bid is None:
+                continue
+            if best_robot_id is None or bid < quotes[best_robot_id][1]:
+                best_robot_id = robot_id
+
+        if best_robot_id is None:
+            return None
+
+        _, bid, start_time = quotes[best_robot_id]
+        return {'robot_id': best_robot_id,
+                'position': bid.position,
+                'start_time': (zero_timepoint + timedelta(minutes=start_time)).to_datetime(),
+                'risk_metric': bid.risk_metric,
+                'temporal_metric': bid.temporal_metric}
+
+    def quote_robot(self, robot_id, task_lot, timetable, zero_timepoint, completed_task_ids=()):
+        """ Returns the best bid and the start time (minutes after the zero_timepoint) of the
+        task in the timetable, or (None, None)
+        """
+        # Timetables that were never stored have no zero_timepoint
+        timetable.update_zero_timepoint(zero_timepoint, completed_task_ids)
+
+        best_bid = None
+        start_time = None
+        first_position = 2 if timetable.schedule else 1
+
+        for position in range(first_position, len(timetable.get_tasks()) + 2):
+            try:
+                bid = self.bidding_rule.compute_bid(robot_id, None, task_lot, position, timetable)
+                if best_bid is None or bid < best_bid or (bid == best_bid and bid.position < best_bid.position):
+                    best_bid = copy.copy(bid)
+                    best_bid.timetable = None
+                    start_time = timetable.get_time(task_lot.task.task_id, 'start')
+            except NoSTPSolution:
+                pass
+            timetable.remove_task_from_stn(position)
+
+        return best_bid, start_time
+
+    def clear(self):
+        self.cache.clear()
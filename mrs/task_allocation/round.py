@@ -1,12 +1,12 @@
 import copy
 import logging
 
-from ropod.utils.timestamp import TimeStamp
 from ropod.utils.uuid import generate_uuid
 
 from mrs.exceptions.task_allocation import AlternativeTimeSlot
 from mrs.exceptions.task_allocation import NoAllocation
 from mrs.structs.bid import Bid
+from mrs.utils import clock
 import numpy as np
 
 
@@ -19,7 +19,11 @@ class Round(object):
         self.tasks_to_allocate = kwargs.get('tasks_to_allocate', dict())
         self.round_time = kwargs.get('round_time', 0)
         self.n_robots = kwargs.get('n_robots', 0)
+        # Number of robots the task was announced to (task_id: n_robots). Defaults to n_robots
+        self.n_robots_per_task = kwargs.get('n_robots_per_task', dict())
         self.alternative_timeslots = kwargs.get('alternative_timeslots', False)
+        # A re-allocation round only announces tasks that are being re-allocated
+        self.re_allocation = kwargs.get('re_allocation', False)
 
         self.closure_time = 0
         self.id = generate_uuid()
@@ -27,6 +31,8 @@ class Round(object):
         self.opened = False
         self.received_bids = dict()
         self.received_no_bids = dict()
+        # Best bid with an alternative start time per task
+        self.received_soft_bids = dict()
 
     def start(self):
         """ Starts and auction round:
@@ -44,8 +50,8 @@ class Round(object):
                     (or an exception has been raised)
 
         """
-        open_time = TimeStamp()
-        self.closure_time = TimeStamp(delta=self.round_time)
+        open_time = clock.now()
+        self.closure_time = open_time + self.round_time
         self.logger.debug("Round opened at %s and will close at %s",
                           open_time, self.closure_time)
 
@@ -54,11 +60,21 @@ class Round(object):
 
     def process_bid(self, payload):
         bid = Bid.from_payload(payload)
+        self.add_bid(bid)
 
+    def add_bid(self, bid):
         self.logger.debug("Processing bid from robot %s: (risk metric: %s, temporal metric: %s)",
                           bid.robot_id, bid.risk_metric, bid.temporal_metric)
 
-        if bid.cost != (np.inf, np.inf):
+        if bid.hard_constraints is False:
+            # Process a soft bid. The robot could not accommodate the task at the requested time
+            self.received_no_bids[bid.task_id] = self.received_no_bids.get(bid.task_id, 0) + 1
+            if bid.task_id not in self.received_soft_bids or \
+                    self.update_task_bid(bid, self.received_soft_bids[bid.task_id]):
+
+                self.received_soft_bids[bid.task_id] = bid
+
+        elif bid.cost != (np.inf, np.inf):
             # Process a bid
             if bid.task_id not in self.received_bids or \
                     self.update_task_bid(bid, self.received_bids[bid.task_id]):
@@ -84,7 +100,7 @@ class Round(object):
         return False
 
     def time_to_close(self):
-        current_time = TimeStamp()
+        current_time = clock.now()
 
         if current_time < self.closure_time:
             return False
@@ -106,10 +122,6 @@ class Round(object):
         tasks_to_allocate (dict): tasks left to allocate
 
         """
-        # Check for which tasks the constraints need to be set to soft
-        if self.alternative_timeslots and self.received_no_bids:
-            self.set_soft_constraints()
-
         try:
             winning_bid = self.elect_winner()
             allocated_task = self.tasks_to_allocate.pop(winning_bid.task_id, None)
@@ -130,20 +142,21 @@ class Round(object):
         self.finished = True
         self.logger.debug("Round finished")
 
-    def set_soft_constraints(self):
-        """ If the number of no-bids for a task is equal to the number of robots,
-        set the temporal constraints to soft
+    def get_soft_bids(self):
+        """ Returns the soft bids of the tasks that no robot could accommodate
+        at the requested time, i.e., the tasks with as many no-bids as robots
         """
-
-        for task_id, n_no_bids in self.received_no_bids.items():
-            if n_no_bids == self.n_robots:
-                task = self.tasks_to_allocate.get(task_id)
-                task.hard_constraints = False
-                self.tasks_to_allocate.update({task_id: task})
-                self.logger.debug("Setting soft constraints for task %s", task_id)
+        soft_bids = dict()
+        for task_id, bid in self.received_soft_bids.items():
+            if self.received_no_bids.get(task_id) == self.n_robots_per_task.get(task_id, self.n_robots):
+                self.logger.debug("Task %s can only be allocated at an alternative time", task_id)
+                soft_bids[task_id] = bid
+        return soft_bids
 
     def elect_winner(self):
-        """ Elects the winner of the round
+        """ Elects the winner of the round. Bids that satisfy the temporal constraints of the
+        tasks have priority. If there are none and alternative timeslots are enabled, elects the
+        soft bid with the smallest cost
 
         :return:
         mrs(dict): key - task_id,
@@ -152,7 +165,11 @@ class Round(object):
         """
         lowest_bid = None
 
-        for task_id, bid in self.received_bids.items():
+        bids = self.received_bids
+        if not bids and self.alternative_timeslots:
+            bids = self.get_soft_bids()
+
+        for task_id, bid in bids.items():
             if lowest_bid is None or bid < lowest_bid:
                 lowest_bid = copy.deepcopy(bid)
 
@@ -0,0 +1,116 @@
+""" Adaptive round time
+
+Records how long each robot takes to answer a task announcement (time between the opening of the
+round and the arrival of the first bid of the robot) per announcement size, and sets the round time
+of the next round to the latency the robots of the round answer within: the given percentile of the
+latencies of the slowest robot, plus a margin, capped by the configured round time.
+
+Announcement sizes are grouped in powers of two (1, 2-3, 4-7, ... tasks). When a robot has fewer
+than min_samples latencies for a size, its latencies for larger announcements are used, and the
+configured round time if it has none. A robot whose bid arrived after the closure of a round is
+given the largest of its recent latencies instead of the percentile.
+"""
+import collections
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from mrs.utils import clock
+
+
+def get_size_class(n_tasks):
+    return int(n_tasks).bit_length()
+
+
+class RoundTimer(object):
+
+    def __init__(self, percentile=95, margin=1, min_round_time=1, min_samples=5, window=50, max_rounds=100):
+        """
+        :param percentile: percentile of the latencies of a robot the round waits for
+        :param margin: (seconds) added to the estimated latency
+        :param min_round_time: (seconds) shortest round time
+        :param min_samples: latencies of a robot per announcement size needed to estimate its latency
+        :param window: latencies kept per robot and announcement size
+        :param max_rounds: rounds kept to match incoming bids
+        """
+        self.logger = logging.getLogger('mrs.auctioneer.round_timer')
+        self.percentile = percentile
+        self.margin = margin
+        self.min_round_time = min_round_time
+        self.min_samples = min_samples
+        self.window = window
+        self.max_rounds = max_rounds
+
+        # robot_id: size class: deque of (latency, late)
+        self.latencies = collections.defaultdict(dict)
+        # round_id: (open time, round time, robot_id: number of announced tasks)
+        self.rounds = collections.OrderedDict()
+        # round_id: robots whose latency was recorded
+        self.answered = dict()
+        self.n_late_bids = 0
+
+    def get_round_time(self, n_tasks, max_round_time):
+        """ Returns the time the robots need to answer the announcement
+
+        :param n_tasks: dict of robot_id: number of tasks announced to the robot
+        :param max_round_time: (timedelta) configured round time
+        :return: timedelta
+        """
+        latencies = [self.get_latency(robot_id, n_tasks_) for robot_id, n_tasks_ in n_tasks.items() if n_tasks_]
+        if not latencies or None in latencies:
+            return max_round_time
+
+        round_time = max(max(latencies) + self.margin, self.min_round_time)
+        return min(max_round_time, timedelta(seconds=round_time))
+
+    def get_latency(self, robot_id, n_tasks):
+        """ Returns the estimated latency (seconds) of the robot for an announcement of n_tasks tasks,
+        or None if there are not enough samples
+        """
+        size_class = get_size_class(n_tasks)
+        samples = list()
+        for size_class_, latencies in sorted(self.latencies.get(robot_id, dict()).items()):
+            if size_class_ >= size_class:
+                samples.extend(latencies)
+            if len(samples) >= self.min_samples:
+                break
+
+        if len(samples) < self.min_samples:
+            return None
+        if any(late for latency, late in samples):
+            return max(latency for latency, late in samples)
+        return float(np.percentile([latency for latency, late in samples], self.percentile))
+
+    def add_round(self, round_id, round_time, n_tasks):
+        """
+        :param round_id: id of the round
+        :param round_time: (timedelta) round time of the round
+        :param n_tasks: dict of robot_id: number of tasks announced to the robot
+        """
+        self.rounds[round_id] = (clock.time(), round_time.total_seconds(), n_tasks)
+        self.answered[round_id] = set()
+        while len(self.rounds) > self.max_rounds:
+            old_round_id, _ = self.rounds.popitem(last=False)
+            self.answered.pop(old_round_id, None)
+
+    def add_bid(self, round_id, robot_id):
+        """ Records the latency of the robot, on the arrival of its first bid of the round
+        """
+        if round_id not in self.rounds or robot_id in self.answered[round_id]:
+            return
+        open_time, round_time, n_tasks = self.rounds[round_id]
+        if not n_tasks.get(robot_id):
+            return
+        self.answered[round_id].add(robot_id)
+
+        latency = clock.time() - open_time
+        late = latency > round_time
+        if late:
+            self.n_late_bids += 1
+            self.logger.warning("Bid of robot %s arrived %.2f s after the closure of round %s",
+                                robot_id, latency - round_time, round_id)
+
+        size_class = get_size_class(n_tasks[robot_id])
+        latencies = self.latencies[robot_id].setdefault(size_class, collections.deque(maxlen=self.window))
+        latencies.append((latency, late))
@@ -0,0 +1,219 @@
+""" Fleet-wide index of the tasks in the timetables of all robots
+
+One row per task, stored column-wise in arrays sorted by start time:
+    robot_id, task_id, start (lower bound of the navigation timepoint), latest_start (upper bound of the
+    navigation timepoint), earliest_finish and finish (lower and upper bounds of the finish timepoint),
+    start_location, finish_location
+
+Times are in minutes since the epoch, i.e., rows of timetables with different zero timepoints can be
+compared. The rows of a robot are replaced each time its timetable is stored and the arrays are rebuilt
+the next time they are queried. Queries are vectorized over the sorted arrays.
+"""
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from mrs.utils import clock
+from mrs.utils.travel_time import get_travel_time_matrix
+
+COLUMNS = ['robot_id', 'task_id', 'start', 'latest_start', 'earliest_finish', 'finish', 'start_location',
+           'finish_location']
+
+
+def to_minutes(time_):
+    """ Minutes since the epoch of a datetime or TimeStamp
+    """
+    if not isinstance(time_, datetime):
+        time_ = time_.to_datetime()
+    return time_.timestamp() / 60
+
+
+def to_datetime(minutes):
+    return datetime.fromtimestamp(minutes * 60)
+
+
+class ScheduleIndex(object):
+
+    def __init__(self):
+        self.logger = logging.getLogger('mrs.auctioneer.schedule_index')
+        # robot_id: dict of column: list of values
+        self.rows = dict()
+        # robot_id: location of the robot before its first task
+        self.locations = dict()
+        self.columns = None
+        self.gaps = None
+
+    @property
+    def robot_ids(self):
+        return list(self.rows)
+
+    def update(self, robot_id, timetable):
+        """ Replaces the rows of the robot with the tasks of its timetable
+        """
+        rows = {column: list() for column in COLUMNS}
+
+        if timetable.dispatchable_graph is not None and timetable.get_tasks():
+            zero_timepoint = to_minutes(timetable.zero_timepoint)
+            bounds = timetable.bounds
+            for position, task_id in enumerate(bounds.task_ids, 1):
+                row = position - 1
+                rows['robot_id'].append(robot_id)
+                rows['task_id'].append(task_id)
+                rows['start'].append(zero_timepoint + bounds.lower[row, 0])
+                rows['latest_start'].append(zero_timepoint + bounds.upper[row, 0])
+                rows['earliest_finish'].append(zero_timepoint + bounds.lower[row, 2])
+                rows['finish'].append(zero_timepoint + bounds.upper[row, 2])
+                rows['start_location'].append(timetable.get_start_location(position))
+                rows['finish_location'].append(timetable.get_finish_location(position))
+
+        self.rows[robot_id] = rows
+        self.locations[robot_id] = timetable.location
+        self.columns = None
+        self.gaps = None
+
+    def remove(self, robot_id):
+        self.rows.pop(robot_id, None)
+        self.locations.pop(robot_id, None)
+        self.columns = None
+        self.gaps = None
+
+    def get_columns(self):
+        """ Returns the columns of all rows, sorted by start time
+        """
+        if self.columns is None:
+            columns = {column: list() for column in COLUMNS}
+            for rows in self.rows.values():
+                for column in COLUMNS:
+                    columns[column].extend(rows[column])
+
+            order = np.argsort(np.asarray(columns['start'], dtype=float), kind='stable')
+            self.columns = dict()
+            for column in COLUMNS:
+                dtype = float if column in ['start', 'latest_start', 'earliest_finish', 'finish'] else object
+                self.columns[column] = np.asarray(columns[column], dtype=dtype)[order] if order.size else \
+                    np.asarray(list(), dtype=dtype)
+        return self.columns
+
+    def get_gaps(self):
+        """ Returns the gaps in which the robots are available:
+            - one per robot, before its first task: from -inf (at the location of the robot) to the latest
+            start of its first task (inf if the robot has no tasks)
+            - one per task: from the finish of the task (at its finish location) to the latest start of the
+            next task of the robot (inf after the last task)
+        next_location is the start location of the task that ends the gap (None if there is none)
+        """
+        if self.gaps is None:
+            columns = self.get_columns()
+            order = np.lexsort((columns['start'], columns['robot_id'].astype(str)))
+            robot_ids = columns['robot_id'][order]
+            latest_start = columns['latest_start'][order]
+            start_location = columns['start_location'][order]
+
+            same_robot = np.append(robot_ids[1:] == robot_ids[:-1], False)
+            next_location = np.append(start_location[1:], None).astype(object)
+            next_location[~same_robot] = None
+
+            # First task of each robot
+            first_rows = dict()
+            for row, robot_id in enumerate(robot_ids):
+                first_rows.setdefault(robot_id, row)
+            leading_robot_ids = list(self.rows)
+            leading_end = [latest_start[first_rows[robot_id]] if robot_id in first_rows else np.inf
+                           for robot_id in leading_robot_ids]
+            leading_next_location = [start_location[first_rows[robot_id]] if robot_id in first_rows else None
+                                     for robot_id in leading_robot_ids]
+
+            self.gaps = {'robot_id': np.concatenate([np.asarray(leading_robot_ids, dtype=object), robot_ids]),
+                         'start': np.concatenate([np.full(len(leading_robot_ids), -np.inf),
+                                                  columns['finish'][order]]),
+                         'end': np.concatenate([np.asarray(leading_end, dtype=float),
+                                                np.where(same_robot, np.append(latest_start[1:], np.inf), np.inf)]),
+                         'location': np.concatenate([np.asarray([self.locations.get(robot_id) for robot_id
+                                                                 in leading_robot_ids], dtype=object),
+                                                     columns['finish_location'][order]]),
+                         'next_location': np.concatenate([np.asarray(leading_next_location, dtype=object),
+                                                          next_location])}
+        return self.gaps
+
+    def __len__(self):
+        return len(self.get_columns()['task_id'])
+
+    def get_tasks(self, start_time, finish_time):
+        """ Returns the indices (in the sorted columns) of the tasks that might take place
+        between start_time and finish_time, i.e., start before finish_time and finish after start_time
+        """
+        columns = self.get_columns()
+        start, finish = to_minutes(start_time), to_minutes(finish_time)
+        # Tasks that start before finish_time
+        n_candidates = np.searchsorted(columns['start'], finish, side='left')
+        candidates = np.flatnonzero(columns['finish'][:n_candidates] > start)
+        return candidates
+
+    def get_busy_robots(self, start_time, finish_time):
+        columns = self.get_columns()
+        return set(columns['robot_id'][self.get_tasks(start_time, finish_time)])
+
+    def get_idle_robots(self, start_time, finish_time):
+        """ Returns the robots without tasks between start_time and finish_time (datetime or TimeStamp)
+        """
+        busy_robot_ids = self.get_busy_robots(start_time, finish_time)
+        return [robot_id for robot_id in self.rows if robot_id not in busy_robot_ids]
+
+    def get_earliest_slot(self, location, after, duration=0):
+        """ Returns the robot that can be at the location the earliest (after the given time and now) and
+        stay there for the given duration without delaying its tasks.
+
+        A robot is available now until the latest start of its first task, between the finish of a task (at its
+        finish location) and the latest start of its next task, and after its last task. A slot in a gap is
+        feasible if the robot can travel to the location, stay there for the duration and travel to the start
+        location of the task that ends the gap before its latest start. The travel times are read from the
+        travel time matrix, if one is configured (zero otherwise)
+
+        :param location: name of the location
+        :param after: (datetime or TimeStamp) earliest time of the slot
+        :param duration: (minutes) duration of the slot
+        :return: (robot_id, datetime) or None
+        """
+        now = to_minutes(clock.now())
+        after = max(to_minutes(after), now)
+
+        gaps = self.get_gaps()
+        if not len(gaps['robot_id']):
+            return None
+        travel_time_to, travel_time_from = self.get_travel_times(gaps, location)
+
+        arrival = np.maximum(np.maximum(gaps['start'], now) + travel_time_to, after)
+        feasible = arrival + duration + travel_time_from <= gaps['end']
+        if not feasible.any():
+            return None
+
+        best = np.flatnonzero(feasible)[np.argmin(arrival[feasible])]
+        return gaps['robot_id'][best], to_datetime(arrival[best])
+
+    @staticmethod
+    def get_travel_times(gaps, location):
+        """ Returns the travel times from the location of each gap to the location, and from the location to
+        the next location of each gap (zero for unknown locations)
+        """
+        n_gaps = len(gaps['location'])
+        travel_time_matrix = get_travel_time_matrix()
+        if not travel_time_matrix or location not in travel_time_matrix:
+            return np.zeros(n_gaps), np.zeros(n_gaps)
+
+        if 'location_index' not in gaps:
+            for column in ['location', 'next_location']:
+                gaps[column + '_index'] = np.array([travel_time_matrix.index.get(location_, -1)
+                                                    for location_ in gaps[column]], dtype=int)
+        index = travel_time_matrix.index[location]
+
+        rows = gaps['location_index']
+        known = rows >= 0
+        travel_times_to = np.zeros(n_gaps)
+        travel_times_to[known] = travel_time_matrix.matrix[rows[known], index]
+
+        columns = gaps['next_location_index']
+        known = columns >= 0
+        travel_times_from = np.zeros(n_gaps)
+        travel_times_from[known] = travel_time_matrix.matrix[index, columns[known]]
+        return travel_times_to, travel_times_from
@@ -1,12 +1,27 @@
 
+import heapq
 import logging
 from datetime import timedelta
 
+from fmlib.db.queries import get_task
+from mrs.db.connection import bulk_write
+from mrs.exceptions.task_execution import InconsistentSchedule
+from mrs.structs.schedule import TaskSchedule
 from mrs.task_execution.scheduler import Scheduler
+from ropod.structs.task import TaskStatus as TaskStatusConst
+from ropod.utils.timestamp import TimeStamp
 from stn.stp import STP
 
 
 class Dispatcher(object):
+    """ Dispatches the next task of each robot when the task enters its freeze window
+
+    The next task of each robot is kept in a priority queue keyed by its start navigation time
+    (lower bound in the dispatchable graph). Updating a robot's next task and waking up for
+    the next task to dispatch are O(log n) in the number of queued tasks.
+    Entries of the queue that no longer correspond to a robot's next task (because its timetable
+    changed) are discarded when they reach the head of the queue.
+    """
 
     def __init__(self, ccu_store, api, stp_solver, freeze_window, **kwargs):
         self.logger = logging.getLogger('mrs.dispatcher')
@@ -18,8 +33,100 @@ class Dispatcher(object):
         self.robot_ids = list()
         self.scheduler = Scheduler(self.stp)
 
+        self.timetables = dict()
+        self.queue = list()
+        self.next_tasks = dict()
+
         self.logger.debug("Dispatcher started")
 
+    def register_robot(self, robot_id):
+        self.robot_ids.append(robot_id)
+
+    def update_timetable(self, timetable):
+        """ Updates the timetable of a robot and re-queues its next task
+
+        :param timetable: timetable of the robot
+        """
+        self.timetables[timetable.robot_id] = timetable
+        self.queue_next_task(timetable.robot_id)
+
+    def queue_next_task(self, robot_id):
+        """ Queues the next task of the robot, i.e., the task in position 1 of its timetable.
+
+        A robot has at most one scheduled task. The next task is queued only if the robot
+        does not have a scheduled task.
+        """
+        self.next_tasks.pop(robot_id, None)
+        timetable = self.timetables.get(robot_id)
+
+        if timetable is None or timetable.schedule or not timetable.get_tasks():
+            return
+
+        task_id = timetable.get_task_id(1)
+        start_navigation_time = self.get_start_navigation_time(timetable, task_id)
+
+        self.next_tasks[robot_id] = (task_id, start_navigation_time)
+        heapq.heappush(self.queue, (start_navigation_time, robot_id, task_id))
+        self.logger.debug("Queued task %s of robot %s. Start navigation time: %s", task_id, robot_id,
+                          start_navigation_time)
+
+    @staticmethod
+    def get_start_navigation_time(timetable, task_id):
+        r_start_navigation_time = timetable.get_time(task_id, "navigation")
+        zero_timepoint = timetable.zero_timepoint
+        if isinstance(zero_timepoint, TimeStamp):
+            zero_timepoint = zero_timepoint.to_datetime()
+        return zero_timepoint + timedelta(minutes=r_start_navigation_time)
+
+    @staticmethod
+    def get_finish_time(timetable, task_id):
+        r_latest_finish_time = timetable.get_time(task_id, "finish", False)
+        zero_timepoint = timetable.zero_timepoint
+        if isinstance(zero_timepoint, TimeStamp):
+            zero_timepoint = zero_timepoint.to_datetime()
+        return zero_timepoint + timedelta(minutes=r_latest_finish_time)
+
+    def run(self):
+        """ Dispatches the tasks whose start navigation time is within the freeze window
+        """
+        current_time = TimeStamp().to_datetime()
+
+        with bulk_write():
+            while self.queue and self.queue[0][0] - self.freeze_window <= current_time:
+                start_navigation_time, robot_id, task_id = heapq.heappop(self.queue)
+
+                if self.next_tasks.get(robot_id) != (task_id, start_navigation_time):
+                    # The timetable of the robot changed after queueing the task
+                    continue
+
+                del self.next_tasks[robot_id]
+                self.dispatch(robot_id, task_id)
+
+    def dispatch(self, robot_id, task_id):
+        """ Commits the schedule of the task and sends it to the robot
+        """
+        timetable = self.timetables.get(robot_id)
+        try:
+            self.scheduler.schedule(timetable)
+        except InconsistentSchedule:
+            self.logger.error("Task %s of robot %s cannot be scheduled", task_id, robot_id)
+            return
+        timetable.store()
+
+        task_schedule = TaskSchedule(task_id, robot_id,
+                                     self.get_start_navigation_time(timetable, task_id),
+                                     self.get_finish_time(timetable, task_id),
+                                     timetable.schedule)
+
+        self.logger.debug("Dispatching task %s to robot %s. Start navigation time: %s", task_id, robot_id,
+                          task_schedule.start_time)
+
+        task = get_task(task_id)
+        task.update_status(TaskStatusConst.DISPATCHED)
+
+        msg = self.api.create_message(task_schedule)
+        self.api.publish(msg, groups=['ROPOD'])
+
 
 class DispatcherBuilder:
     def __init__(self):
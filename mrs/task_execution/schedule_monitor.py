@@ -1,6 +1,105 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from mrs.exceptions.task_execution import InconsistentSchedule, TaskNotInTimetable
 from mrs.robot_base import RobotBase
+from mrs.task_execution.scheduler import Scheduler
+from mrs.utils.task_registry import TaskRegistry
+from ropod.structs.task import TaskStatus as TaskStatusConst
+from ropod.utils.timestamp import TimeStamp
+from ropod.utils.uuid import from_str
 
 
 class ScheduleMonitor(RobotBase):
+    """ Monitors the execution of the robot's tasks
+
+    Consumes TASK-PROGRESS messages as a stream: the callback only queues the message
+    (constant time), and run() assigns the observed timepoints to the dispatchable graph.
+    Each assignment is propagated incrementally (see Scheduler.assign_timepoint) and
+    raises InconsistentSchedule as soon as it violates the temporal constraints.
+
+    A TASK-PROGRESS payload contains the taskId, robotId and either the observed
+    timepoint (navigation, start, finish) or the taskStatus. The time of the observation
+    is the timestamp of the payload (or the time of reception)
+    """
+
+    status_timepoints = {TaskStatusConst.ONGOING: 'navigation',
+                         TaskStatusConst.COMPLETED: 'finish'}
+
     def __init__(self, robot_config, schedule_monitor_config):
         super().__init__(**robot_config)
+        self.logger = logging.getLogger('mrs.schedule_monitor.%s' % self.id)
+
+        self.corrective_measure = schedule_monitor_config.get('corrective_measure')
+        self.scheduler = Scheduler(self.stp)
+
+        self.events = deque()
+        self.new_events = threading.Event()
+        # (task_id, node_type) of the timepoints already assigned, of the tasks in the timetable
+        self.assigned_timepoints = set()
+        # Completed tasks are removed from the timetable when the zero_timepoint moves (see Bidder)
+        self.task_registry = robot_config.get('task_registry') or TaskRegistry()
+
+    def task_progress_cb(self, msg):
+        payload = msg['payload']
+        if payload.get('robotId') != self.id:
+            return
+        if not payload.get('timestamp'):
+            payload['timestamp'] = msg['header'].get('timestamp')
+        if payload.get('taskStatus') == TaskStatusConst.COMPLETED or payload.get('timepoint') == 'finish':
+            self.task_registry.complete(from_str(payload['taskId']))
+        self.events.append(payload)
+        self.new_events.set()
+
+    def wait_for_events(self, timeout):
+        """ Blocks until a TASK-PROGRESS message is queued or the timeout (seconds) expires
+        """
+        self.new_events.wait(timeout)
+        self.new_events.clear()
+
+    def run(self):
+        """ Assigns the timepoints of the queued TASK-PROGRESS messages
+
+        :raises InconsistentSchedule: if an observed timepoint violates the temporal constraints
+        """
+        while self.events:
+            payload = self.events.popleft()
+            task_id = from_str(payload['taskId'])
+            node_type = payload.get('timepoint') or self.status_timepoints.get(payload.get('taskStatus'))
+
+            if node_type is None or (task_id, node_type) in self.assigned_timepoints:
+                # Progress messages that do not correspond to a new timepoint
+                continue
+
+            self.assigned_timepoints.add((task_id, node_type))
+            try:
+                self.assign_timepoint(task_id, node_type, payload.get('timestamp'))
+            except TaskNotInTimetable:
+                self.logger.warning("Ignoring %s timepoint of task %s: the task is not in the timetable",
+                                    node_type, task_id)
+
+        # Forget the timepoints of the tasks that left the timetable (executed or re-allocated)
+        task_ids = set(self.timetable.get_tasks())
+        self.assigned_timepoints = {(task_id, node_type) for task_id, node_type in self.assigned_timepoints
+                                    if task_id in task_ids}
+
+    def assign_timepoint(self, task_id, node_type, timestamp=None):
+        start = time.time()
+
+        if timestamp:
+            observed_time = TimeStamp.from_str(timestamp)
+        else:
+            observed_time = TimeStamp()
+
+        r_observed_time = observed_time.get_difference(self.timetable.zero_timepoint, "minutes")
+
+        try:
+            self.scheduler.assign_timepoint(self.timetable, task_id, node_type, r_observed_time)
+            self.logger.debug("Assigned %s to the %s timepoint of task %s (%.4f s)", r_observed_time, node_type,
+                              task_id, time.time() - start)
+        except InconsistentSchedule:
+            self.logger.warning("Task %s is inconsistent with its schedule. Observed %s time: %s", task_id,
+                                node_type, observed_time)
+            raise
@@ -1,9 +1,92 @@
 import logging
+import time
+
+from mrs.exceptions.task_execution import InconsistentSchedule, TaskNotInTimetable
+from mrs.utils.temporal_network import get_node_id, assign_timepoint, propagate, copy_bounds
 
 
 class Scheduler(object):
+    """ Instantiates the timepoints of the next task of a robot
+
+    Only the subgraph of the dispatchable graph holding the next n_tasks_sub_graphs tasks is
+    considered. Assigning a timepoint propagates the change within that subgraph and the
+    tightened bounds are written back to the dispatchable graph, i.e., the cost of scheduling
+    (and re-scheduling after a delay) does not depend on the number of tasks in the timetable.
+    Tasks outside the subgraph are updated when they enter it.
+    """
     def __init__(self, stp):
         self.stp = stp
         self.n_tasks_sub_graphs = 2
         self.logger = logging.getLogger("mrs.scheduler")
 
+    def get_sub_graph(self, timetable, task_id=None):
+        """ Returns the subgraph of the dispatchable graph with the next n_tasks_sub_graphs tasks
+
+        :param timetable: timetable of the robot
+        :param task_id: first task of the subgraph. Defaults to the task in position 1
+        :raises TaskNotInTimetable: if the task is not in the timetable
+        """
+        task_ids = list(timetable.get_tasks())
+        if task_id is None:
+            first = 0
+        elif task_id in task_ids:
+            first = task_ids.index(task_id)
+        else:
+            raise TaskNotInTimetable(task_id)
+        node_ids = [0]
+        for sub_graph_task_id in task_ids[first:first + self.n_tasks_sub_graphs]:
+            node_ids.extend(timetable.dispatchable_graph.get_task_node_ids(sub_graph_task_id))
+        return timetable.dispatchable_graph.get_subgraph(node_ids)
+
+    def schedule(self, timetable, start_time=None):
+        """ Instantiates the start navigation time of the next task of the timetable and
+        updates the schedule of the timetable
+
+        :param timetable: timetable of the robot
+        :param start_time: start navigation time (minutes after the zero_timepoint).
+                           Defaults to the earliest start navigation time in the dispatchable graph
+        :return: schedule (stn)
+        """
+        start = time.time()
+        task_id = timetable.get_task_id(1)
+
+        if start_time is None:
+            start_time = timetable.get_time(task_id, "navigation")
+
+        self.assign_timepoint(timetable, task_id, "navigation", start_time)
+        timetable.get_schedule(task_id)
+
+        self.logger.debug("Scheduled task %s at %s (%.4f s)", task_id, start_time, time.time() - start)
+        return timetable.schedule
+
+    def assign_timepoint(self, timetable, task_id, node_type, assigned_time):
+        """ Assigns a time to a timepoint of a task in the dispatchable graph and propagates
+        the change to the tasks in the subgraph
+
+        :param timetable: timetable of the robot
+        :param task_id: id of the task
+        :param node_type: type of the timepoint (navigation, start, finish)
+        :param assigned_time: time (minutes after the zero_timepoint)
+        :return: set of node ids whose bounds were tightened
+        :raises InconsistentSchedule: (at risk task) if the assignment violates the temporal constraints
+        :raises TaskNotInTimetable: if the task (or its timepoint) is not in the timetable
+        """
+        sub_graph = self.get_sub_graph(timetable, task_id)
+        node_id = get_node_id(sub_graph, task_id, node_type)
+        if node_id is None:
+            raise TaskNotInTimetable(task_id)
+
+        assign_timepoint(sub_graph, node_id, assigned_time)
+        try:
+            tightened = propagate(sub_graph, [node_id])
+        except ValueError as error:
+            # The task whose timepoint became inconsistent is the one at risk
+            inconsistent_node_id = error.args[0]
+            at_risk_task_id = sub_graph.nodes[inconsistent_node_id]['data'].task_id
+            self.logger.warning("Assigning %s to the %s timepoint of task %s makes task %s inconsistent",
+                                assigned_time, node_type, task_id, at_risk_task_id)
+            raise InconsistentSchedule(at_risk_task_id)
+
+        copy_bounds(sub_graph, timetable.dispatchable_graph, tightened | {node_id})
+        timetable.update_bounds(tightened | {node_id})
+        return tightened
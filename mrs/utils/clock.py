@@ -0,0 +1,78 @@
+""" Clock of the task allocation components
+
+Rounds, bidding deadlines, the announcement horizon, the rolling horizon and the zero timepoints
+read the current time from this module. By default it is the system clock. A replay (see mrs.replay) installs a
+SimulatedClock so that a recorded run can be reproduced faster than real time.
+"""
+import time as time_
+from datetime import datetime
+
+from ropod.utils.timestamp import TimeStamp
+
+
+class Clock(object):
+
+    @staticmethod
+    def time():
+        """ Current time in seconds since the epoch
+        """
+        return time_.time()
+
+
+class SimulatedClock(Clock):
+    """ Clock that starts at start_time and runs speed times faster than the system clock
+
+    :param start_time: (float) seconds since the epoch
+    :param speed: (float) simulated seconds per real second
+    """
+    def __init__(self, start_time, speed=1.0):
+        self.start_time = start_time
+        self.speed = speed
+        self.real_start_time = time_.time()
+
+    def time(self):
+        return self.start_time + (time_.time() - self.real_start_time) * self.speed
+
+    def advance(self, simulated_time):
+        """ Jumps forward to simulated_time (seconds since the epoch), e.g., to skip periods without events
+        """
+        if simulated_time > self.time():
+            self.start_time = simulated_time
+            self.real_start_time = time_.time()
+
+    def sleep(self, seconds):
+        """ Sleeps for the real time that corresponds to the given simulated seconds
+        """
+        time_.sleep(seconds / self.speed)
+
+
+_clock = Clock()
+
+
+def set_clock(clock):
+    global _clock
+    _clock = clock
+
+
+def get_clock():
+    return _clock
+
+
+def time():
+    return _clock.time()
+
+
+def now():
+    """ Current time as a TimeStamp
+    """
+    timestamp = TimeStamp()
+    timestamp.timestamp = datetime.fromtimestamp(_clock.time())
+    return timestamp
+
+
+def today():
+    """ Start of the current day as a TimeStamp
+    """
+    timestamp = now()
+    timestamp.timestamp = timestamp.timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp
@@ -6,9 +6,12 @@ from ropod.utils.timestamp import TimeStamp
 from ropod.utils.uuid import generate_uuid
 
 from fmlib.models.tasks import Task
+from fmlib.models.tasks import TaskConstraints, TimepointConstraints
 from fmlib.models.requests import TransportationRequest
 from mrs.db.models.performance.task import TaskPerformance
 from mrs.db.models.performance.dataset import DatasetPerformance
+from mrs.structs import task as task_structs
+from ropod.utils.uuid import from_str
 
 
 def load_yaml(file):
@@ -55,6 +58,42 @@ def load_yaml_dataset(dataset_path):
     return tasks_performance
 
 
+def load_tasks_lots(dataset_path):
+    """ Reads the tasks of a dataset as in-memory task lots, i.e., without storing them
+
+    :param dataset_path: dataset file
+    :return: dataset_id, list of task lots (see mrs.structs.task.TaskLot)
+    """
+    dataset_dict = load_yaml(dataset_path)
+    dataset_id = dataset_dict.get('dataset_id')
+
+    tasks_lots = list()
+    tasks_dict = dataset_dict.get('tasks')
+    ordered_tasks = collections.OrderedDict(sorted(tasks_dict.items()))
+
+    for task_id, task_info in ordered_tasks.items():
+        earliest_start_time, latest_start_time = reference_to_current_time(task_info.get("earliest_start_time"),
+                                                                           task_info.get("latest_start_time"))
+        # Same resolution as the times stored in the ccu store (milliseconds)
+        earliest_start_time, latest_start_time = [to_milliseconds(TimeStamp.from_str(time_).to_datetime())
+                                                  for time_ in (earliest_start_time, latest_start_time)]
+        start_timepoint_constraints = TimepointConstraints(earliest_time=earliest_start_time,
+                                                           latest_time=latest_start_time)
+        constraints = TaskConstraints(timepoint_constraints=[start_timepoint_constraints],
+                                      hard=task_info.get("hard_constraints"))
+
+        tasks_lots.append(task_structs.TaskLot(task_structs.Task(from_str(task_id)),
+                                               task_info.get("start_location"),
+                                               task_info.get("finish_location"),
+                                               constraints))
+
+    return dataset_id, tasks_lots
+
+
+def to_milliseconds(datetime_):
+    return datetime_.replace(microsecond=datetime_.microsecond // 1000 * 1000)
+
+
 def reference_to_current_time(earliest_time, latest_time):
     delta = timedelta(minutes=earliest_time)
     r_earliest_time = TimeStamp(delta).to_str()
@@ -0,0 +1,80 @@
+""" In-process stand-in for the middleware api
+
+Components that run in the same process (e.g., the auctioneer and the bidders of an offline
+allocation or a replay) exchange messages through a LocalAPI instead of zyre. Messages have the
+same structure as the ones sent by the middleware: a header with the msg type and a payload
+with camelCase keys. Published messages are queued and delivered to the callbacks registered
+for their type when run() is called.
+"""
+import collections
+import json
+import logging
+
+from ropod.utils.uuid import generate_uuid
+
+from mrs.utils import clock
+
+
+def to_camel_case(key):
+    words = key.split('_')
+    return words[0] + ''.join(word.title() for word in words[1:])
+
+
+def to_payload(dict_repr):
+    """ Converts the dict representation of a message struct to a payload: camelCase keys and
+    values serialized as they would be by the middleware (uuids and timestamps as strings)
+    """
+    def convert(value):
+        if isinstance(value, dict):
+            return {to_camel_case(key) if isinstance(key, str) else key: convert(item)
+                    for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [convert(item) for item in value]
+        return value
+
+    return convert(json.loads(json.dumps(dict_repr, default=str)))
+
+
+class LocalAPI(object):
+
+    def __init__(self):
+        self.logger = logging.getLogger('mrs.local_api')
+        # msg_type: list of callbacks
+        self.callbacks = collections.defaultdict(list)
+        self.queue = collections.deque()
+        # (time, msg) of all published messages
+        self.published = list()
+
+    def register_callback(self, msg_type, callback):
+        self.callbacks[msg_type].append(callback)
+
+    @staticmethod
+    def create_message(contents):
+        msg = dict()
+        msg['header'] = {'type': contents.meta_model.upper(),
+                         'msgId': str(generate_uuid()),
+                         'timestamp': clock.now().to_str()}
+        msg['payload'] = to_payload(contents.to_dict())
+        msg['payload']['metamodel'] = 'ropod-%s-schema.json' % contents.meta_model
+        return msg
+
+    def publish(self, msg, **kwargs):
+        self.published.append((clock.time(), msg))
+        self.queue.append(msg)
+
+    def run(self):
+        """ Delivers the queued messages, including the ones published by the callbacks
+        """
+        n_delivered = 0
+        while self.queue:
+            msg = self.queue.popleft()
+            for callback in self.callbacks.get(msg['header']['type'], list()):
+                callback(msg)
+            n_delivered += 1
+        return n_delivered
+
+    def start(self):
+        pass
+
+    def shutdown(self):
+        pass
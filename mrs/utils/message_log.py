@@ -0,0 +1,78 @@
+""" Append-only log of the MRTA messages of a component
+
+Each line is a compact json array: [time, direction, message]
+    time: seconds since the epoch (see mrs.utils.clock) when the message was sent or received
+    direction: 'in' (received) or 'out' (published)
+    message: the message as sent by the middleware (header and payload)
+
+The log is written line by line and flushed after each message, i.e., a log of a run that
+crashed can still be replayed (see mrs.replay).
+"""
+import functools
+import json
+import logging
+import threading
+
+from mrs.utils import clock
+
+MRTA_MSG_TYPES = ['TASK-ANNOUNCEMENT', 'BID', 'ALLOCATION', 'FINISH-ROUND', 'CONSENSUS-STATE', 'FINISH-CONSENSUS']
+
+
+def get_msg_type(msg):
+    return msg.get('header', dict()).get('type')
+
+
+class MessageLog(object):
+
+    def __init__(self, path, msg_types=None):
+        self.logger = logging.getLogger('mrs.message_log')
+        self.path = path
+        self.msg_types = msg_types or MRTA_MSG_TYPES
+        self.lock = threading.Lock()
+        self.file = open(path, 'a')
+        self.logger.info("Recording %s messages to %s", self.msg_types, path)
+
+    def record(self, msg, direction):
+        if get_msg_type(msg) not in self.msg_types:
+            return
+        line = json.dumps([round(clock.time(), 6), direction, msg], separators=(',', ':'), default=str)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def attach(self, api, component, callbacks):
+        """ Records the messages published by the api and the messages received by the callbacks
+        of the component. Call before registering the callbacks of the component in the api
+
+        :param api: api of the component
+        :param component: object with the callbacks, e.g., the auctioneer
+        :param callbacks: names of the callbacks, e.g., ['bid_cb', 'finish_round_cb']
+        """
+        api.publish = self.recorded(api.publish, 'out')
+        for callback in callbacks:
+            setattr(component, callback, self.recorded(getattr(component, callback), 'in'))
+
+    def recorded(self, function, direction):
+        @functools.wraps(function)
+        def wrapper(msg, *args, **kwargs):
+            self.record(msg, direction)
+            return function(msg, *args, **kwargs)
+        return wrapper
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    @staticmethod
+    def read(path, direction=None):
+        """ Yields the (time, direction, msg) entries of the log, in the order they were recorded
+
+        :param direction: only yield entries with this direction ('in' or 'out')
+        """
+        with open(path) as log_file:
+            for line in log_file:
+                if not line.strip():
+                    continue
+                time_, direction_, msg = json.loads(line)
+                if direction is None or direction_ == direction:
+                    yield time_, direction_, msg
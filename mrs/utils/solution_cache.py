@@ -0,0 +1,117 @@
+""" Reuse of previous stp solutions (dispatchable graph and risk metric)
+
+Consecutive solves of a robot's stp are often almost identical. Between rounds, the stn of a
+robot that did not win a task only differs from the stn it solved in the previous round in the
+lower bounds of the timepoints relative to the zero_timepoint (the earliest navigation start of
+the inserted task is the time of the insertion).
+
+A previous solution is reused when the new stn only tightens those lower bounds and the
+previous dispatchable graph already satisfies them: the previous solution is feasible for the
+new problem and, since the new problem is more constrained, it is also optimal.
+
+Only the solutions of the robustness solvers are cached: an fpc solve (shortest paths) costs
+less than computing the key of the stn.
+"""
+import threading
+from collections import OrderedDict
+
+from mrs.utils.stn_encoding import encode_stn, decode_stn
+from mrs.utils.temporal_network import EPSILON, ZERO_TIMEPOINT
+
+CACHED_SOLVERS = ('srea', 'dsc_lp')
+
+
+class SolutionCache(object):
+
+    def __init__(self, max_size=1000, solvers=CACHED_SOLVERS):
+        self.max_size = max_size
+        self.solvers = solvers
+        self.solutions = OrderedDict()
+        self.n_hits = 0
+        self.n_misses = 0
+        # The cache is shared by the bidders hosted in the same process (see RobotHost)
+        self.lock = threading.Lock()
+
+    def caches(self, solver_name):
+        return solver_name in self.solvers
+
+    @staticmethod
+    def get_key(solver_name, stn):
+        """ Returns the key of an stn (its timepoints and all constraints except the lower bounds
+        relative to the zero_timepoint) and its lower bounds relative to the zero_timepoint.
+        Read from the edges of the distance graph, without serializing the stn
+        """
+        constraints = list()
+        for i, j, attributes in stn.edges(data=True):
+            if j != ZERO_TIMEPOINT:
+                constraints.append((i, j) + tuple(sorted((key, value if key == 'weight' else str(value))
+                                                         for key, value in attributes.items())))
+
+        timepoints = list()
+        for node_id, data in stn.nodes(data=True):
+            node = data.get('data')
+            if node is None:
+                timepoints.append((node_id,))
+            else:
+                timepoints.append((node_id, str(node.task_id), node.node_type, node.pose))
+
+        return (solver_name, tuple(sorted(timepoints, key=lambda timepoint: timepoint[0])),
+                frozenset(constraints)), SolutionCache.get_lower_bounds(stn)
+
+    @staticmethod
+    def get_lower_bounds(graph):
+        """ Returns the lower bounds of the timepoints relative to the zero_timepoint
+        """
+        return {i: -weight for i, j, weight in graph.edges(data='weight') if j == ZERO_TIMEPOINT}
+
+    def get(self, key, lower_bounds, stn_cls):
+        """ Returns a previous solution (risk_metric, dispatchable_graph) that
+        holds for the stn with the given key and lower bounds, or None
+
+        :param key: key of the stn (see get_key)
+        :param lower_bounds: lower bounds of the stn relative to the zero_timepoint (see get_key)
+        :param stn_cls: stn of the type used by the stp solver
+        """
+        with self.lock:
+            for stn_lower_bounds, graph_lower_bounds, risk_metric, encoded_graph in self.solutions.get(key, list()):
+                if self.holds(lower_bounds, stn_lower_bounds, graph_lower_bounds):
+                    self.solutions.move_to_end(key)
+                    self.n_hits += 1
+                    break
+            else:
+                self.n_misses += 1
+                return
+
+        return risk_metric, decode_stn(encoded_graph, stn_cls)
+
+    @staticmethod
+    def holds(lower_bounds, stn_lower_bounds, graph_lower_bounds):
+        for node_id, lower in lower_bounds.items():
+            if lower < stn_lower_bounds.get(node_id, float('inf')) - EPSILON:
+                # The new stn is less constrained. The previous solution might not be optimal
+                return False
+            if lower > graph_lower_bounds.get(node_id, -float('inf')) + EPSILON:
+                # The previous solution violates the new constraint
+                return False
+        return True
+
+    def add(self, key, lower_bounds, risk_metric, dispatchable_graph):
+        encoded_graph = encode_stn(dispatchable_graph)
+        graph_lower_bounds = self.get_lower_bounds(dispatchable_graph)
+
+        with self.lock:
+            solutions = self.solutions.setdefault(key, list())
+            solutions.insert(0, (lower_bounds, graph_lower_bounds, risk_metric, encoded_graph))
+            del solutions[2:]
+
+            self.solutions.move_to_end(key)
+            while len(self.solutions) > self.max_size:
+                self.solutions.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.solutions.clear()
+
+
+# Shared by all timetables of the process
+solution_cache = SolutionCache()
@@ -0,0 +1,145 @@
+""" Compact, columnar encoding of temporal networks (stn, dispatchable graph, schedule)
+
+The dictionary representation of an stn (node-link format) stores one entry per
+node and two entries per constraint (one per edge of the distance graph).
+The columnar encoding stores:
+
+- nodes: one array per node attribute (id, task_id, node_type, pose, ...)
+- edges: one row per constraint i --- [lower, upper] ---> j (i < j), stored as
+         four arrays (source, target, lower, upper)
+
+Edge attributes other than the weight (e.g. distributions of contingent constraints)
+are stored in a sparse list and only for the edges that have them.
+"""
+
+FORMAT = 'columnar'
+
+
+def is_encoded(stn_dict):
+    return isinstance(stn_dict, dict) and stn_dict.get('format') == FORMAT
+
+
+def encode_stn(stn):
+    """ Returns the columnar encoding of an stn
+
+    :param stn: stn object (or its node-link dictionary representation)
+    :return: encoded stn (dict)
+    """
+    stn_dict = stn if isinstance(stn, dict) else stn.to_dict()
+    links_key = 'links' if 'links' in stn_dict else 'edges'
+
+    nodes = {'id': list()}
+    node_dicts = stn_dict.get('nodes', list())
+    data_keys = sorted({key for node in node_dicts for key in node.get('data', dict())})
+    for key in data_keys:
+        nodes[key] = list()
+
+    for node in node_dicts:
+        nodes['id'].append(node['id'])
+        data = node.get('data', dict())
+        for key in data_keys:
+            nodes[key].append(data.get(key))
+
+    # Pair the two edges of the distance graph into one constraint
+    constraints = dict()
+    edge_attributes = list()
+    for link in stn_dict.get(links_key, list()):
+        i, j = link['source'], link['target']
+        weight = link.get('weight')
+        if (i, j) <= (j, i):
+            constraints.setdefault((i, j), [None, None])[1] = weight
+        else:
+            constraints.setdefault((j, i), [None, None])[0] = -weight if weight is not None else None
+
+        attributes = {key: value for key, value in link.items() if key not in ('source', 'target', 'weight')}
+        if attributes:
+            edge_attributes.append([i, j, attributes])
+
+    edges = {'source': list(), 'target': list(), 'lower': list(), 'upper': list()}
+    for (i, j), (lower, upper) in constraints.items():
+        edges['source'].append(i)
+        edges['target'].append(j)
+        edges['lower'].append(lower)
+        edges['upper'].append(upper)
+
+    return {'format': FORMAT,
+            'directed': stn_dict.get('directed', True),
+            'multigraph': stn_dict.get('multigraph', False),
+            'graph': stn_dict.get('graph', dict()),
+            'links_key': links_key,
+            'nodes': nodes,
+            'edges': edges,
+            'edge_attributes': edge_attributes}
+
+
+def to_node_link_dict(encoded_stn):
+    """ Converts a columnar encoded stn back to the node-link dictionary
+    representation used by stn.to_dict() and stn.from_dict()
+    """
+    nodes = encoded_stn['nodes']
+    data_keys = [key for key in nodes if key != 'id']
+    node_dicts = list()
+    for index, node_id in enumerate(nodes['id']):
+        data = {key: nodes[key][index] for key in data_keys}
+        node_dicts.append({'id': node_id, 'data': data})
+
+    attributes = {(i, j): link_attributes for i, j, link_attributes in encoded_stn.get('edge_attributes', list())}
+
+    links = list()
+    edges = encoded_stn['edges']
+    for i, j, lower, upper in zip(edges['source'], edges['target'], edges['lower'], edges['upper']):
+        if upper is not None:
+            link = {'source': i, 'target': j, 'weight': upper}
+            link.update(attributes.get((i, j), dict()))
+            links.append(link)
+        if lower is not None:
+            link = {'source': j, 'target': i, 'weight': -lower}
+            link.update(attributes.get((j, i), dict()))
+            links.append(link)
+
+    return {'directed': encoded_stn.get('directed', True),
+            'multigraph': encoded_stn.get('multigraph', False),
+            'graph': encoded_stn.get('graph', dict()),
+            'nodes': node_dicts,
+            encoded_stn.get('links_key', 'links'): links}
+
+
+def decode_stn(stn_dict, stn_cls):
+    """ Returns an stn object from its columnar encoding or from its node-link dictionary
+
+    :param stn_dict: encoded stn (dict)
+    :param stn_cls: stn of the type used by the stp solver
+    :return: stn object
+    """
+    if is_encoded(stn_dict):
+        stn_dict = to_node_link_dict(stn_dict)
+    return stn_cls.from_dict(stn_dict)
+
+
+def get_time(encoded_stn, task_id, node_type='navigation', lower_bound=True):
+    """ Reads the time of a timepoint directly from the encoded stn, without decoding it
+
+    The time of a timepoint is given by the constraint between the zero_timepoint (node 0)
+    and the timepoint:  0 --- [lower, upper] ---> node
+
+    :param encoded_stn: encoded stn (dict)
+    :param task_id: id of the task the timepoint belongs to
+    :param node_type: type of timepoint (navigation, start, finish)
+    :param lower_bound: returns the lower bound if True, the upper bound otherwise
+    :return: time (float) relative to the zero_timepoint or None if the timepoint does not exist
+    """
+    nodes = encoded_stn['nodes']
+    node_id = None
+    for index, (node_task_id, node_node_type) in enumerate(zip(nodes.get('task_id', list()),
+                                                              nodes.get('node_type', list()))):
+        if node_task_id == str(task_id) and node_node_type == node_type:
+            node_id = nodes['id'][index]
+            break
+
+    if node_id is None:
+        return None
+
+    edges = encoded_stn['edges']
+    for i, j, lower, upper in zip(edges['source'], edges['target'], edges['lower'], edges['upper']):
+        if i == 0 and j == node_id:
+            return lower if lower_bound else upper
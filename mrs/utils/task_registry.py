@@ -0,0 +1,84 @@
+""" In-memory registry of the tasks allocated to a robot
+
+The bidder reads and updates tasks in memory. Writes to the robot store are queued and
+executed by a background thread, i.e., bidding does not wait for the database.
+"""
+import logging
+import queue
+import threading
+
+from fmlib.db.queries import get_task
+from fmlib.models.tasks import Task
+from ropod.structs.task import TaskStatus as TaskStatusConst
+
+
+class TaskRegistry(object):
+
+    def __init__(self, persistent=True):
+        self.logger = logging.getLogger('mrs.task_registry')
+        # If False, tasks are only kept in memory (e.g. offline allocation)
+        self.persistent = persistent
+
+        # task_id: task_lot
+        self.tasks_lots = dict()
+        # task_id: status
+        self.statuses = dict()
+
+        self.writes = queue.Queue()
+        if persistent:
+            self.writer = threading.Thread(target=self.run_writes, daemon=True)
+            self.writer.start()
+
+    def get(self, task_id):
+        return self.tasks_lots.get(task_id)
+
+    def get_status(self, task_id):
+        return self.statuses.get(task_id)
+
+    def allocate(self, task_lot, robot_id):
+        """ Registers the task as allocated to the robot and stores the allocation asynchronously
+        """
+        task_id = task_lot.task.task_id
+        self.tasks_lots[task_id] = task_lot
+        self.statuses[task_id] = TaskStatusConst.ALLOCATED
+        self.persist(self.store_allocation, task_id, robot_id)
+
+    def complete(self, task_id):
+        """ Marks the task as completed. The task is removed when it leaves the timetable
+        """
+        self.statuses[task_id] = TaskStatusConst.COMPLETED
+
+    def get_completed(self):
+        return {task_id for task_id, status in list(self.statuses.items()) if status == TaskStatusConst.COMPLETED}
+
+    def remove(self, task_id):
+        self.tasks_lots.pop(task_id, None)
+        self.statuses.pop(task_id, None)
+
+    @staticmethod
+    def store_allocation(task_id, robot_id):
+        Task.create_new(task_id=task_id)
+        task = get_task(task_id)
+        task.update_status(TaskStatusConst.ALLOCATED)
+        task.assign_robots([robot_id])
+
+    def persist(self, write, *args):
+        """ Queues a write to the robot store
+        """
+        if self.persistent:
+            self.writes.put((write, args))
+
+    def run_writes(self):
+        while True:
+            write, args = self.writes.get()
+            try:
+                write(*args)
+            except Exception as exception:
+                self.logger.error("Could not store %s%s: %s", write.__name__, args, exception)
+            finally:
+                self.writes.task_done()
+
+    def flush(self):
+        """ Blocks until all queued writes are stored
+        """
+        self.writes.join()
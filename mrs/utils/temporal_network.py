@@ -0,0 +1,276 @@
+""" Incremental operations on the distance graph of a temporal network (stn, dispatchable graph, schedule)
+
+A constraint i --- [lower, upper] ---> j is represented by two edges in the distance graph:
+    i --- upper ---> j
+    i <--- -lower --- j
+
+The bounds of a timepoint (relative to the zero_timepoint, node 0) are given by the edges
+between node 0 and the timepoint:
+    lower bound = -weight(node, 0)
+    upper bound = weight(0, node)
+"""
+from collections import deque
+
+import numpy as np
+
+ZERO_TIMEPOINT = 0
+EPSILON = 1e-6
+
+
+def get_node_id(graph, task_id, node_type):
+    """ Returns the id of the timepoint of type node_type of the task with task_id
+    """
+    for node_id, data in graph.nodes(data=True):
+        node = data.get('data')
+        if node is not None and str(node.task_id) == str(task_id) and node.node_type == node_type:
+            return node_id
+
+
+def get_bounds(graph, node_id):
+    """ Returns the (lower, upper) bounds of a timepoint
+    """
+    lower = -graph[node_id][ZERO_TIMEPOINT]['weight'] if graph.has_edge(node_id, ZERO_TIMEPOINT) else -float('inf')
+    upper = graph[ZERO_TIMEPOINT][node_id]['weight'] if graph.has_edge(ZERO_TIMEPOINT, node_id) else float('inf')
+    return lower, upper
+
+
+def set_bounds(graph, node_id, lower, upper):
+    graph.add_edge(node_id, ZERO_TIMEPOINT, weight=-lower)
+    graph.add_edge(ZERO_TIMEPOINT, node_id, weight=upper)
+
+
+def set_min_duration(graph, i, j, duration):
+    """ Sets the lower bound of the constraint i --- [lower, upper] ---> j to the given duration (minutes).
+    The upper bound is relaxed if it is smaller than the duration
+    """
+    graph.add_edge(j, i, weight=-duration)
+    if graph.has_edge(i, j) and graph[i][j]['weight'] < duration:
+        graph[i][j]['weight'] = duration
+
+
+def copy_bounds(source, target, node_ids):
+    """ Copies the bounds of the given timepoints from the source to the target graph
+    """
+    for node_id in node_ids:
+        if node_id != ZERO_TIMEPOINT:
+            set_bounds(target, node_id, *get_bounds(source, node_id))
+
+
+def assign_timepoint(graph, node_id, time):
+    """ Instantiates a timepoint to the given time (minutes after the zero_timepoint)
+    """
+    set_bounds(graph, node_id, time, time)
+
+
+def propagate(graph, node_ids):
+    """ Propagates the bounds of the given timepoints to the rest of the graph.
+
+    Only the timepoints whose bounds change are visited, i.e., the cost depends on the
+    size of the affected part of the graph and not on the size of the whole graph.
+
+    An upper bound propagates along outgoing edges:  upper(j) <= upper(i) + weight(i, j)
+    A lower bound propagates along incoming edges:   lower(i) >= lower(j) - weight(i, j)
+
+    :param graph: distance graph
+    :param node_ids: timepoints whose bounds changed
+    :return: set of timepoints whose bounds were tightened
+    :raises ValueError: (node_id) if the bounds of a timepoint become inconsistent (lower > upper)
+    """
+    max_updates = graph.number_of_nodes()
+    n_updates = dict()
+    tightened = set()
+
+    queue = deque(node_id for node_id in node_ids if node_id != ZERO_TIMEPOINT)
+    in_queue = set(queue)
+
+    while queue:
+        node_id = queue.popleft()
+        in_queue.discard(node_id)
+        lower, upper = get_bounds(graph, node_id)
+
+        if lower > upper + EPSILON:
+            raise ValueError(node_id)
+
+        for successor in graph.successors(node_id):
+            if successor == ZERO_TIMEPOINT:
+                continue
+            successor_lower, successor_upper = get_bounds(graph, successor)
+            new_upper = upper + graph[node_id][successor]['weight']
+            if new_upper < successor_upper - EPSILON:
+                set_bounds(graph, successor, successor_lower, new_upper)
+                _enqueue(successor, queue, in_queue, n_updates, max_updates)
+                tightened.add(successor)
+
+        for predecessor in graph.predecessors(node_id):
+            if predecessor == ZERO_TIMEPOINT:
+                continue
+            predecessor_lower, predecessor_upper = get_bounds(graph, predecessor)
+            new_lower = lower - graph[predecessor][node_id]['weight']
+            if new_lower > predecessor_lower + EPSILON:
+                set_bounds(graph, predecessor, new_lower, predecessor_upper)
+                _enqueue(predecessor, queue, in_queue, n_updates, max_updates)
+                tightened.add(predecessor)
+
+    return tightened
+
+
+def _enqueue(node_id, queue, in_queue, n_updates, max_updates):
+    n_updates[node_id] = n_updates.get(node_id, 0) + 1
+    if n_updates[node_id] > max_updates:
+        # A timepoint cannot be tightened more times than there are timepoints unless
+        # the graph has a negative cycle
+        raise ValueError(node_id)
+    if node_id not in in_queue:
+        queue.append(node_id)
+        in_queue.add(node_id)
+
+
+def shift_zero_timepoint(graph, delta):
+    """ Moves the zero_timepoint delta minutes forward, i.e., all bounds
+    relative to the zero_timepoint are reduced by delta
+
+    :param graph: distance graph
+    :param delta: (float) minutes
+    """
+    for node_id in graph.successors(ZERO_TIMEPOINT):
+        graph[ZERO_TIMEPOINT][node_id]['weight'] -= delta
+    for node_id in graph.predecessors(ZERO_TIMEPOINT):
+        graph[node_id][ZERO_TIMEPOINT]['weight'] += delta
+
+
+class TimepointBounds(object):
+    """ Bounds of the timepoints of a temporal network as arrays, one row per task
+    (in position order) and one column per timepoint type (navigation, start, finish).
+
+    Temporal metrics are computed with one array operation each. The definitions are the
+    ones of the stn:
+        completion_time = lower(finish of last task) - lower(navigation of first task)
+        makespan = lower(finish of last task)
+        idle_time = sum of round(lower(start of task i) - lower(finish of task i-1))
+
+    The rows follow the insertions and removals of tasks. When the graph is replaced (a new solution of
+    the stp) the rows are marked as stale and a row is read from the graph the first time it is used,
+    i.e., the makespan reads the bounds of one task. The timepoints of the task in position p are the
+    nodes 3p-2, 3p-1 and 3p of the graph; if the graph does not match the rows, all rows are read again.
+    """
+    node_types = ['navigation', 'start', 'finish']
+
+    def __init__(self, task_ids, lower, upper, graph=None):
+        self.task_ids = list(task_ids)
+        self._lower = lower
+        self._upper = upper
+        self.graph = graph
+        self.stale = np.zeros(len(self.task_ids), dtype=bool)
+
+    def __len__(self):
+        return len(self.task_ids)
+
+    @property
+    def lower(self):
+        self.refresh()
+        return self._lower
+
+    @property
+    def upper(self):
+        self.refresh()
+        return self._upper
+
+    @classmethod
+    def from_graph(cls, graph):
+        """ Reads the bounds of all task timepoints in one pass over the nodes of the graph
+        """
+        task_ids, lower, upper = cls.read_graph(graph)
+        return cls(task_ids, lower, upper, graph)
+
+    @classmethod
+    def read_graph(cls, graph):
+        rows = dict()
+        lower = list()
+        upper = list()
+        for node_id in sorted(graph.nodes()):
+            node = graph.nodes[node_id].get('data')
+            if node_id == ZERO_TIMEPOINT or node is None or node.node_type not in cls.node_types:
+                continue
+            if node.task_id not in rows:
+                rows[node.task_id] = len(rows)
+                lower.append([np.nan] * len(cls.node_types))
+                upper.append([np.nan] * len(cls.node_types))
+            column = cls.node_types.index(node.node_type)
+            lower[rows[node.task_id]][column], upper[rows[node.task_id]][column] = get_bounds(graph, node_id)
+
+        shape = (len(rows), len(cls.node_types))
+        return list(rows), np.array(lower, dtype=float).reshape(shape), np.array(upper, dtype=float).reshape(shape)
+
+    def set_graph(self, graph):
+        """ The graph was replaced: the rows are read from it when they are used
+        """
+        self.graph = graph
+        self.stale[:] = True
+
+    def refresh(self, rows=None):
+        """ Reads the stale rows (all or the given ones) from the graph
+        """
+        rows = np.flatnonzero(self.stale) if rows is None else [row for row in rows if self.stale[row]]
+        for row in rows:
+            for column, node_type in enumerate(self.node_types):
+                node_id = 3 * row + column + 1
+                node = self.graph.nodes[node_id].get('data') if self.graph.has_node(node_id) else None
+                if node is None or node.task_id != self.task_ids[row] or node.node_type != node_type:
+                    self.reload()
+                    return
+                self._lower[row, column], self._upper[row, column] = get_bounds(self.graph, node_id)
+            self.stale[row] = False
+
+    def reload(self):
+        self.task_ids, self._lower, self._upper = self.read_graph(self.graph)
+        self.stale = np.zeros(len(self.task_ids), dtype=bool)
+
+    def update(self, graph, node_ids):
+        """ Updates the bounds of the given timepoints
+        """
+        for node_id in node_ids:
+            node = graph.nodes[node_id].get('data')
+            if node_id == ZERO_TIMEPOINT or node is None or node.task_id not in self.task_ids:
+                continue
+            row = self.task_ids.index(node.task_id)
+            column = self.node_types.index(node.node_type)
+            self._lower[row, column], self._upper[row, column] = get_bounds(graph, node_id)
+
+    def insert(self, position, task_id):
+        """ Adds a stale row for the task inserted in the given position (starting at 1)
+        """
+        self.task_ids.insert(position - 1, task_id)
+        self._lower = np.insert(self._lower, position - 1, np.nan, axis=0)
+        self._upper = np.insert(self._upper, position - 1, np.nan, axis=0)
+        self.stale = np.insert(self.stale, position - 1, True)
+
+    def remove(self, position):
+        """ Removes the bounds of the task in the given position (starting at 1)
+        """
+        del self.task_ids[position - 1]
+        self._lower = np.delete(self._lower, position - 1, axis=0)
+        self._upper = np.delete(self._upper, position - 1, axis=0)
+        self.stale = np.delete(self.stale, position - 1)
+
+    def shift(self, delta):
+        """ Bounds relative to a zero_timepoint delta minutes later
+        """
+        self._lower -= delta
+        self._upper -= delta
+
+    def get_completion_time(self):
+        if self.task_ids:
+            self.refresh([0, len(self.task_ids) - 1])
+        if not self.task_ids:
+            return 0
+        return self._lower[-1, 2] - self._lower[0, 0]
+
+    def get_makespan(self):
+        if self.task_ids:
+            self.refresh([len(self.task_ids) - 1])
+        if not self.task_ids:
+            return 0
+        return self._lower[-1, 2]
+
+    def get_idle_time(self):
+        return np.round(self.lower[1:, 1] - self.lower[:-1, 2]).sum()
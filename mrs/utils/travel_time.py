@@ -0,0 +1,135 @@
+""" Precomputed location-to-location travel-time matrix
+
+The matrix is stored in a .npy file (travel times in minutes) next to a .yaml file with the
+location names (row/column order). The .npy file is memory-mapped, i.e., all processes
+that load the same file share one copy of it, and all components of a process (e.g. bidders
+of several robots) share the same TravelTimeMatrix object.
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import yaml
+
+logger = logging.getLogger("mrs.travel_time")
+
+_matrices = dict()
+_default_matrix = None
+
+
+class TravelTimeMatrix(object):
+
+    def __init__(self, locations, matrix):
+        """
+        :param locations: list of location names, in the row/column order of the matrix
+        :param matrix: (np.ndarray) travel time (minutes) from the location in the row to the location in the column
+        """
+        self.locations = list(locations)
+        self.index = {location: i for i, location in enumerate(self.locations)}
+        self.matrix = matrix
+
+    def __contains__(self, location):
+        return location in self.index
+
+    def __len__(self):
+        return len(self.locations)
+
+    def get_travel_time(self, origin, destination):
+        """ Returns the travel time (minutes) from origin to destination
+        or None if one of the locations is not in the matrix
+        """
+        i = self.index.get(origin)
+        j = self.index.get(destination)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    @classmethod
+    def load(cls, path):
+        """ Loads a matrix saved with TravelTimeMatrix.save. The matrix is memory-mapped (read only)
+
+        :param path: path of the matrix without extension
+        """
+        matrix = np.load(path + '.npy', mmap_mode='r')
+        with open(path + '.yaml', 'r') as file:
+            locations = yaml.safe_load(file).get('locations')
+        logger.debug("Loaded travel time matrix %s with %s locations", path, len(locations))
+        return cls(locations, matrix)
+
+    def save(self, path):
+        np.save(path + '.npy', np.asarray(self.matrix, dtype=np.float32))
+        with open(path + '.yaml', 'w') as file:
+            yaml.safe_dump({'locations': self.locations}, file)
+
+    @classmethod
+    def from_map(cls, map_file, speed=1.0):
+        """ Builds the matrix from a map stand-in: a yaml file with the (x, y) coordinates
+        in meters of each location:
+
+        locations:
+            AMK_D_L-1_C39: [12.5, 3.0]
+            ...
+
+        Travel times are the euclidean distances between locations divided by the speed
+
+        :param map_file: path to the yaml file
+        :param speed: robot speed (m/s)
+        """
+        with open(map_file, 'r') as file:
+            coordinates = yaml.safe_load(file).get('locations')
+
+        locations = sorted(coordinates)
+        points = np.array([coordinates[location] for location in locations], dtype=np.float64)
+        distances = np.linalg.norm(points[:, np.newaxis, :] - points[np.newaxis, :, :], axis=2)
+        matrix = (distances / speed / 60).astype(np.float32)
+        return cls(locations, matrix)
+
+
+def get_travel_time_matrix(path=None, map_file=None, speed=1.0):
+    """ Returns the travel time matrix shared by all components of the process.
+
+    Without arguments, returns the matrix set by configure (None if no matrix was configured)
+
+    :param path: path of a matrix saved with TravelTimeMatrix.save (without extension)
+    :param map_file: yaml file with the location coordinates, used if the matrix file does not exist
+    :param speed: robot speed (m/s), used when building the matrix from the map_file
+    """
+    if path is None and map_file is None:
+        return _default_matrix
+
+    key = path or map_file
+    if key not in _matrices:
+        if path and os.path.exists(path + '.npy'):
+            _matrices[key] = TravelTimeMatrix.load(path)
+        elif map_file:
+            travel_time_matrix = TravelTimeMatrix.from_map(map_file, speed)
+            if path:
+                travel_time_matrix.save(path)
+                travel_time_matrix = TravelTimeMatrix.load(path)
+            _matrices[key] = travel_time_matrix
+        else:
+            logger.error("Travel time matrix %s does not exist", path)
+            return None
+
+    return _matrices[key]
+
+
+def configure(**kwargs):
+    """ Sets the travel time matrix used by all timetables of the process
+
+    :param kwargs: path, map_file, speed (see get_travel_time_matrix)
+    """
+    global _default_matrix
+    _default_matrix = get_travel_time_matrix(**kwargs)
+    return _default_matrix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precomputes a travel time matrix from a map stand-in')
+    parser.add_argument('map_file', type=str, help='yaml file with the (x, y) coordinates of each location')
+    parser.add_argument('path', type=str, help='output path (without extension)')
+    parser.add_argument('--speed', type=float, default=1.0, help='robot speed (m/s)')
+    args = parser.parse_args()
+
+    TravelTimeMatrix.from_map(args.map_file, args.speed).save(args.path)
@@ -1,11 +1,11 @@
 import logging
 import time
 
-from fmlib.db.mongo import MongoStoreBuilder
 from ropod.pyre_communicator.base_class import RopodPyre
 from ropod.utils.timestamp import TimeStamp
 from ropod.utils.uuid import generate_uuid
 
+from mrs.db.connection import MongoStore
 from mrs.utils.datasets import load_yaml, load_yaml_dataset
 
 
@@ -32,14 +32,12 @@ class AllocationTest(RopodPyre):
 
     @staticmethod
     def clean_stores(fleet, ccu_store_config, robot_store_config):
+        # The stores share one client
         for robot_id in fleet:
-            store = MongoStoreBuilder()
-            robot_store_config.update({'db_name': 'robot_store' + robot_id.split('_')[1]})
-            robot_store = store(**robot_store_config)
+            robot_store = MongoStore(**dict(robot_store_config, db_name='robot_store' + robot_id.split('_')[1]))
             robot_store.clean()
 
-        store = MongoStoreBuilder()
-        ccu_store = store(**ccu_store_config)
+        ccu_store = MongoStore(**ccu_store_config)
         ccu_store.clean()
 
     def trigger(self):
@@ -0,0 +1,50 @@
+import random
+import time
+
+from ropod.utils.uuid import generate_uuid
+
+from mrs.structs.bid import Bid
+from mrs.task_allocation.round import Round
+
+
+def build_payloads(n_bids, n_tasks=100, n_robots=100):
+    round_id = str(generate_uuid())
+    task_ids = [str(generate_uuid()) for _ in range(n_tasks)]
+    payloads = list()
+    for i in range(n_bids):
+        payloads.append({'robotId': 'ropod_%03d' % (i % n_robots + 1),
+                         'roundId': round_id,
+                         'taskId': random.choice(task_ids),
+                         'position': random.randint(1, 10),
+                         'riskMetric': random.choice([0, 0, 0, 1]),
+                         'temporalMetric': random.uniform(0, 100),
+                         'hardConstraints': True,
+                         'alternativeStartTime': None})
+    return payloads
+
+
+def benchmark(n_bids):
+    payloads = build_payloads(n_bids)
+
+    start = time.time()
+    bids = [Bid.from_payload(payload) for payload in payloads]
+    parse_time = time.time() - start
+
+    start = time.time()
+    sorted(bids)
+    sort_time = time.time() - start
+
+    round_ = Round(n_robots=100)
+    start = time.time()
+    for bid in bids:
+        round_.add_bid(bid)
+    round_.elect_winner()
+    election_time = time.time() - start
+
+    print("%7d bids | parse: %.3f s | sort: %.3f s | process and elect: %.3f s" %
+          (n_bids, parse_time, sort_time, election_time))
+
+
+if __name__ == '__main__':
+    for n_bids in [1000, 10000, 100000]:
+        benchmark(n_bids)
@@ -0,0 +1,177 @@
+""" Allocation latency of TeSSI (the auctioneer elects the winners) and CBBA (the robots agree on the
+winners among themselves) with large fleets
+
+The robots run in-process (see mrs.utils.local_api). Messages are delivered in waves: a wave delivers
+the messages published in the previous wave, i.e., it is one network hop. The robots of a wave compute
+in parallel on the real system, so the estimated latency of a wave is the longest computation of a
+component in the wave plus the round trip time of the network.
+
+Examples:
+    python consensus_benchmark.py
+    python consensus_benchmark.py --n-robots 50 100 --rtt 0.02
+"""
+import argparse
+import collections
+import time
+
+from ropod.utils.uuid import generate_uuid
+from stn.stp import STP
+
+from mrs.exceptions.task_allocation import NoAllocation
+from mrs.structs.allocation import TaskAnnouncement, Allocation, ConsensusState, FinishConsensus
+from mrs.task_allocation.bidder import Bidder
+from mrs.task_allocation.consensus import ConsensusMonitor
+from mrs.task_allocation.round import Round
+from mrs.utils import clock
+from mrs.utils.datasets import load_tasks_lots
+from mrs.utils.local_api import LocalAPI
+from mrs.utils.task_registry import TaskRegistry
+
+STP_SOLVER = 'srea'
+BIDDER_CONFIG = {'bidding_rule': {'robustness': 'srea', 'temporal': 'completion_time'}}
+
+
+class Harness(object):
+
+    def __init__(self, n_robots, allocation_method):
+        self.api = LocalAPI()
+        self.robot_ids = ['ropod_%03d' % robot for robot in range(1, n_robots + 1)]
+
+        self.zero_timepoint = clock.today()
+
+        robot_config = {'api': self.api,
+                        'robot_store': None,
+                        'stp_solver': STP_SOLVER,
+                        'task_type': None,
+                        'stp': STP(STP_SOLVER),
+                        'task_registry': TaskRegistry(persistent=False)}
+        bidder_config = dict(BIDDER_CONFIG, allocation_method=allocation_method)
+        self.bidders = {robot_id: Bidder(dict(robot_config, robot_id=robot_id), bidder_config)
+                        for robot_id in self.robot_ids}
+
+        # msg_type: list of (component, callback)
+        self.callbacks = collections.defaultdict(list)
+        for robot_id, bidder in self.bidders.items():
+            self.callbacks['TASK-ANNOUNCEMENT'].append((robot_id, bidder.task_announcement_cb))
+            self.callbacks['ALLOCATION'].append((robot_id, bidder.allocation_cb))
+
+        self.allocations = dict()
+        self.n_waves = 0
+        self.latency = 0.
+
+    def run_wave(self, rtt):
+        """ Delivers the messages published in the previous wave
+
+        :return: number of delivered messages
+        """
+        msgs = list(self.api.queue)
+        self.api.queue.clear()
+        if not msgs:
+            return 0
+
+        # component: computation time in the wave
+        computation_times = collections.defaultdict(float)
+        for msg in msgs:
+            for component, callback in self.callbacks.get(msg['header']['type'], list()):
+                start = time.perf_counter()
+                callback(msg)
+                computation_times[component] += time.perf_counter() - start
+
+        self.n_waves += 1
+        self.latency += max(computation_times.values(), default=0.) + rtt
+        return len(msgs)
+
+    def announce(self, tasks_lots, round_id, closure_time=None):
+        task_announcement = TaskAnnouncement(tasks_lots, round_id, self.zero_timepoint, closure_time)
+        self.api.publish(self.api.create_message(task_announcement))
+
+    def allocate(self, task_id, robot_id, position):
+        self.allocations[task_id] = robot_id
+        self.api.publish(self.api.create_message(Allocation(task_id, robot_id, position)))
+
+
+class TeSSIHarness(Harness):
+
+    def __init__(self, n_robots):
+        super().__init__(n_robots, 'tessi')
+        self.round = None
+        self.callbacks['BID'].append(('auctioneer', self.bid_cb))
+
+    def bid_cb(self, msg):
+        self.round.process_bid(msg['payload'])
+
+    def run(self, tasks_lots, rtt):
+        tasks_to_allocate = {task_lot.task.task_id: task_lot for task_lot in tasks_lots}
+        while tasks_to_allocate:
+            self.round = Round(tasks_to_allocate=tasks_to_allocate, n_robots=len(self.bidders))
+            self.round.start()
+            self.announce(list(tasks_to_allocate.values()), self.round.id, self.round.closure_time)
+            while self.run_wave(rtt):
+                pass
+
+            try:
+                task_lot, robot_id, position, tasks_to_allocate = self.round.get_result()
+            except NoAllocation:
+                break
+            finally:
+                self.round.finish()
+
+            self.allocate(task_lot.task.task_id, robot_id, position)
+            self.run_wave(rtt)
+
+
+class CBBAHarness(Harness):
+
+    def __init__(self, n_robots):
+        super().__init__(n_robots, 'cbba')
+        self.monitor = None
+        for robot_id, bidder in self.bidders.items():
+            self.callbacks['CONSENSUS-STATE'].append((robot_id, bidder.consensus_state_cb))
+            self.callbacks['FINISH-CONSENSUS'].append((robot_id, bidder.finish_consensus_cb))
+        self.callbacks['CONSENSUS-STATE'].append(('auctioneer', self.consensus_state_cb))
+
+    def consensus_state_cb(self, msg):
+        self.monitor.add_state(ConsensusState.from_payload(msg['payload']))
+
+    def run(self, tasks_lots, rtt):
+        tasks_to_allocate = {task_lot.task.task_id: task_lot for task_lot in tasks_lots}
+        while tasks_to_allocate:
+            round_id = generate_uuid()
+            self.monitor = ConsensusMonitor(round_id, self.robot_ids, tasks_to_allocate)
+            self.announce(list(tasks_to_allocate.values()), round_id)
+            while not self.monitor.converged() and self.run_wave(rtt):
+                pass
+
+            allocations = self.monitor.get_allocations()
+            if not allocations:
+                break
+            for task_id, robot_id, position in sorted(allocations, key=lambda allocation: allocation[1:]):
+                self.allocate(task_id, robot_id, position)
+                tasks_to_allocate.pop(task_id)
+            self.api.publish(self.api.create_message(FinishConsensus(round_id)))
+            self.run_wave(rtt)
+
+
+def benchmark(harness_cls, n_robots, tasks_lots, rtt):
+    harness = harness_cls(n_robots)
+    start = time.time()
+    harness.run(tasks_lots, rtt)
+    wall_time = time.time() - start
+
+    print("%-5s | %4d robots | %3d/%d tasks allocated | %4d waves | estimated latency: %.3f s | wall time: %.3f s" %
+          (harness_cls.__name__[:-len('Harness')], n_robots, len(harness.allocations), len(tasks_lots),
+           harness.n_waves, harness.latency, wall_time))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', type=str, default='data/non_overlapping.yaml')
+    parser.add_argument('--n-robots', type=int, nargs='+', default=[50, 100])
+    parser.add_argument('--rtt', type=float, default=0.01, help='round trip time of the network (seconds)')
+    args = parser.parse_args()
+
+    dataset_id, tasks_lots = load_tasks_lots(args.dataset)
+    for n_robots in args.n_robots:
+        for harness_cls in [TeSSIHarness, CBBAHarness]:
+            benchmark(harness_cls, n_robots, tasks_lots, args.rtt)
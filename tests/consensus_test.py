@@ -0,0 +1,136 @@
+from collections import namedtuple
+
+import pytest
+
+from mrs.task_allocation.consensus import ConsensusBundle, ConsensusMonitor
+
+State = namedtuple('State', ['round_id', 'robot_id', 'winners', 'positions'])
+
+
+class Bidder(object):
+    def __init__(self, robot_id):
+        self.id = robot_id
+        self.timetable = None
+
+    def insert_task(self, task_lot, round_id):
+        return None
+
+
+def winner(cost, robot_id):
+    return (cost, 0.0), robot_id
+
+
+@pytest.fixture
+def bundle():
+    bundle = ConsensusBundle(Bidder('ropod_001'))
+    bundle.timestamps = {'ropod_002': 10, 'ropod_003': 10, 'ropod_004': 10}
+    return bundle
+
+
+@pytest.mark.parametrize('sender_winner, own_winner, action', [
+    # The sender thinks it wins
+    (winner(1, 'ropod_002'), winner(2, 'ropod_001'), 'update'),
+    (winner(3, 'ropod_002'), winner(2, 'ropod_001'), 'leave'),
+    (winner(3, 'ropod_002'), None, 'update'),
+    (winner(1, 'ropod_002'), winner(2, 'ropod_003'), 'update'),
+    (winner(3, 'ropod_002'), winner(2, 'ropod_003'), 'leave'),
+    # Same cost: the lower robot number wins
+    (winner(2, 'ropod_002'), winner(2, 'ropod_001'), 'leave'),
+    # The sender thinks the receiver wins
+    (winner(2, 'ropod_001'), winner(2, 'ropod_001'), 'leave'),
+    (winner(2, 'ropod_001'), winner(1, 'ropod_002'), 'reset'),
+    (winner(2, 'ropod_001'), None, 'leave'),
+    # The sender thinks nobody wins
+    (None, winner(1, 'ropod_002'), 'update'),
+    (None, winner(2, 'ropod_001'), 'leave'),
+])
+def test_resolve_without_newer_information(bundle, sender_winner, own_winner, action):
+    sender_timestamps = {'ropod_002': 10, 'ropod_003': 10, 'ropod_004': 10}
+    assert bundle.resolve('ropod_002', sender_winner, own_winner, sender_timestamps) == action
+
+
+@pytest.mark.parametrize('sender_winner, own_winner, newer, action', [
+    # The sender thinks a third robot (m) wins
+    (winner(1, 'ropod_003'), winner(2, 'ropod_001'), True, 'update'),
+    (winner(1, 'ropod_003'), winner(2, 'ropod_001'), False, 'leave'),
+    (winner(3, 'ropod_003'), winner(2, 'ropod_001'), True, 'leave'),
+    (winner(3, 'ropod_003'), winner(2, 'ropod_002'), True, 'update'),
+    (winner(3, 'ropod_003'), winner(2, 'ropod_002'), False, 'reset'),
+    (winner(3, 'ropod_003'), None, True, 'update'),
+    (winner(3, 'ropod_003'), None, False, 'leave'),
+    # and the receiver thinks a fourth robot (n) wins
+    (winner(3, 'ropod_003'), winner(2, 'ropod_004'), True, 'update'),
+    (winner(1, 'ropod_003'), winner(2, 'ropod_004'), False, 'leave'),
+])
+def test_resolve_third_robot(bundle, sender_winner, own_winner, newer, action):
+    sender_timestamps = {'ropod_002': 10, 'ropod_003': 20 if newer else 10, 'ropod_004': 20 if newer else 10}
+    assert bundle.resolve('ropod_002', sender_winner, own_winner, sender_timestamps) == action
+
+
+def test_resolve_newer_information_about_own_winner(bundle):
+    # The sender thinks nobody wins but has newer information from the winner of the receiver
+    sender_timestamps = {'ropod_002': 10, 'ropod_003': 20}
+    assert bundle.resolve('ropod_002', None, winner(1, 'ropod_003'), sender_timestamps) == 'update'
+    sender_timestamps = {'ropod_002': 10, 'ropod_003': 10}
+    assert bundle.resolve('ropod_002', None, winner(1, 'ropod_003'), sender_timestamps) == 'leave'
+
+
+def test_resolve_reset_when_sender_has_newer_information(bundle):
+    # The sender thinks the receiver wins, the receiver thinks a third robot wins
+    sender_timestamps = {'ropod_002': 10, 'ropod_003': 20}
+    assert bundle.resolve('ropod_002', winner(2, 'ropod_001'), winner(1, 'ropod_003'), sender_timestamps) == 'reset'
+    sender_timestamps = {'ropod_002': 10, 'ropod_003': 10}
+    assert bundle.resolve('ropod_002', winner(2, 'ropod_001'), winner(1, 'ropod_003'), sender_timestamps) == 'leave'
+
+
+@pytest.fixture
+def monitor():
+    return ConsensusMonitor('round_1', ['ropod_001', 'ropod_002'], ['task_1', 'task_2', 'task_3'])
+
+
+def test_no_allocations_before_all_robots_send_their_view(monitor):
+    winners = {'task_1': winner(1, 'ropod_001'), 'task_2': None, 'task_3': None}
+    monitor.add_state(State('round_1', 'ropod_001', winners, {'task_1': 1}))
+
+    assert not monitor.converged()
+    assert monitor.get_allocations() == list()
+
+
+def test_states_of_other_rounds_are_ignored(monitor):
+    winners = {'task_1': winner(1, 'ropod_001'), 'task_2': None, 'task_3': None}
+    monitor.add_state(State('round_0', 'ropod_001', winners, {'task_1': 1}))
+    monitor.add_state(State('round_1', 'ropod_005', winners, {'task_1': 1}))
+
+    assert monitor.states == dict()
+
+
+def test_allocations_skip_tasks_not_allocated(monitor):
+    # ropod_001 added task_2 to its bundle, but ropod_002 won it
+    winners = {'task_1': winner(1, 'ropod_001'),
+               'task_2': winner(1, 'ropod_002'),
+               'task_3': winner(2, 'ropod_001')}
+    monitor.add_state(State('round_1', 'ropod_001', winners, {'task_1': 1, 'task_2': 2, 'task_3': 3}))
+    monitor.add_state(State('round_1', 'ropod_002', winners, {'task_2': 1}))
+
+    assert monitor.converged()
+    assert sorted(monitor.get_allocations()) == [('task_1', 'ropod_001', 1),
+                                                 ('task_2', 'ropod_002', 1),
+                                                 ('task_3', 'ropod_001', 2)]
+
+
+def test_allocations_sorted_by_position(monitor):
+    winners = {'task_1': winner(2, 'ropod_001'),
+               'task_2': winner(1, 'ropod_001'),
+               'task_3': None}
+    monitor.add_state(State('round_1', 'ropod_001', winners, {'task_1': 2, 'task_2': 1}))
+    monitor.add_state(State('round_1', 'ropod_002', winners, dict()))
+
+    assert monitor.get_allocations() == [('task_2', 'ropod_001', 1), ('task_1', 'ropod_001', 2)]
+
+
+def test_no_agreement(monitor):
+    monitor.add_state(State('round_1', 'ropod_001', {'task_1': winner(1, 'ropod_001')}, {'task_1': 1}))
+    monitor.add_state(State('round_1', 'ropod_002', {'task_1': winner(1, 'ropod_002')}, {'task_1': 1}))
+
+    assert not monitor.converged()
+    assert monitor.get_allocations() == list()
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from mrs.task_allocation.schedule_index import ScheduleIndex
+from mrs.utils import clock, travel_time
+
+NOW = datetime(2020, 1, 1, 8, 0)
+
+
+class Bounds(object):
+    def __init__(self, tasks):
+        self.task_ids = [task[0] for task in tasks]
+        self.lower = np.array([[task[1][0], task[1][0], task[2][0]] for task in tasks], dtype=float)
+        self.upper = np.array([[task[1][1], task[1][1], task[2][1]] for task in tasks], dtype=float)
+
+
+class Timetable(object):
+    """ Timetable with the given tasks: (task_id, (earliest, latest) navigation start,
+    (earliest, latest) finish, start_location, finish_location), times in minutes after NOW
+    """
+    def __init__(self, location, tasks=()):
+        self.location = location
+        self.tasks = list(tasks)
+        self.zero_timepoint = NOW
+        self.dispatchable_graph = object() if self.tasks else None
+        self.bounds = Bounds(self.tasks)
+
+    def get_tasks(self):
+        return [task[0] for task in self.tasks]
+
+    def get_start_location(self, position):
+        return self.tasks[position - 1][3]
+
+    def get_finish_location(self, position):
+        return self.tasks[position - 1][4]
+
+
+def minutes(minutes_):
+    return NOW + timedelta(minutes=minutes_)
+
+
+@pytest.fixture(autouse=True)
+def simulated_clock():
+    clock.set_clock(clock.SimulatedClock(NOW.timestamp(), speed=0))
+    yield
+    clock.set_clock(clock.Clock())
+
+
+@pytest.fixture
+def travel_time_matrix(monkeypatch):
+    # 5 minutes between different locations
+    locations = ['A', 'B', 'C', 'D', 'L', 'X', 'Y']
+    matrix = np.full((len(locations), len(locations)), 5.0)
+    np.fill_diagonal(matrix, 0)
+    travel_time_matrix = travel_time.TravelTimeMatrix(locations, matrix)
+    monkeypatch.setattr(travel_time, '_default_matrix', travel_time_matrix)
+    return travel_time_matrix
+
+
+@pytest.fixture
+def schedule_index():
+    schedule_index = ScheduleIndex()
+    schedule_index.update('ropod_001', Timetable('X', [('task_1', (30, 40), (50, 50), 'A', 'B'),
+                                                       ('task_2', (60, 70), (80, 80), 'C', 'D')]))
+    schedule_index.update('ropod_002', Timetable('Y', [('task_3', (5, 6), (20, 20), 'A', 'B')]))
+    return schedule_index
+
+
+def test_update(schedule_index):
+    columns = schedule_index.get_columns()
+
+    assert list(columns['task_id']) == ['task_3', 'task_1', 'task_2']
+    assert list(columns['robot_id']) == ['ropod_002', 'ropod_001', 'ropod_001']
+    assert len(schedule_index) == 3
+
+    schedule_index.update('ropod_001', Timetable('B'))
+    assert list(schedule_index.get_columns()['task_id']) == ['task_3']
+    assert schedule_index.locations['ropod_001'] == 'B'
+
+    schedule_index.remove('ropod_002')
+    assert len(schedule_index) == 0
+    assert schedule_index.robot_ids == ['ropod_001']
+
+
+@pytest.mark.parametrize('start, finish, idle_robot_ids', [
+    (0, 10, ['ropod_001']),
+    (45, 65, ['ropod_002']),
+    (55, 58, ['ropod_001', 'ropod_002']),
+    (0, 100, list()),
+])
+def test_get_idle_robots(schedule_index, start, finish, idle_robot_ids):
+    assert schedule_index.get_idle_robots(minutes(start), minutes(finish)) == idle_robot_ids
+
+
+def test_robots_without_tasks_are_idle(schedule_index):
+    schedule_index.update('ropod_003', Timetable('L'))
+    assert schedule_index.get_idle_robots(minutes(0), minutes(100)) == ['ropod_003']
+
+
+def test_earliest_slot_before_the_first_task(schedule_index, travel_time_matrix):
+    # ropod_001 can travel to L, stay 10 minutes and travel to A before the latest start of task_1.
+    # ropod_002 cannot make it before task_3
+    assert schedule_index.get_earliest_slot('L', NOW, 10) == ('ropod_001', minutes(5))
+
+
+def test_earliest_slot_includes_travel_to_the_next_task(schedule_index, travel_time_matrix):
+    # 5 + 31 + 5 > 40: the slot before task_1 would delay it. After task_3, ropod_002 is free
+    assert schedule_index.get_earliest_slot('L', NOW, 31) == ('ropod_002', minutes(25))
+
+
+def test_earliest_slot_after(schedule_index, travel_time_matrix):
+    # Between task_1 and task_2, ropod_001 arrives at 60 but would be at C after 75 > 70
+    assert schedule_index.get_earliest_slot('L', minutes(60), 10) == ('ropod_002', minutes(60))
+
+
+def test_earliest_slot_of_robot_without_tasks(schedule_index, travel_time_matrix):
+    schedule_index.update('ropod_003', Timetable('L'))
+    assert schedule_index.get_earliest_slot('L', NOW, 10) == ('ropod_003', NOW)
+
+
+def test_earliest_slot_without_travel_time_matrix(schedule_index, monkeypatch):
+    monkeypatch.setattr(travel_time, '_default_matrix', None)
+    assert schedule_index.get_earliest_slot('L', NOW, 10) == ('ropod_001', NOW)
+
+
+def test_no_slot_without_robots(travel_time_matrix):
+    assert ScheduleIndex().get_earliest_slot('L', NOW, 10) is None
@@ -0,0 +1,87 @@
+import networkx as nx
+import pytest
+from networkx.readwrite import json_graph
+
+from mrs.utils.solution_cache import SolutionCache
+from mrs.utils.temporal_network import EPSILON
+
+
+class Graph(nx.DiGraph):
+    """ Distance graph with the dictionary representation of the stns of the stn package
+    """
+    def to_dict(self):
+        return json_graph.node_link_data(self)
+
+    @classmethod
+    def from_dict(cls, stn_dict):
+        return cls(json_graph.node_link_graph(stn_dict))
+
+
+def get_graph(bounds):
+    """ Returns a distance graph with the given bounds {node_id: (lower, upper)} relative to the zero_timepoint
+    """
+    graph = Graph()
+    graph.add_node(0)
+    for node_id, (lower, upper) in bounds.items():
+        graph.add_edge(0, node_id, weight=upper)
+        graph.add_edge(node_id, 0, weight=-lower)
+    return graph
+
+
+@pytest.mark.parametrize('lower_bounds, holds', [
+    # Same lower bounds as the solved stn
+    ({1: 10, 2: 20}, True),
+    # Tighter, and satisfied by the dispatchable graph
+    ({1: 12, 2: 25}, True),
+    ({1: 15, 2: 30}, True),
+    # Less constrained than the solved stn
+    ({1: 9, 2: 20}, False),
+    # Violated by the dispatchable graph
+    ({1: 16, 2: 20}, False),
+    ({1: 10, 2: 31}, False),
+    # Within EPSILON
+    ({1: 10 - EPSILON / 2, 2: 30 + EPSILON / 2}, True),
+    ({1: 10 - 2 * EPSILON, 2: 20}, False),
+    ({1: 10, 2: 30 + 2 * EPSILON}, False),
+])
+def test_holds(lower_bounds, holds):
+    stn_lower_bounds = {1: 10, 2: 20}
+    graph_lower_bounds = {1: 15, 2: 30}
+    assert SolutionCache.holds(lower_bounds, stn_lower_bounds, graph_lower_bounds) == holds
+
+
+def test_does_not_hold_for_timepoints_without_bounds():
+    # Timepoints without bounds in the solved stn or in the dispatchable graph
+    assert not SolutionCache.holds({1: 10, 2: 20}, {1: 10}, {1: 15, 2: 30})
+    assert not SolutionCache.holds({1: 10, 2: 20}, {1: 10, 2: 20}, {1: 15})
+
+
+def test_get_lower_bounds():
+    graph = get_graph({1: (10, 15), 2: (20, 30)})
+    graph.add_edge(1, 2, weight=10)
+    graph.add_edge(2, 1, weight=-5)
+
+    assert SolutionCache.get_lower_bounds(graph) == {1: 10, 2: 20}
+
+
+def test_reuse_solution():
+    cache = SolutionCache()
+    key = ('srea', 'stn')
+    dispatchable_graph = get_graph({1: (15, 15), 2: (30, 30)})
+    cache.add(key, {1: 10, 2: 20}, 0.5, dispatchable_graph)
+
+    risk_metric, graph = cache.get(key, {1: 12, 2: 20}, Graph)
+    assert risk_metric == 0.5
+    assert sorted(graph.edges(data='weight')) == sorted(dispatchable_graph.edges(data='weight'))
+
+    assert cache.get(key, {1: 16, 2: 20}, Graph) is None
+    assert cache.get(('srea', 'other_stn'), {1: 10, 2: 20}, Graph) is None
+    assert (cache.n_hits, cache.n_misses) == (1, 2)
+
+
+def test_max_size():
+    cache = SolutionCache(max_size=2)
+    for key in ['stn_1', 'stn_2', 'stn_3']:
+        cache.add(key, {1: 10}, 0, get_graph({1: (10, 10)}))
+
+    assert list(cache.solutions) == ['stn_2', 'stn_3']
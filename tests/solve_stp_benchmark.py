@@ -0,0 +1,65 @@
+import time
+
+from stn.stp import STP
+from stn.task import STNTask
+
+from mrs.exceptions.task_allocation import NoSTPSolution
+from mrs.structs.timetable import Timetable
+from mrs.utils.solution_cache import CACHED_SOLVERS, solution_cache
+
+
+def build_timetable(n_tasks, stp):
+    timetable = Timetable('ropod_001', stp)
+    for position in range(1, n_tasks + 1):
+        r_earliest_start_time = position * 10
+        stn_task = STNTask('task_%s' % position, 1, r_earliest_start_time, r_earliest_start_time + 5,
+                           'AMK_D_L-1_C%s' % position, 'AMK_D_L-1_C%s' % (position + 1))
+        timetable.stn.add_task(stn_task, position)
+    return timetable
+
+
+def compute_bid(timetable, n_tasks, r_earliest_navigation_start):
+    """ Solves the stp with a new task in each position of the timetable
+    """
+    start = time.time()
+    r_earliest_start_time = (n_tasks + 1) * 10
+    for position in range(1, n_tasks + 2):
+        stn_task = STNTask('new_task', r_earliest_navigation_start, r_earliest_start_time,
+                           r_earliest_start_time + 5, 'AMK_D_L-1_C1', 'AMK_D_L-1_C2')
+        timetable.stn.add_task(stn_task, position)
+        try:
+            timetable.solve_stp()
+        except NoSTPSolution:
+            pass
+        timetable.stn.remove_task(position)
+    return time.time() - start
+
+
+def benchmark(n_tasks, stp):
+    timetable = build_timetable(n_tasks, stp)
+
+    # Solver only, without the cost of the cache keys
+    solution_cache.solvers = ()
+    uncached = compute_bid(timetable, n_tasks, 1)
+    solution_cache.solvers = CACHED_SOLVERS
+
+    solution_cache.clear()
+    n_hits, n_misses = solution_cache.n_hits, solution_cache.n_misses
+    # First round: every solve is a cache miss
+    first_round = compute_bid(timetable, n_tasks, 1)
+    # Next round: the robot did not win, the earliest navigation start of the task moved forward
+    next_round = compute_bid(timetable, n_tasks, 2)
+
+    print("%4d tasks | per-bid solve time: no cache %.3f s, first round (misses) %.3f s (%+.1f%%), "
+          "next round %.3f s (%.1fx) | hits: %s, misses: %s" %
+          (n_tasks, uncached, first_round, 100 * (first_round - uncached) / max(uncached, 1e-9),
+           next_round, first_round / max(next_round, 1e-9),
+           solution_cache.n_hits - n_hits, solution_cache.n_misses - n_misses))
+
+
+if __name__ == '__main__':
+    for solver in ['fpc', 'srea', 'dsc_lp']:
+        print("Solver: %s" % solver)
+        stp = STP(solver)
+        for n_tasks in [20, 40, 60, 80, 100]:
+            benchmark(n_tasks, stp)
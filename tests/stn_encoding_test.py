@@ -0,0 +1,66 @@
+import pytest
+from stn.stp import STP
+from stn.task import STNTask
+
+from mrs.utils.stn_encoding import encode_stn, decode_stn, is_encoded, get_time
+
+
+def get_nodes(stn):
+    return sorted(stn.to_dict()['nodes'], key=lambda node: node['id'])
+
+
+def get_edges(stn):
+    return sorted((i, j, weight) for i, j, weight in stn.edges(data='weight'))
+
+
+@pytest.fixture(params=['fpc', 'srea'])
+def stp(request):
+    return STP(request.param)
+
+
+@pytest.fixture
+def dispatchable_graph(stp):
+    stn = stp.get_stn()
+    for position in range(1, 4):
+        r_earliest_start_time = position * 10
+        stn_task = STNTask('task_%s' % position, 1, r_earliest_start_time, r_earliest_start_time + 5,
+                           'AMK_D_L-1_C%s' % position, 'AMK_D_L-1_C%s' % (position + 1))
+        stn.add_task(stn_task, position)
+    return stp.solve(stn)[1]
+
+
+def test_round_trip(stp, dispatchable_graph):
+    encoded = encode_stn(dispatchable_graph)
+    assert is_encoded(encoded)
+
+    decoded = decode_stn(encoded, stp.get_stn())
+
+    assert get_nodes(decoded) == get_nodes(dispatchable_graph)
+    assert get_edges(decoded) == get_edges(dispatchable_graph)
+
+
+def test_round_trip_of_node_link_dict(stp, dispatchable_graph):
+    encoded = encode_stn(dispatchable_graph.to_dict())
+    decoded = decode_stn(encoded, stp.get_stn())
+
+    assert get_edges(decoded) == get_edges(dispatchable_graph)
+
+
+def test_decode_node_link_dict(stp, dispatchable_graph):
+    decoded = decode_stn(dispatchable_graph.to_dict(), stp.get_stn())
+
+    assert get_edges(decoded) == get_edges(dispatchable_graph)
+
+
+@pytest.mark.parametrize('task_id', ['task_1', 'task_2', 'task_3'])
+@pytest.mark.parametrize('node_type', ['navigation', 'start', 'finish'])
+@pytest.mark.parametrize('lower_bound', [True, False])
+def test_get_time(dispatchable_graph, task_id, node_type, lower_bound):
+    encoded = encode_stn(dispatchable_graph)
+
+    assert get_time(encoded, task_id, node_type, lower_bound) == \
+        dispatchable_graph.get_time(task_id, node_type, lower_bound)
+
+
+def test_get_time_of_unknown_task(dispatchable_graph):
+    assert get_time(encode_stn(dispatchable_graph), 'task_4') is None
@@ -0,0 +1,47 @@
+import json
+import timeit
+
+from stn.stp import STP
+from stn.task import STNTask
+
+from mrs.structs.timetable import Timetable
+from mrs.utils.stn_encoding import encode_stn, decode_stn, get_time
+
+
+def build_timetable(n_tasks, stp):
+    timetable = Timetable('ropod_001', stp)
+    for position in range(1, n_tasks + 1):
+        r_earliest_start_time = position * 10
+        stn_task = STNTask('task_%s' % position, 1, r_earliest_start_time, r_earliest_start_time + 5,
+                           'AMK_D_L-1_C%s' % position, 'AMK_D_L-1_C%s' % (position + 1))
+        timetable.stn.add_task(stn_task, position)
+    timetable.solve_stp()
+    return timetable
+
+
+def benchmark(n_tasks, stp, repetitions=10):
+    timetable = build_timetable(n_tasks, stp)
+    graph = timetable.dispatchable_graph
+    stn_cls = stp.get_stn()
+
+    node_link = graph.to_dict()
+    encoded = encode_stn(graph)
+
+    node_link_size = len(json.dumps(node_link))
+    encoded_size = len(json.dumps(encoded))
+
+    node_link_decode = timeit.timeit(lambda: stn_cls.from_dict(node_link), number=repetitions) / repetitions
+    encoded_decode = timeit.timeit(lambda: decode_stn(encoded, stn_cls), number=repetitions) / repetitions
+    task_time = timeit.timeit(lambda: get_time(encoded, 'task_%s' % n_tasks, 'navigation'),
+                              number=repetitions) / repetitions
+
+    print("%5d tasks | size: node-link %8d B, columnar %8d B (%.2f) | decode: node-link %.4f s, "
+          "columnar %.4f s | task time (no decode): %.6f s" %
+          (n_tasks, node_link_size, encoded_size, encoded_size / node_link_size,
+           node_link_decode, encoded_decode, task_time))
+
+
+if __name__ == '__main__':
+    stp = STP('fpc')
+    for n_tasks in [10, 50, 100, 250, 500]:
+        benchmark(n_tasks, stp)